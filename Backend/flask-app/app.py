@@ -1,74 +1,149 @@
+import os
+import importlib
+import time
 from dotenv import load_dotenv
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, g, request, send_from_directory, jsonify
 from flask_cors import CORS
+from util import metrics
+from util.metrics import CONTENT_TYPE, registry
 
-# Import utilities and route handlers
-from util.api_caching import initialize_cache_table
-from route_handlers.parks.get_parks import get_parks, prefetch_weather_data
-from route_handlers.parks.get_directions import get_directions
-from route_handlers.parent.get_parental_guidance import get_parental_guidance, cleanup_spider_chart_png
-from route_handlers.chat.get_chat_response import get_chat_response
-
-# Initialize environment variables and cache table
-load_dotenv()
-initialize_cache_table()
-
-# Create and configure Flask app
-app = Flask(__name__)
-CORS(app)
-
-# Static file serving route
-@app.route('/api/static/<path:filename>')
-def serve_static(filename):
-    try:
-        return send_from_directory('static', filename)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-# Routes for park-related functionality
-@app.route('/api/parks/prefetch_weather_data', methods=['POST'])
-def prefetch_weather_data_route():
-    try:
-        return prefetch_weather_data()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/parks/get_parks', methods=['POST'])
-def get_parks_route():
-    try:
-        return get_parks()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/parks/get_directions', methods=['POST'])
-def get_directions_route():
-    try:
-        return get_directions()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-# Routes for parent-related functionality
-@app.route('/api/parent/get_parental_guidance', methods=['POST'])
-def get_parental_guidance_route():
-    try:
-        return get_parental_guidance()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/parent/cleanup_spider_chart_png', methods=['POST'])
-def cleanup_spider_chart_png_route():
-    try:
-        return cleanup_spider_chart_png()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-# Routes for chatbot functionality
-@app.route('/api/chat/get_chat_response', methods=['POST'])
-def get_chat_response_route():
-    try:
-        return get_chat_response()
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+# API routes: (URL rule, handler module, handler function, methods).
+# Handler modules are imported on first request, so their heavy dependencies
+# (matplotlib, numpy, the OpenAI SDK) are not loaded at start-up.
+ROUTES = [
+    # Routes for park-related functionality
+    ('/api/parks/prefetch_weather_data', 'route_handlers.parks.get_parks', 'prefetch_weather_data', ['POST']),
+    ('/api/parks/get_parks', 'route_handlers.parks.get_parks', 'get_parks', ['POST']),
+    ('/api/parks/get_directions', 'route_handlers.parks.get_directions', 'get_directions', ['POST']),
+    ('/api/parks/get_containing_parks', 'route_handlers.parks.park_containment', 'get_containing_parks', ['POST']),
+    ('/api/parks/updates', 'route_handlers.parks.park_updates', 'get_park_updates', ['GET']),
+    ('/api/parks/search', 'route_handlers.parks.park_search', 'search_parks', ['GET']),
+
+    # Routes for parent-related functionality
+    ('/api/parent/get_parental_guidance', 'route_handlers.parent.get_parental_guidance', 'get_parental_guidance', ['POST']),
+    ('/api/parent/get_cohort_guidance', 'route_handlers.parent.get_parental_guidance', 'get_cohort_guidance', ['POST']),
+    ('/api/parent/cleanup_spider_chart_png', 'route_handlers.parent.get_parental_guidance', 'cleanup_spider_chart_png', ['POST']),
+
+    # Routes for chatbot functionality
+    ('/api/chat/get_chat_response', 'route_handlers.chat.get_chat_response', 'get_chat_response', ['POST']),
+    ('/api/chat/get_chat_response_stream', 'route_handlers.chat.get_chat_response', 'get_chat_response_stream', ['POST']),
+    ('/api/chat/session_stats', 'route_handlers.chat.get_chat_response', 'get_chat_session_stats', ['GET']),
+]
+
+# Heavy third-party modules loaded by the warm-up hook
+WARM_UP_MODULES = ['numpy', 'matplotlib.pyplot', 'openai', 'polyline']
+
+# Request metrics, labelled by URL rule rather than path so parameters don't add series
+request_latency = registry.histogram(
+    'http_request_duration_seconds', 'Time to handle a request, up to the start of the response body.',
+    ('method', 'route', 'status'),
+)
+requests_in_flight = registry.gauge(
+    'http_requests_in_flight', 'Requests being handled, including streams still being sent.', ('route',),
+)
+
+
+def lazy_route(module_name, function_name):
+    """
+    Build a view function that imports its handler module on first use and
+    turns unhandled errors into a JSON 500 response.
+    """
+    def view():
+        try:
+            handler = getattr(importlib.import_module(module_name), function_name)
+            return handler()
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    view.__name__ = f"{function_name}_route"
+    return view
+
+
+def warm_up():
+    """
+    Import every route handler module and heavy dependency, create the API
+    cache table, map the park catalog, index it for filtering and index park
+    names for search, so the first requests don't pay for it. Call from a gunicorn `post_fork` hook or set
+    APP_WARM_UP=1.
+    """
+    from util.api_caching import initialize_cache_table
+    from route_handlers.parks.park_catalog import get_park_catalog
+    from route_handlers.parks.park_filters import get_filter_index
+    from route_handlers.parks.park_search import get_search_index
+
+    for module_name in WARM_UP_MODULES + sorted({module_name for _, module_name, _, _ in ROUTES}):
+        importlib.import_module(module_name)
+    initialize_cache_table()
+    get_filter_index(get_park_catalog())
+    get_search_index()
+
+
+def instrument_requests(app):
+    """
+    Record the latency, status and concurrency of every request in the
+    metrics registry.
+    """
+    @app.before_request
+    def start_request_timer():
+        metrics.ensure_snapshots()
+        g.request_started = time.perf_counter()
+        g.request_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        requests_in_flight.labels(g.request_route).inc()
+
+    @app.after_request
+    def record_request(response):
+        route = g.get('request_route')
+        if route is not None:
+            request_latency.labels(request.method, route, response.status_code).observe(time.perf_counter() - g.request_started)
+        return response
+
+    # Runs once a streamed response has been sent, so open streams count as in flight
+    @app.teardown_request
+    def finish_request(error=None):
+        route = g.pop('request_route', None)
+        if route is not None:
+            requests_in_flight.labels(route).dec()
+
+
+def create_app():
+    """
+    Create and configure the Flask app.
+    """
+    # Initialize environment variables
+    load_dotenv()
+    metrics.configure()
+
+    app = Flask(__name__)
+    CORS(app)
+
+    # Static file serving route
+    @app.route('/api/static/<path:filename>')
+    def serve_static(filename):
+        try:
+            return send_from_directory('static', filename)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    # Metrics of every worker process (see util.metrics.configure), for Prometheus to scrape
+    @app.route('/metrics')
+    def serve_metrics():
+        allowed = metrics.scrape_allowed(request.headers.get('Authorization'))
+        if allowed is None:
+            return jsonify({"error": "Not found"}), 404
+        if not allowed:
+            return jsonify({"error": "Unauthorized"}), 401, {'WWW-Authenticate': 'Bearer'}
+        return Response(metrics.render_all(), content_type=CONTENT_TYPE)
+
+    for rule, module_name, function_name, methods in ROUTES:
+        app.add_url_rule(rule, view_func=lazy_route(module_name, function_name), methods=methods)
+    instrument_requests(app)
+
+    if os.getenv('APP_WARM_UP', '').lower() in ('1', 'true', 'yes'):
+        warm_up()
+
+    return app
+
+
+app = create_app()
 
 # Run the app in development mode
 if __name__ == '__main__':
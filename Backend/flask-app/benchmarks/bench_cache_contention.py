@@ -0,0 +1,148 @@
+"""
+Benchmark get_parks latency while other worker processes write to the API
+cache, with the cache in the serving database (the previous layout) and in its
+own write-ahead-logged file next to the read-only, memory-mapped snapshot.
+
+Weather responses for every location are cached up front, so requests never
+leave the machine.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_cache_contention [--seconds 10] [--readers 4] [--writers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import util.database as database
+
+WEATHER_URL = 'http://api.openweathermap.org/data/2.5/weather'
+
+
+@contextmanager
+def layout(name, workdir):
+    """Point the app at a copy of the serving database, in the given layout."""
+    serving_path = os.path.join(workdir, 'ILikeToMoveIt.db')
+    patches = [
+        patch.object(database, 'SERVING_DATABASE_PATH', serving_path),
+        patch.object(database, 'API_CACHE_DATABASE_PATH', os.path.join(workdir, 'api_cache.db')),
+        patch.object(database, 'API_CACHE_SHARDS', 1),
+        patch('util.api_catching.API_CACHE_SHARDS', 1),
+    ]
+    if name == 'shared file':
+        patches += [
+            patch.object(database, 'API_CACHE_DATABASE_PATH', serving_path),
+            patch.object(database.SafetyMapDatabaseContextManager, 'connect', database.SQLiteContextManager.connect),
+        ]
+    for patcher in patches:
+        patcher.start()
+    try:
+        yield
+    finally:
+        for patcher in reversed(patches):
+            patcher.stop()
+
+
+def prepare(name, workdir):
+    """Copy the serving database and cache a weather response for every location."""
+    import util.api_catching as api_caching
+    from route_handlers.parks.get_weather_safety import round_coordinates
+
+    shutil.copy(database.SERVING_DATABASE_PATH, os.path.join(workdir, 'ILikeToMoveIt.db'))
+    with layout(name, workdir):
+        api_caching.initialize_cache_table()
+        if name == 'shared file':
+            # The serving database used the default rollback journal
+            with database.ApiCacheDatabaseContextManager() as conn:
+                conn.execute('PRAGMA journal_mode=DELETE')
+        with database.SafetyMapDatabaseContextManager() as conn:
+            coordinates = conn.execute('SELECT latitude, longitude FROM Location').fetchall()
+        for lat, lon in coordinates:
+            lat, lon = round_coordinates(lat, lon)
+            key = api_caching.default_cache_key_gen(WEATHER_URL, {'lat': lat, 'lon': lon, 'units': 'metric'})
+            api_caching.cache_response(key, {'weather': [{'main': 'Clear'}]})
+
+
+def write_cache(name, workdir, seconds, counter):
+    """Worker process: cache new responses as fast as possible."""
+    import util.api_catching as api_caching
+
+    with layout(name, workdir):
+        api_caching.cache_table_initialized = True
+        deadline = time.perf_counter() + seconds
+        written = 0
+        while time.perf_counter() < deadline:
+            api_caching.cache_response(f'{WEATHER_URL}_{os.getpid()}_{written}', {'weather': [{'main': 'Rain'}]})
+            written += 1
+    with counter.get_lock():
+        counter.value += written
+
+
+def read_parks(client, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = client.post('/api/parks/get_parks', json={})
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+def run(name, seconds, readers, writers):
+    from app import app
+    import util.api_catching as api_caching
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare(name, workdir)
+        context = multiprocessing.get_context('spawn')
+        counter = context.Value('i', 0)
+        processes = [context.Process(target=write_cache, args=(name, workdir, seconds + 1, counter)) for _ in range(writers)]
+        for process in processes:
+            process.start()
+        time.sleep(1)
+
+        latencies, errors = [], []
+        with layout(name, workdir), patch.dict(os.environ, {'WEATHER_API_KEY': 'bench'}):
+            api_caching.cache_table_initialized = True
+            deadline = time.perf_counter() + seconds
+            threads = [
+                threading.Thread(target=read_parks, args=(app.test_client(), deadline, latencies, errors))
+                for _ in range(readers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        for process in processes:
+            process.join()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'requests': len(latencies), 'errors': len(errors), 'writes': counter.value,
+        'p50_ms': quantiles[49] * 1000, 'p99_ms': quantiles[98] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.readers} get_parks threads, {args.writers} cache writer processes, {args.seconds:.0f} s per layout")
+    print(f"{'Layout':<16} {'Requests':>9} {'Errors':>7} {'Cache writes':>13} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name in ['shared file', 'split files']:
+        result = run(name, args.seconds, args.readers, args.writers)
+        print(f"{name:<16} {result['requests']:>9} {result['errors']:>7} {result['writes']:>13} "
+              f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
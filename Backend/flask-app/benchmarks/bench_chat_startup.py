@@ -0,0 +1,77 @@
+"""
+Benchmark chatbot start-up cost: the time to import the chatbot module and the
+latency of the first chat request, against a fake OpenAI client that adds a
+fixed delay to every remote call.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_chat_startup [--latency-ms 300]
+"""
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests'))
+from fake_openai import FakeOpenAI  # noqa: E402
+
+from util.database import SQLiteContextManager  # noqa: E402
+
+
+class SlowFakeOpenAI(FakeOpenAI):
+    """Fake client that sleeps on every remote call to mimic network latency."""
+    latency_sec = 0.3
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in ('_create_assistant', '_create_thread', '_create_message', '_stream_run'):
+            setattr(self, name, self._delayed(getattr(self, name)))
+        self.beta.assistants.create = self._create_assistant
+        self.beta.threads.create = self._create_thread
+        self.beta.threads.messages.create = self._create_message
+        self.beta.threads.runs.stream = self._stream_run
+
+    def _delayed(self, func):
+        def wrapper(*args, **kwargs):
+            time.sleep(self.latency_sec)
+            return func(*args, **kwargs)
+        return wrapper
+
+
+def run_once(db_path):
+    """Import the chatbot module fresh and time the import and first request."""
+    sys.modules.pop('route_handlers.chat.openai_chatbbot', None)
+    with patch.dict(os.environ, {'OPENAI_API_KEY': 'bench-key'}), patch('openai.OpenAI', SlowFakeOpenAI), \
+            patch('util.database.AppDatabaseContextManager', partial(SQLiteContextManager, db_path)):
+        start = time.perf_counter()
+        chatbot = importlib.import_module('route_handlers.chat.openai_chatbbot')
+        import_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        chatbot.send_prompt_and_get_response("How much screen time is OK?")
+        first_request_sec = time.perf_counter() - start
+    return import_sec, first_request_sec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency-ms', type=float, default=300, help="Simulated latency per remote call")
+    parser.add_argument('--workers', type=int, default=3, help="Number of simulated worker start-ups")
+    args = parser.parse_args()
+    SlowFakeOpenAI.latency_sec = args.latency_ms / 1000
+
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        for worker in range(args.workers):
+            import_sec, first_request_sec = run_once(db_path)
+            print(f"worker {worker + 1}: import {import_sec * 1000:8.1f} ms | first request {first_request_sec * 1000:8.1f} ms")
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare assessing a cohort one child at a time, as get_parental_guidance
+does, with the batch endpoint's vectorised assessment, on synthetic survey
+responses. Charts are timed separately: one per child for the scalar path,
+one for the whole cohort in batch.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_cohort_assessment [--responses 100000]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from app import app
+from route_handlers.learning_hub.get_questionnaire import SCORE_KEYS, assess_activity, create_spider_chart
+from route_handlers.parent.get_parental_guidance import SURVEY_VALUES
+
+WALK_OR_CYCLE_ANSWERS = ["Most of the time", "Sometimes", "Rarely or never"]
+
+
+def synthetic_responses(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {**{field: rng.randint(1, 4) for field in SURVEY_VALUES}, 'walkOrCycle': rng.choice(WALK_OR_CYCLE_ANSWERS)}
+        for _ in range(count)
+    ]
+
+
+def scalar_cohort(responses):
+    """Assess and serialise each response on its own, as get_parental_guidance does (without its chart)."""
+    lines = []
+    for response in responses:
+        values = [SURVEY_VALUES[field].get(response[field]) for field in SURVEY_VALUES]
+        result = assess_activity(*values, response['walkOrCycle'])
+        lines.append(json.dumps({"feedback": result['status'], "detailedAssessment": result['recommendations']}))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--responses', type=int, default=100_000)
+    args = parser.parse_args()
+
+    responses = synthetic_responses(args.responses)
+    body = json.dumps(responses)
+    print(f"{args.responses:,} responses, {len(body) / 1024 / 1024:.1f} MB of JSON")
+
+    started = time.perf_counter()
+    scalar_cohort(responses)
+    scalar_elapsed = time.perf_counter() - started
+
+    # Best of two, as the first chart also pays for loading matplotlib
+    chart_elapsed = float('inf')
+    for _ in range(2):
+        started = time.perf_counter()
+        chart_path = create_spider_chart({key: 50 for key in SCORE_KEYS})
+        chart_elapsed = min(chart_elapsed, time.perf_counter() - started)
+        os.remove(chart_path)
+
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post('/api/parent/get_cohort_guidance', data=body, content_type='application/json', buffered=False)
+    chunks = iter(response.response)
+    last_chunk = next(chunks)
+    first_elapsed = time.perf_counter() - started
+    size = len(last_chunk)
+    for chunk in chunks:
+        size, last_chunk = size + len(chunk), chunk
+    batch_elapsed = time.perf_counter() - started
+    response.close()
+    cohort = json.loads(last_chunk.decode().splitlines()[-1])['cohort']
+    if cohort['plotImageUrl']:
+        os.remove(cohort['plotImageUrl'].lstrip('/'))
+
+    print(f"Scalar assess_activity loop:   {scalar_elapsed:8.2f} s (+ {chart_elapsed * args.responses / 3600:,.1f} h of per-child charts at {chart_elapsed:.2f} s each)")
+    print(f"Batch endpoint, whole request: {batch_elapsed:8.2f} s, {size / 1024 / 1024:.1f} MB streamed, incl. one {chart_elapsed:.2f} s chart")
+    print(f"Batch endpoint, first results: {first_elapsed:8.2f} s")
+
+
+if __name__ == '__main__':
+    main()
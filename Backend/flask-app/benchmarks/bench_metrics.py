@@ -0,0 +1,122 @@
+"""
+Measure the overhead of the request and dependency metrics: the cost of each
+kind of recording, and the latency of a park search request and of an API
+cache hit with metrics recorded and with METRICS_ENABLED=0. Also times
+rendering /metrics.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_metrics [--requests 2000] [--rounds 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+import util.api_catching as api_caching
+import util.database as database
+from util import metrics
+from util.metrics import MetricsRegistry
+
+WEATHER_URL = 'http://api.openweathermap.org/data/2.5/weather'
+
+
+def per_call_ns(function, calls=200_000):
+    """Best-of-three nanoseconds per call of `function`."""
+    best = float('inf')
+    for _ in range(3):
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            function()
+        best = min(best, (time.perf_counter_ns() - started) / calls)
+    return best
+
+
+def recording_costs():
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_total', 'Benchmark counter.', ('namespace', 'result'))
+    gauge = registry.gauge('bench_in_flight', 'Benchmark gauge.', ('route',))
+    histogram = registry.histogram('bench_seconds', 'Benchmark histogram.', ('method', 'route', 'status'))
+    series = histogram.labels('GET', '/api/parks/search', 200)
+
+    def timed_block():
+        with series.time():
+            pass
+
+    def in_progress_block():
+        with gauge.labels('/api/parks/search').track_in_progress():
+            pass
+
+    operations = [
+        ('counter inc', lambda: counter.labels('api.example.com/data', 'hit').inc()),
+        ('histogram observe', lambda: histogram.labels('GET', '/api/parks/search', 200).observe(0.0123)),
+        ('timed block', timed_block),
+        ('in-progress block', in_progress_block),
+    ]
+    print(f"{'recording':<20}{'enabled ns':>12}{'disabled ns':>13}")
+    for name, operation in operations:
+        enabled = per_call_ns(operation)
+        with patch.object(metrics, 'enabled', False):
+            disabled = per_call_ns(operation)
+        print(f"{name:<20}{enabled:>12.0f}{disabled:>13.0f}")
+
+
+def request_latencies(function, requests, rounds):
+    """Median microseconds per call of `function`, with and without metrics, alternating rounds."""
+    timings = {True: [], False: []}
+    for _ in range(rounds):
+        for enabled in (True, False):
+            with patch.object(metrics, 'enabled', enabled):
+                started = time.perf_counter()
+                for _ in range(requests):
+                    function()
+                timings[enabled].append((time.perf_counter() - started) / requests * 1e6)
+    return statistics.median(timings[True]), statistics.median(timings[False])
+
+
+def end_to_end(requests, rounds):
+    from app import app
+
+    client = app.test_client()
+    workdir = tempfile.mkdtemp()
+    params = {'lat': -37.81, 'lon': 144.96, 'units': 'metric'}
+    try:
+        with patch.object(database, 'API_CACHE_DATABASE_PATH', os.path.join(workdir, 'api_cache.db')), \
+                patch.object(database, 'API_CACHE_SHARDS', 1), \
+                patch.object(api_caching, 'API_CACHE_SHARDS', 1), \
+                patch.object(api_caching, 'cache_table_initialized', False):
+            api_caching.initialize_cache_table()
+            api_caching.cache_response(api_caching.default_cache_key_gen(WEATHER_URL, params), {'main': {'temp': 20}})
+            client.get('/api/parks/search?q=fitzroy')
+
+            cases = [
+                ('search request', lambda: client.get('/api/parks/search?q=fitzroy')),
+                ('api cache hit', lambda: api_caching.make_api_request(WEATHER_URL, params=params)),
+            ]
+            print(f"\n{'call':<20}{'enabled us':>12}{'disabled us':>13}{'overhead':>10}")
+            for name, function in cases:
+                enabled, disabled = request_latencies(function, requests, rounds)
+                print(f"{name:<20}{enabled:>12.1f}{disabled:>13.1f}{(enabled - disabled) / disabled:>10.1%}")
+
+            started = time.perf_counter()
+            with patch.object(metrics, 'public', True):
+                body = client.get('/metrics').get_data(as_text=True)
+            print(f"\n/metrics: {len(body.splitlines())} lines in {(time.perf_counter() - started) * 1000:.2f} ms")
+    finally:
+        shutil.rmtree(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help="Calls per round")
+    parser.add_argument('--rounds', type=int, default=5, help="Rounds with and without metrics")
+    args = parser.parse_args()
+
+    recording_costs()
+    end_to_end(args.requests, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Measure the memory each worker process spends on the park catalog, and how
+long a new worker takes to be ready to serve the safety map, when every worker
+builds its own copy of the catalog from the serving database (as each request
+used to) and when workers map the shared catalog file.
+
+The catalog is built from a synthetic serving database with the real schema.
+All workers in a run are alive at once, so PSS (proportional set size: shared
+pages divided among the processes mapping them) shows the real cost per worker.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_park_catalog [--locations 1000000] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+import util.database as database
+
+MEGABYTE = 1024 * 1024
+
+
+def build_serving_database(path, locations, suburbs=3000):
+    """A serving database with the real schema and `locations` synthetic locations."""
+    serving = sqlite3.connect(f'file:{database.SERVING_DATABASE_PATH}?mode=ro', uri=True)
+    schema = serving.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "AND tbl_name IN ('Location', 'Crime', 'Accident', 'Landmark', 'Facility', 'Playground') ORDER BY type = 'index'"
+    ).fetchall()
+    serving.close()
+
+    connection = sqlite3.connect(path)
+    for (sql,) in schema:
+        connection.execute(sql)
+    connection.executescript(f"""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {locations})
+        INSERT INTO Location (location_id, latitude, longitude, suburb_id)
+        SELECT i, -38 + (i % 1000) / 1000.0, 144 + (i / 1000) / 1000.0, 1 + i % {suburbs} FROM n;
+
+        INSERT INTO Facility (facility_id, facility_name, sports_played, location_id)
+        SELECT 'F' || location_id, 'Facility ' || (location_id % 5000), 'Tennis', location_id FROM Location WHERE location_id % 3 = 0;
+        INSERT INTO Landmark (landmark_id, landmark_name, landmark_type, location_id)
+        SELECT location_id, 'Landmark ' || location_id, 'Reserve', location_id FROM Location WHERE location_id % 3 = 1;
+        INSERT INTO Playground (playground_id, playground_name, location_id)
+        SELECT location_id, 'Playground ' || (location_id % 20000), location_id FROM Location WHERE location_id % 3 = 2;
+
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {suburbs})
+        INSERT INTO Crime (crime_id, incidents_recorded_2014_2023, suburb_id) SELECT i, i * 7 % 20000, i FROM n;
+        INSERT INTO Accident (id, total_accidents, suburb_id) SELECT suburb_id, incidents_recorded_2014_2023 % 3000, suburb_id FROM Crime;
+
+        ANALYZE;
+    """)
+    connection.commit()
+    connection.close()
+
+
+def memory_mb():
+    """Resident, proportional and peak resident set size of this process, in MB."""
+    with open('/proc/self/smaps_rollup') as file:
+        fields = dict(line.split(':', 1) for line in file if ':' in line)
+    with open('/proc/self/status') as file:
+        peak = next(int(line.split()[1]) for line in file if line.startswith('VmHWM:'))
+    return int(fields['Rss'].split()[0]) / 1024, int(fields['Pss'].split()[0]) / 1024, peak / 1024
+
+
+def touch(columns):
+    """Read every column value once, as serving the full safety map does."""
+    return sum(float(column.sum()) for column in columns.values())
+
+
+def worker(mode, serving_path, catalog_dir, results, loaded, finish):
+    """Worker process: load the catalog, report its cost, and hold it until told to exit."""
+    from route_handlers.parks import park_catalog
+
+    database.SERVING_DATABASE_PATH = serving_path
+    park_catalog.PARK_CATALOG_DIR = catalog_dir
+    before = memory_mb()
+
+    started = time.perf_counter()
+    if mode == 'own copy':
+        with database.SafetyMapDatabaseContextManager() as connection:
+            columns, *_ = park_catalog.catalog_rows(connection)
+    else:
+        columns = park_catalog.get_park_catalog().columns
+    touch(columns)
+    ready = time.perf_counter() - started
+
+    loaded.wait()
+    results.put((ready, *(after - start for after, start in zip(memory_mb(), before))))
+    finish.wait()
+
+
+def run(mode, workers, serving_path, catalog_dir):
+    """Start `workers` processes together; return (ready s, RSS, PSS, peak RSS MB) per worker."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    loaded = context.Barrier(workers + 1)
+    finish = context.Event()
+    processes = [
+        context.Process(target=worker, args=(mode, serving_path, catalog_dir, results, loaded, finish))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    loaded.wait()
+    measurements = [results.get() for _ in processes]
+    finish.set()
+    for process in processes:
+        process.join()
+    return measurements
+
+
+def report(label, measurements):
+    for ready, rss, pss, peak in measurements:
+        print(f"{label:<26} {ready * 1000:>10.0f} {rss:>9.1f} {pss:>9.1f} {peak:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locations', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        serving_path = os.path.join(workdir, 'ILikeToMoveIt.db')
+        catalog_dir = os.path.join(workdir, 'park_catalog')
+        build_serving_database(serving_path, args.locations)
+
+        print(f"{args.locations:,} locations, {args.workers} workers alive at once")
+        print(f"{'Worker':<26} {'Ready (ms)':>10} {'RSS (MB)':>9} {'PSS (MB)':>9} {'Peak (MB)':>10}")
+        report('own copy', run('own copy', args.workers, serving_path, catalog_dir))
+        report('mapped, builds catalog', run('mapped', 1, serving_path, catalog_dir))
+        size = sum(os.path.getsize(os.path.join(catalog_dir, name)) for name in os.listdir(catalog_dir))
+        report('mapped, new worker', run('mapped', args.workers, serving_path, catalog_dir))
+        print(f"Catalog file: {size / MEGABYTE:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark "which park am I in" lookups: R-tree candidate search plus exact
+point-in-polygon tests, against a linear scan over every polygon.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_park_containment [--parks 10000] [--queries 2000]
+"""
+import argparse
+import math
+import time
+import numpy as np
+from route_handlers.parks.park_containment import ParkContainmentIndex, PolygonEdges
+
+
+def synthetic_parks(count, seed=0):
+    """Irregular 24-sided polygons scattered over a Melbourne-sized area."""
+    rng = np.random.default_rng(seed)
+    parks = []
+    for park_id in range(count):
+        center_x, center_y = rng.uniform(144.5, 145.5), rng.uniform(-38.3, -37.5)
+        angles = np.linspace(0, 2 * math.pi, 25)
+        radius = rng.uniform(0.0005, 0.003) * rng.uniform(0.7, 1.0, 25)
+        radius[-1] = radius[0]
+        ring = np.column_stack([center_x + radius * np.cos(angles), center_y + radius * np.sin(angles)])
+        parks.append(({"name": f"Park {park_id}"}, [[ring.tolist()]]))
+    return parks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--parks', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    parks = synthetic_parks(args.parks)
+    started = time.perf_counter()
+    index = ParkContainmentIndex(parks)
+    build_sec = time.perf_counter() - started
+
+    rng = np.random.default_rng(1)
+    queries = np.column_stack([rng.uniform(-38.3, -37.5, args.queries), rng.uniform(144.5, 145.5, args.queries)])
+
+    started = time.perf_counter()
+    indexed = [index.containing(lat, lon) for lat, lon in queries]
+    indexed_sec = time.perf_counter() - started
+
+    # Baseline: exact test against every polygon
+    polygons = [(properties, PolygonEdges(multipolygon[0])) for properties, multipolygon in parks]
+    scanned_queries = queries[:max(1, args.queries // 20)]
+    started = time.perf_counter()
+    scanned = [[p for p, polygon in polygons if polygon.contains(lon, lat)] for lat, lon in scanned_queries]
+    scan_sec = time.perf_counter() - started
+    assert scanned == indexed[:len(scanned)], "R-tree lookup disagrees with the linear scan"
+
+    hits = sum(1 for parks_found in indexed if parks_found)
+    print(f"{args.parks} parks, index built in {build_sec * 1000:.0f} ms")
+    print(f"R-tree lookup: {indexed_sec / args.queries * 1e6:.1f} us per query ({hits} of {args.queries} inside a park)")
+    print(f"Linear scan:   {scan_sec / len(scanned_queries) * 1e6:.1f} us per query")
+
+
+if __name__ == '__main__':
+    main()
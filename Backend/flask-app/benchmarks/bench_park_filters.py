@@ -0,0 +1,71 @@
+"""
+Compare serving the whole safety map, as get_parks does without options,
+against filtered pages served from the inverted index: time per request and
+response size, on a synthetic catalog.
+
+Weather lookups are answered in memory, so only the server's own work is timed.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_park_filters [--locations 1000000] [--limit 100]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.bench_park_catalog import build_serving_database
+from route_handlers.parks.get_crime_accident_safety import get_safety_data
+from route_handlers.parks.park_catalog import open_catalog
+from route_handlers.parks.park_filters import get_filter_index, get_safety_page, parse_filter_options
+from util.database import SafetyMapDatabaseContextManager
+
+
+def fake_weather(lat, lon, *args, **kwargs):
+    return {'weather': [{'main': 'Rain' if round(lat * 100) % 3 == 0 else 'Clear'}]}
+
+
+def timed(func, repeat=3):
+    """Best time of a few runs, and the JSON size of the result."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, len(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locations', type=int, default=1_000_000)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather):
+        serving_path = os.path.join(workdir, 'ILikeToMoveIt.db')
+        build_serving_database(serving_path, args.locations)
+        catalog = open_catalog(lambda: SafetyMapDatabaseContextManager(serving_path), os.path.join(workdir, 'park_catalog'))
+
+        started = time.perf_counter()
+        get_filter_index(catalog)
+        print(f"{args.locations:,} locations; filter index built in {time.perf_counter() - started:.2f} s")
+
+        cases = [
+            ('first page, no filter', {}),
+            ('sport', {'sport': 'tennis'}),
+            ('facility + min rating', {'facility': 'Reserve', 'minSafetyRating': 4}),
+            ('name prefix', {'namePrefix': 'Playground 12'}),
+        ]
+        print(f"{'Request':<26} {'Time (ms)':>10} {'Response (KB)':>14}")
+        elapsed, size = timed(lambda: get_safety_data(catalog), repeat=1)
+        print(f"{'whole map':<26} {elapsed * 1000:>10.1f} {size / 1024:>14,.0f}")
+        for label, filters in cases:
+            options = parse_filter_options({**filters, 'limit': args.limit})
+            elapsed, size = timed(lambda: get_safety_page(catalog, options))
+            print(f"{label:<26} {elapsed * 1000:>10.1f} {size / 1024:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
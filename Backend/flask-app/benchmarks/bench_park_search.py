@@ -0,0 +1,97 @@
+"""
+Time search-as-you-type over a synthetic catalog of park, playground,
+landmark and facility names: every prefix of a few queries is searched as
+though typed one keystroke at a time, with and without a user location.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_park_search [--names 100000] [--limit 10]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from route_handlers.parks.park_search import NameSearchIndex
+
+PLACES = [
+    'Albert', 'Balaclava', 'Brunswick', 'Carlton', 'Coburg', 'Collingwood', 'Docklands', 'Elsternwick',
+    'Fitzroy', 'Flemington', 'Footscray', 'Hawthorn', 'Kensington', 'Malvern', 'Northcote', 'Parkville',
+    'Prahran', 'Richmond', 'Sandringham', 'Southbank', 'St Kilda', 'Thornbury', 'Williamstown', 'Yarraville',
+]
+NAMED_AFTER = [
+    'Alexandra', 'Barkly', 'Birrarung', 'Edinburgh', 'Flagstaff', 'Gosch', 'Harmony', 'Ievers', 'Kings',
+    'Merri', 'Princes', 'Queens', 'Royal', 'Ruckers', 'Victoria', 'Wattle', 'Wurundjeri', 'Yarra',
+]
+FEATURES = [
+    'Park', 'Gardens', 'Reserve', 'Playground', 'Oval', 'Recreation Reserve', 'Tennis Club', 'Skate Park',
+    'Aquatic Centre', 'Bowls Club', 'Sports Ground', 'Wetlands', 'Nature Play Space', 'Community Garden',
+]
+KINDS = ['landmark', 'facility', 'playground']
+
+# Syllables of made-up surnames, so the catalog has tens of thousands of distinct words
+SYLLABLES = ['ba', 'ber', 'cal', 'dun', 'el', 'fen', 'gar', 'hol', 'ing', 'kel', 'lan', 'mor', 'nor', 'os', 'pen', 'quin', 'ros', 'sted', 'ton', 'wick']
+
+# (query typed, and a label) for the keystroke timings
+QUERIES = [
+    ('fitzroy gardens', 'prefix'),
+    ('st kilda skate park', 'several words'),
+    ('wurundjeri playgrnd', 'typo'),
+    ('aquatic', 'common word'),
+    ('garmorton reserve', 'rare word'),
+]
+
+
+def synthetic_rows(count, seed=0):
+    """`count` names spread over greater Melbourne, built from common park name parts."""
+    rng = random.Random(seed)
+    rows = []
+    for location_id in range(count):
+        if rng.random() < 0.5:
+            parts = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()]
+        else:
+            parts = [rng.choice(PLACES + NAMED_AFTER)]
+        if rng.random() < 0.3:
+            parts.append(rng.choice(NAMED_AFTER))
+        parts.append(rng.choice(FEATURES))
+        if rng.random() < 0.5:
+            parts.append(str(rng.randrange(1, 400)))
+        rows.append((location_id, rng.uniform(-38.2, -37.5), rng.uniform(144.5, 145.5), rng.choice(KINDS), ' '.join(parts)))
+    return rows
+
+
+def keystroke_times(index, query, limit, location):
+    """Time to search each prefix of `query`, in milliseconds."""
+    times = []
+    for end in range(1, len(query) + 1):
+        started = time.perf_counter()
+        index.search(query[:end], limit, *location)
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--names', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.names)
+    started = time.perf_counter()
+    index = NameSearchIndex(rows)
+    print(f"{len(index):,} names, {len(index.words):,} distinct words; index built in {time.perf_counter() - started:.2f} s")
+
+    print(f"{'Query':<22} {'Location':<9} {'Mean (ms)':>10} {'Max (ms)':>9}")
+    every = []
+    for location_label, location in [('no', (None, None)), ('yes', (-37.81, 144.96))]:
+        for query, label in QUERIES:
+            # Warm up once, then keep the best of three runs per keystroke
+            keystroke_times(index, query, args.limit, location)
+            runs = [keystroke_times(index, query, args.limit, location) for _ in range(3)]
+            times = [min(keystroke) for keystroke in zip(*runs)]
+            every += times
+            print(f"{label:<22} {location_label:<9} {statistics.mean(times):>10.2f} {max(times):>9.2f}")
+    print(f"All keystrokes: mean {statistics.mean(every):.2f} ms, max {max(every):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
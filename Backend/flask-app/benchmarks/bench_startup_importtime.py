@@ -0,0 +1,71 @@
+"""
+Benchmark Flask cold-start cost with `python -X importtime -c "import app"`.
+
+Reports the cumulative import time of the app and its slowest imports, and
+exits with status 1 when the best of several runs exceeds the budget.
+
+Run from Backend/flask-app:
+    python -m benchmarks.bench_startup_importtime [--runs 5] [--budget-ms 300]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Start-up budget for importing the app, in milliseconds
+DEFAULT_BUDGET_MS = 300
+
+
+def measure_import(module='app'):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+    - Tuple: Cumulative import time of the module in microseconds, and a dict of
+      the cumulative times of the modules it imports directly.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=APP_DIR, capture_output=True, text=True, check=True,
+    )
+    # importtime lists children before their parent, indented by two spaces per level
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name == module:
+                return int(cumulative), children
+            children = {}
+        elif depth == 1:
+            children[name.strip()] = int(cumulative)
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    runs = [measure_import() for _ in range(args.runs)]
+    app_us, children = min(runs, key=lambda run: run[0])
+    app_ms = app_us / 1000
+
+    print(f"import app: best {app_ms:.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest imports made directly by app:")
+    for name, us in sorted(children.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if app_ms > args.budget_ms:
+        print(f"FAIL: start-up import time {app_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import Counter, defaultdict
+from util.database import AppDatabaseContextManager
+
+# Defaults, overridable through environment variables
+DEFAULT_SIMILARITY_THRESHOLD = 0.85
+DEFAULT_TTL_SEC = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_REFRESH_SEC = 30
+
+# Entries are added to and removed from the index in place; its IDF weights
+# are recomputed once this fraction of the entries has changed since the last time
+REBUILD_FRACTION = 0.1
+
+# Longest question, in words, that is answered from or stored in the cache;
+# longer prompts tend to describe the asker's own situation
+MAX_CACHEABLE_WORDS = 25
+
+# Words that make a question about the asker rather than a general one
+# (apostrophes are stripped, so "I'm" and "we're" contain "i" and "we")
+PERSONAL_WORDS = {'i', 'my', 'mine', 'myself', 'we', 'our', 'ours', 'ourselves'}
+
+# Words that carry no meaning for matching questions
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'am', 'be', 'to', 'of', 'do', 'does', 'i', 'me', 'my',
+    'you', 'your', 'please', 'can', 'could', 'would', 'tell', 'pal', 'hi', 'hello', 'hey',
+}
+
+
+def normalise_question(text):
+    """
+    Lowercase a question, strip punctuation and collapse whitespace.
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def is_general_question(normalised):
+    """
+    Whether a normalised question is general enough to share one answer
+    between users: short, with no first-person words and no numbers (ages,
+    addresses, phone numbers).
+    """
+    words = normalised.split()
+    return (
+        0 < len(words) <= MAX_CACHEABLE_WORDS
+        and not PERSONAL_WORDS.intersection(words)
+        and not any(character.isdigit() for character in normalised)
+    )
+
+
+def tokenize(normalised):
+    """
+    Split a normalised question into unigram and bigram terms, ignoring stopwords.
+    """
+    words = [word for word in normalised.split() if word not in STOPWORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class AnswerCache:
+    """
+    Answers repeated chatbot questions locally from previously generated replies.
+
+    Questions are matched with TF-IDF cosine similarity over an inverted index, so
+    a lookup only scores entries that share at least one term with the question.
+    Storing an answer updates the index in place; the IDF weights of existing
+    entries are refreshed in a full rebuild once REBUILD_FRACTION of the
+    entries have changed.
+    Only general questions (see is_general_question) are answered or stored, so
+    one user's personal details are never served to another.
+
+    Answers are persisted in the app database and expire after `ttl_sec`. Each
+    worker reads the answers other workers stored at most `refresh_sec` after
+    they were stored.
+    """
+    def __init__(self, threshold=DEFAULT_SIMILARITY_THRESHOLD, ttl_sec=DEFAULT_TTL_SEC,
+                 max_entries=DEFAULT_MAX_ENTRIES, refresh_sec=DEFAULT_REFRESH_SEC,
+                 db_manager=AppDatabaseContextManager, clock=time.time):
+        self.threshold = threshold
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.refresh_sec = refresh_sec
+        self._db_manager = db_manager
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._refreshed_at = None
+        self._loaded_until = 0.0     # newest timestamp read from the database
+        self._changes = 0           # entries added or removed since the last rebuild
+        self._entries = {}          # normalised question -> (answer, created timestamp)
+        self._vectors = {}          # normalised question -> {term: weight}
+        self._postings = defaultdict(set)
+        self._document_frequency = Counter()
+        self._idf = {}
+
+        # Metrics
+        self.lookups = 0
+        self.hits = 0
+        self.remote_calls = 0
+        self.remote_total_sec = 0.0
+        self.lookup_total_sec = 0.0
+
+    # Persistence
+    def initialize_table(self):
+        """Create the answer cache table if it does not exist."""
+        with self._db_manager() as conn:
+            conn.cursor().execute("""
+            CREATE TABLE IF NOT EXISTS chatbot_answer_cache (
+                question TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                timestamp REAL
+            )
+            """)
+            conn.commit()
+
+    def _load(self):
+        """
+        Read the answers stored since the last read, by this or any other
+        worker, creating the table on first use.
+        """
+        if not self._loaded:
+            self.initialize_table()
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT question, answer, timestamp FROM chatbot_answer_cache WHERE timestamp > ? AND timestamp >= ?",
+                (self._loaded_until, self._clock() - self.ttl_sec),
+            )
+            rows = cursor.fetchall()
+
+        for question, answer, timestamp in rows:
+            if is_general_question(question):
+                self._add(question, answer, timestamp)
+            self._loaded_until = max(self._loaded_until, timestamp)
+        self._evict()
+        if not self._loaded:
+            self._rebuild()
+        self._loaded = True
+        self._refreshed_at = self._clock()
+
+    # Index
+    def _rebuild(self):
+        """Recompute IDF weights, vectors and postings for all entries."""
+        terms_by_question = {question: Counter(tokenize(question)) for question in self._entries}
+        self._document_frequency = Counter()
+        for terms in terms_by_question.values():
+            self._document_frequency.update(terms.keys())
+
+        total = len(terms_by_question)
+        self._idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in self._document_frequency.items()}
+        self._vectors = {question: self._vectorize(terms) for question, terms in terms_by_question.items()}
+        self._postings = defaultdict(set)
+        for question, vector in self._vectors.items():
+            for term in vector:
+                self._postings[term].add(question)
+        self._changes = 0
+
+    def _add(self, question, answer, timestamp):
+        """
+        Add or replace an entry, indexing it with the current IDF weights.
+        Terms new to the index are weighted from the current document counts.
+        """
+        if question in self._entries:
+            self._remove(question)
+        self._entries[question] = (answer, timestamp)
+        terms = Counter(tokenize(question))
+        self._document_frequency.update(terms.keys())
+        total = len(self._entries)
+        for term in terms:
+            if term not in self._idf:
+                self._idf[term] = math.log((1 + total) / (1 + self._document_frequency[term])) + 1
+        vector = self._vectorize(terms)
+        self._vectors[question] = vector
+        for term in vector:
+            self._postings[term].add(question)
+        self._changes += 1
+
+    def _remove(self, question):
+        """Remove an entry from the entries and the index."""
+        del self._entries[question]
+        for term in self._vectors.pop(question, {}):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.discard(question)
+                if not postings:
+                    del self._postings[term]
+        self._document_frequency.subtract(Counter(tokenize(question)).keys())
+        self._changes += 1
+
+    def _vectorize(self, terms):
+        """Build an L2-normalised TF-IDF vector, skipping terms unseen by the index."""
+        vector = {term: count * self._idf[term] for term, count in terms.items() if term in self._idf}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def _is_fresh(self, timestamp):
+        return self._clock() - timestamp <= self.ttl_sec
+
+    # Public API
+    def lookup(self, question):
+        """
+        Return a cached answer for a question, or None if no fresh entry is
+        similar enough or the question is personal.
+        """
+        started = time.perf_counter()
+        normalised = normalise_question(question)
+        with self._lock:
+            if not self._loaded or self._clock() - self._refreshed_at >= self.refresh_sec:
+                self._load()
+            if self._changes > REBUILD_FRACTION * len(self._entries):
+                self._rebuild()
+
+            query = self._vectorize(Counter(tokenize(normalised))) if is_general_question(normalised) else {}
+            scores = defaultdict(float)
+            for term, weight in query.items():
+                for candidate in self._postings.get(term, ()):
+                    scores[candidate] += weight * self._vectors[candidate][term]
+
+            answer = None
+            for candidate, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+                if score < self.threshold:
+                    break
+                cached_answer, timestamp = self._entries[candidate]
+                if self._is_fresh(timestamp):
+                    answer = cached_answer
+                    break
+
+            self.lookups += 1
+            if answer is not None:
+                self.hits += 1
+            self.lookup_total_sec += time.perf_counter() - started
+        return answer
+
+    def store(self, question, answer, remote_sec=None):
+        """
+        Cache an answer generated by the assistant, unless the question is personal.
+
+        Parameters:
+        - question (str): The user's question.
+        - answer (str): The assistant's reply.
+        - remote_sec (float): How long the assistant took, used to report latency saved.
+        """
+        normalised = normalise_question(question)
+        timestamp = self._clock()
+        with self._lock:
+            if remote_sec is not None:
+                self.remote_calls += 1
+                self.remote_total_sec += remote_sec
+            if not answer or not is_general_question(normalised):
+                return
+            if not self._loaded:
+                self._load()
+            self._add(normalised, answer, timestamp)
+            self._evict()
+
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT OR REPLACE INTO chatbot_answer_cache (question, answer, timestamp) VALUES (?, ?, ?)",
+                (normalised, answer, timestamp),
+            )
+            cursor.execute("DELETE FROM chatbot_answer_cache WHERE timestamp < ?", (timestamp - self.ttl_sec,))
+            conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the oldest ones beyond `max_entries`."""
+        for question, (_, timestamp) in list(self._entries.items()):
+            if not self._is_fresh(timestamp):
+                self._remove(question)
+        excess = len(self._entries) - self.max_entries
+        if excess > 0:
+            cached = sorted((timestamp, question) for question, (_, timestamp) in self._entries.items())
+            for _, question in cached[:excess]:
+                self._remove(question)
+
+    def stats(self):
+        """
+        Return hit-rate and latency metrics. Latency saved is estimated from the
+        average assistant response time.
+        """
+        avg_remote_sec = self.remote_total_sec / self.remote_calls if self.remote_calls else None
+        avg_lookup_sec = self.lookup_total_sec / self.lookups if self.lookups else 0.0
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hitRate": self.hits / self.lookups if self.lookups else 0.0,
+            "avgLookupMs": round(avg_lookup_sec * 1000, 3),
+            "avgAssistantMs": round(avg_remote_sec * 1000, 1) if avg_remote_sec is not None else None,
+            "estimatedSavedMs": round(self.hits * (avg_remote_sec - avg_lookup_sec) * 1000, 1) if avg_remote_sec is not None else None,
+        }
+
+
+def create_answer_cache():
+    """
+    Build the answer cache configured through environment variables, or None if disabled.
+
+    Environment variables:
+    - CHAT_ANSWER_CACHE: Set to 'false' to always ask the assistant.
+    - CHAT_ANSWER_CACHE_THRESHOLD: Minimum cosine similarity for a cached answer to be used.
+    - CHAT_ANSWER_CACHE_TTL_SEC: Age after which a cached answer is no longer used.
+    - CHAT_ANSWER_CACHE_REFRESH_SEC: How often each worker reads answers stored by the others.
+    """
+    if os.getenv('CHAT_ANSWER_CACHE', 'true').lower() in ('0', 'false', 'no'):
+        return None
+    return AnswerCache(
+        threshold=float(os.getenv('CHAT_ANSWER_CACHE_THRESHOLD', DEFAULT_SIMILARITY_THRESHOLD)),
+        ttl_sec=int(os.getenv('CHAT_ANSWER_CACHE_TTL_SEC', DEFAULT_TTL_SEC)),
+        refresh_sec=float(os.getenv('CHAT_ANSWER_CACHE_REFRESH_SEC', DEFAULT_REFRESH_SEC)),
+    )
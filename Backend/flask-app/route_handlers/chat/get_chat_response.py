@@ -1,15 +1,77 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 import datetime
+import os
+import threading
+import time
 import uuid
-from .openAi_chatbot import send_prompt_and_get_response
+from util.session_store import create_session_store
+from util.concurrency_gate import DEFAULT_LEASE_SEC, ConcurrencyGate, GateSaturated, SharedSlots
+from util.metrics import registry
+from util.sse import format_sse
+from .answer_cache import create_answer_cache
+from .openAi_chatbot import send_prompt_and_get_response, stream_prompt_response
+
+# Bounded session storage (in-memory per worker, or SQLite shared across workers)
+session_store = create_session_store()
+
+# Local answers for repeated opening questions (None when disabled)
+answer_cache = create_answer_cache()
+
+# Bound concurrent assistant runs so a burst of chat traffic cannot tie up every
+# worker. CHAT_MAX_CONCURRENT holds across every worker on the machine, unless
+# CHAT_GATE_SCOPE=worker makes it a limit per worker
+max_concurrent_runs = int(os.getenv('CHAT_MAX_CONCURRENT', 4))
+chat_gate = ConcurrencyGate(
+    max_concurrent=max_concurrent_runs,
+    max_queue=int(os.getenv('CHAT_MAX_QUEUE', 16)),
+    max_queue_per_key=int(os.getenv('CHAT_MAX_QUEUE_PER_SESSION', 2)),
+    max_wait_sec=float(os.getenv('CHAT_MAX_QUEUE_WAIT_SEC', 10)),
+    shared=None if os.getenv('CHAT_GATE_SCOPE', 'machine').lower() == 'worker' else SharedSlots(
+        'chat', max_concurrent_runs, lease_sec=float(os.getenv('CHAT_SLOT_LEASE_SEC', DEFAULT_LEASE_SEC)),
+    ),
+)
+
+# Time-to-first-token metrics for streamed responses
+stream_metrics = {'streams': 0, 'ttft_count': 0, 'ttft_total_sec': 0.0, 'ttft_max_sec': 0.0}
+stream_metrics_lock = threading.Lock()
+
+# Assistant latency and concurrency, for the /metrics endpoint
+assistant_latency = registry.histogram(
+    'chat_assistant_duration_seconds', 'Time an assistant run holds a chat slot, by blocking or streamed reply.', ('mode',),
+)
+first_token_latency = registry.histogram(
+    'chat_time_to_first_token_seconds', 'Time between receiving a prompt and streaming its first delta.',
+)
+registry.gauge_function('chat_assistant_runs_in_flight', 'Assistant runs holding a chat slot.', lambda: chat_gate.in_flight)
+registry.gauge_function('chat_queue_depth', 'Chat requests waiting for a slot.', lambda: chat_gate.stats()['queueDepth'])
+
+
+def new_session_id():
+    """Generate a unique, time-ordered session ID."""
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    return f"{timestamp}_{uuid.uuid4().hex[:8]}"
+
+
+def record_time_to_first_token(seconds):
+    """Record the time between receiving a prompt and sending its first delta."""
+    with stream_metrics_lock:
+        stream_metrics['ttft_count'] += 1
+        stream_metrics['ttft_total_sec'] += seconds
+        stream_metrics['ttft_max_sec'] = max(stream_metrics['ttft_max_sec'], seconds)
+    first_token_latency.labels().observe(seconds)
+
+
+def saturated_response(error):
+    """Build a 429/503 response with a Retry-After header for a rejected chat request."""
+    response = jsonify({'error': str(error), 'retryAfter': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status_code
 
-# In-memory session storage
-sessions = {}
 
 def get_chat_response():
     """
     Handle chat requests by interacting with the OpenAI-powered chatbot.
-    Each session maintains a conversation context using in-memory storage.
+    Each session maps to an OpenAI thread held in the configured session store.
 
     Returns:
         - JSON response with AI reply and session ID.
@@ -24,20 +86,144 @@ def get_chat_response():
     session_id = data.get('sessionId', None)
 
     # Create a new session if no sessionId is provided or the session is invalid
-    if session_id is None or session_id not in sessions:
-        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-        unique_id = f"{timestamp}_{uuid.uuid4().hex[:8]}"
-        session_id = str(unique_id)
-        sessions[session_id] = {'thread_id': None, 'conversation': []}
+    session = session_store.get(session_id)
+    if session is None:
+        session_id = new_session_id()
+        session = {'thread_id': None, 'conversation': []}
 
     # Retrieve the thread ID for the session
-    thread_id = sessions[session_id].get('thread_id')
+    thread_id = session.get('thread_id')
+
+    # Opening questions have no context, so they can be answered from the local cache
+    use_answer_cache = answer_cache is not None and not session['conversation']
+    ai_response = answer_cache.lookup(user_message) if use_answer_cache else None
 
     # Get response from the chatbot
-    ai_response, thread_id = send_prompt_and_get_response(user_message, thread_id)
+    if ai_response is None:
+        try:
+            with chat_gate.slot(session_id):
+                started = time.perf_counter()
+                ai_response, thread_id = send_prompt_and_get_response(user_message, thread_id, session['conversation'])
+                assistant_latency.labels('blocking').observe(time.perf_counter() - started)
+        except GateSaturated as e:
+            return saturated_response(e)
+        if use_answer_cache:
+            answer_cache.store(user_message, ai_response, time.perf_counter() - started)
 
     # Update session with thread ID and conversation
-    sessions[session_id]['thread_id'] = thread_id
-    sessions[session_id]['conversation'].append({"user": user_message, "ai": ai_response})
+    session_store.record_turn(session_id, thread_id, user_message, ai_response)
 
     return jsonify({'reply': ai_response, 'sessionId': session_id}), 200
+
+
+def get_chat_response_stream():
+    """
+    Streaming variant of `get_chat_response` that forwards the reply to the
+    client as Server-Sent Events while the assistant is still generating it.
+
+    Events:
+        - `session`: Sent first, with the session ID.
+        - (default): One per text delta, as `{"delta": "..."}`.
+        - `done`: Sent last, with the session ID and time to first token.
+        - `error`: Sent instead of `done` if the assistant run fails.
+
+    Returns:
+        - A `text/event-stream` response, or a JSON error if the input is invalid.
+    """
+    started = time.perf_counter()
+    data = request.get_json()
+
+    # Validate the input message
+    if not data or 'message' not in data:
+        return jsonify({'error': 'No message provided'}), 400
+
+    user_message = data['message']
+    session_id = data.get('sessionId', None)
+
+    session = session_store.get(session_id)
+    if session is None:
+        session_id = new_session_id()
+        session = {'thread_id': None, 'conversation': []}
+
+    thread_id = session.get('thread_id')
+    use_answer_cache = answer_cache is not None and not session['conversation']
+    cached_answer = answer_cache.lookup(user_message) if use_answer_cache else None
+    holds_slot = cached_answer is None
+    if cached_answer is not None:
+        text_deltas = iter([cached_answer])
+    else:
+        # The slot is held until the stream finishes, and released by the generator
+        try:
+            chat_gate.acquire(session_id)
+        except GateSaturated as e:
+            return saturated_response(e)
+        slot_started = time.perf_counter()
+        try:
+            text_deltas, thread_id = stream_prompt_response(user_message, thread_id, session['conversation'])
+        except Exception:
+            chat_gate.release()
+            raise
+
+    released = []
+
+    def release_slot():
+        # Called when the stream ends, or when the response is closed before it is consumed
+        if holds_slot and not released:
+            released.append(True)
+            service_sec = time.perf_counter() - slot_started
+            chat_gate.release(service_sec)
+            assistant_latency.labels('stream').observe(service_sec)
+
+    def generate():
+        yield format_sse({'sessionId': session_id}, event='session')
+        reply = []
+        time_to_first_token = None
+        try:
+            for text in text_deltas:
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - started
+                    record_time_to_first_token(time_to_first_token)
+                reply.append(text)
+                yield format_sse({'delta': text})
+        except Exception as e:
+            yield format_sse({'error': str(e)}, event='error')
+            return
+        finally:
+            release_slot()
+            with stream_metrics_lock:
+                stream_metrics['streams'] += 1
+
+        ai_response = "".join(reply)
+        if use_answer_cache and cached_answer is None:
+            answer_cache.store(user_message, ai_response, time.perf_counter() - started)
+        session_store.record_turn(session_id, thread_id, user_message, ai_response)
+        yield format_sse({
+            'sessionId': session_id,
+            'timeToFirstTokenMs': round(time_to_first_token * 1000, 1) if time_to_first_token is not None else None,
+        }, event='done')
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+    response.call_on_close(release_slot)
+    return response
+
+
+def get_chat_session_stats():
+    """
+    Report size, memory and hit-rate metrics for the chat session store, along
+    with time-to-first-token metrics for streamed responses, answer cache hit
+    rate and latency saved, and assistant queue depth and wait times.
+
+    Returns:
+        - JSON response with session store, streaming, answer cache and concurrency metrics.
+    """
+    with stream_metrics_lock:
+        ttft_count = stream_metrics['ttft_count']
+        streaming = {
+            'streams': stream_metrics['streams'],
+            'avgTimeToFirstTokenMs': round(stream_metrics['ttft_total_sec'] / ttft_count * 1000, 1) if ttft_count else None,
+            'maxTimeToFirstTokenMs': round(stream_metrics['ttft_max_sec'] * 1000, 1),
+        }
+    answer_cache_stats = answer_cache.stats() if answer_cache is not None else None
+    return jsonify({**session_store.stats(), 'streaming': streaming, 'answerCache': answer_cache_stats,
+                    'concurrency': chat_gate.stats()}), 200
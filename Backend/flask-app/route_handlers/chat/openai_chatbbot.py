@@ -1,19 +1,24 @@
 import os
-import time
+import json
+import hashlib
+import threading
+from datetime import datetime
 from openai import OpenAI, AssistantEventHandler
 from dotenv import load_dotenv
 from typing_extensions import override
+from util.database import AppDatabaseContextManager
 
 # Load environment variables
 load_dotenv()
 
-# Retrieve the API key from the environment variable
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise EnvironmentError("OPENAI_API_KEY is not set in the environment variables.")
+# OpenAI client and assistant ID, created on first use
+client = None
+assistant_id = None
+init_lock = threading.Lock()
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=api_key)
+# Assistant configuration
+ASSISTANT_NAME = "Pal"
+ASSISTANT_MODEL = "gpt-4o-mini"
 
 # Define the system prompt for the assistant
 SYSTEM_PROMPT = """
@@ -32,13 +37,99 @@ Website features:
 - **Chatbot "Pal"**: Assists with health tips, exercises, and translations.
 """
 
-# Create the assistant
-assistant = client.beta.assistants.create(
-    name="Pal",
-    instructions=SYSTEM_PROMPT,
-    tools=[],
-    model="gpt-4o-mini",
-)
+
+
+def get_client():
+    """
+    Return the OpenAI client, creating it on first use.
+
+    Raises:
+        - EnvironmentError: If OPENAI_API_KEY is not set.
+    """
+    global client
+    if client is None:
+        with init_lock:
+            if client is None:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if not api_key:
+                    raise EnvironmentError("OPENAI_API_KEY is not set in the environment variables.")
+                client = OpenAI(api_key=api_key)
+    return client
+
+
+def assistant_config_hash():
+    """
+    Hash the assistant configuration, so a changed prompt or model gets a new assistant.
+    """
+    config = {"name": ASSISTANT_NAME, "model": ASSISTANT_MODEL, "instructions": SYSTEM_PROMPT, "tools": []}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_assistant_id():
+    """
+    Return the ID of the assistant for the current configuration.
+
+    The ID is looked up in the app database and the assistant is only created on
+    the OpenAI side when no worker has stored one for this configuration yet
+    (see load_or_create_assistant).
+    """
+    global assistant_id
+    if assistant_id is None:
+        with init_lock:
+            if assistant_id is None:
+                assistant_id = load_or_create_assistant(assistant_config_hash())
+    return assistant_id
+
+
+def load_or_create_assistant(config_hash):
+    """
+    Fetch the persisted assistant ID for a configuration hash, creating and
+    storing a new assistant if there is none.
+
+    The assistant is created with no transaction open, so other writers of the
+    app database are not held up for the OpenAI round trip. Workers starting
+    at the same moment may each create one; the first ID stored wins, and the
+    others delete the assistant they created.
+    """
+    with AppDatabaseContextManager() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS openai_assistants (
+            config_hash TEXT PRIMARY KEY,
+            assistant_id TEXT NOT NULL,
+            timestamp TEXT
+        )
+        """)
+        conn.commit()
+
+        cursor.execute("SELECT assistant_id FROM openai_assistants WHERE config_hash=?", (config_hash,))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+
+    assistant = get_client().beta.assistants.create(
+        name=ASSISTANT_NAME,
+        instructions=SYSTEM_PROMPT,
+        tools=[],
+        model=ASSISTANT_MODEL,
+    )
+
+    with AppDatabaseContextManager() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR IGNORE INTO openai_assistants (config_hash, assistant_id, timestamp) VALUES (?, ?, ?)",
+            (config_hash, assistant.id, datetime.now().isoformat()),
+        )
+        conn.commit()
+        cursor.execute("SELECT assistant_id FROM openai_assistants WHERE config_hash=?", (config_hash,))
+        stored_id = cursor.fetchone()[0]
+
+    if stored_id != assistant.id:
+        try:
+            get_client().beta.assistants.delete(assistant.id)
+        except Exception as e:
+            print(f"Error deleting duplicate assistant {assistant.id}: {e}")
+    return stored_id
 
 
 class EventHandler(AssistantEventHandler):
@@ -65,36 +156,58 @@ class EventHandler(AssistantEventHandler):
         return "".join(self.response_text)
 
 
-def send_prompt_and_get_response(prompt, thread_id=None):
+def add_prompt_to_thread(prompt, thread_id=None, history=None):
     """
-    Send a user prompt to the assistant and get its response.
+    Add a user prompt to a thread, creating the thread if needed.
 
     Parameters:
         - prompt (str): The user's input message.
         - thread_id (str): Optional thread ID for ongoing conversations.
+        - history (list): Optional earlier turns (`{"user": ..., "ai": ...}`) to
+          seed a new thread with, for sessions answered without a thread so far.
 
     Returns:
-        - Tuple: Assistant's response and the thread ID.
+        - str: The thread ID the prompt was added to.
     """
     # Create a new thread if no thread ID is provided
     if thread_id is None:
-        thread = client.beta.threads.create()
+        messages = []
+        for turn in history or []:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["ai"]})
+        thread = get_client().beta.threads.create(messages=messages) if messages else get_client().beta.threads.create()
         thread_id = thread.id
 
     # Send the user prompt to the thread
-    client.beta.threads.messages.create(
+    get_client().beta.threads.messages.create(
         thread_id=thread_id,
         role="user",
         content=prompt,
     )
+    return thread_id
+
+
+def send_prompt_and_get_response(prompt, thread_id=None, history=None):
+    """
+    Send a user prompt to the assistant and get its response.
+
+    Parameters:
+        - prompt (str): The user's input message.
+        - thread_id (str): Optional thread ID for ongoing conversations.
+        - history (list): Optional earlier turns to seed a new thread with.
+
+    Returns:
+        - Tuple: Assistant's response and the thread ID.
+    """
+    thread_id = add_prompt_to_thread(prompt, thread_id, history)
 
     # Initialize event handler
     event_handler = EventHandler()
 
     # Stream assistant's response
-    with client.beta.threads.runs.stream(
+    with get_client().beta.threads.runs.stream(
         thread_id=thread_id,
-        assistant_id=assistant.id,
+        assistant_id=get_assistant_id(),
         instructions=SYSTEM_PROMPT,
         event_handler=event_handler,
     ) as stream:
@@ -102,3 +215,33 @@ def send_prompt_and_get_response(prompt, thread_id=None):
 
     # Return the complete response and the thread ID
     return event_handler.get_response(), thread_id
+
+
+def stream_prompt_response(prompt, thread_id=None, history=None):
+    """
+    Send a user prompt to the assistant and stream its response as it arrives.
+
+    The prompt is added to the thread straight away; the run itself starts when
+    the returned iterator is first consumed.
+
+    Parameters:
+        - prompt (str): The user's input message.
+        - thread_id (str): Optional thread ID for ongoing conversations.
+        - history (list): Optional earlier turns to seed a new thread with.
+
+    Returns:
+        - Tuple: Iterator over the response text deltas and the thread ID.
+    """
+    thread_id = add_prompt_to_thread(prompt, thread_id, history)
+
+    def text_deltas():
+        with get_client().beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=get_assistant_id(),
+            instructions=SYSTEM_PROMPT,
+            event_handler=EventHandler(),
+        ) as stream:
+            for text in stream.text_deltas:
+                yield text
+
+    return text_deltas(), thread_id
@@ -0,0 +1,167 @@
+import itertools
+import json
+import numpy as np
+from route_handlers.learning_hub.get_questionnaire import GUIDELINES, SCORE_KEYS
+
+# What assess_activity reports for each outcome of each aspect, in its order:
+# (meets_criteria, status text, recommendation or None) by outcome number
+ASPECT_OUTCOMES = [
+    ('Outdoor Play', [
+        (True, "Meets recommended levels of at least 5 days per week and 60 minutes per day.", None),
+        (True, "Days are sufficient, but less than 60 minutes per day.", "Encourage at least 60 minutes of outdoor play daily."),
+        (False, "Below recommended levels for both days and minutes.", "Increase outdoor play to 5 days a week with at least 60 minutes each day."),
+    ]),
+    ('Screen Time', [
+        (True, "Within recommended limits (2 hours or less per day).", None),
+        (False, "Above recommended levels.", "Reduce screen time to 2 hours or less daily."),
+    ]),
+    ('Physical Education', [
+        (True, "Meets recommended levels.", None),
+        (False, "Below recommended levels.", "Participate in at least 2 physical education classes per week."),
+    ]),
+    ('Active Days', [
+        (True, "Meets recommended levels.", None),
+        (False, "Below recommended levels.", "Engage in heart-rate-increasing activities 5 days per week."),
+    ]),
+    ('Active Transportation', [
+        (True, "Walking or cycling regularly (5+ days per week).", None),
+        (True, "Walking or cycling occasionally.", "Increase walking or cycling to 5+ days per week."),
+        (False, "Not walking or cycling regularly.", "Encourage walking or cycling daily."),
+    ]),
+]
+
+# Outcome numbers combine into one code per child, aspects as mixed-radix digits
+OUTCOME_RADIX = np.array([
+    int(np.prod([len(outcomes) for _, outcomes in ASPECT_OUTCOMES[position + 1:]]))
+    for position in range(len(ASPECT_OUTCOMES))
+])
+
+
+def outcome_status(outcome_numbers):
+    """The status list and recommendations assess_activity gives for one outcome per aspect."""
+    status, recommendations = [], []
+    for (aspect, outcomes), number in zip(ASPECT_OUTCOMES, outcome_numbers):
+        meets_criteria, text, recommendation = outcomes[number]
+        status.append({'meets_criteria': meets_criteria, 'aspect': aspect, 'text': text})
+        if recommendation is not None:
+            recommendations.append(recommendation)
+    return status, recommendations
+
+
+# The feedback and recommendations of every outcome code, serialised once
+OUTCOME_FRAGMENTS = []
+for numbers in itertools.product(*[range(len(outcomes)) for _, outcomes in ASPECT_OUTCOMES]):
+    status, recommendations = outcome_status(numbers)
+    OUTCOME_FRAGMENTS.append(f'"feedback": {json.dumps(status)}, "detailedAssessment": {json.dumps(recommendations)}')
+
+
+def walk_or_cycle_outcome(answer):
+    """Outcome number of an active transport answer: 0 for "most of the time", 1 for "sometimes", 2 otherwise."""
+    lowered = answer.lower()
+    return 0 if "most of the time" in lowered else 1 if "sometimes" in lowered else 2
+
+
+def walk_or_cycle_outcomes(walk_or_cycle):
+    """Outcome number of each active transport answer, classifying each distinct answer once."""
+    classified = {}
+    outcomes = np.empty(len(walk_or_cycle), dtype=np.int64)
+    for position, answer in enumerate(walk_or_cycle):
+        outcome = classified.get(answer)
+        if outcome is None:
+            outcome = classified[answer] = walk_or_cycle_outcome(answer)
+        outcomes[position] = outcome
+    return outcomes
+
+
+def assess_activities(outdoor_play_days, outdoor_play_minutes, screen_time, physical_education, active_days, walk_or_cycle):
+    """
+    Assess a cohort against the activity guidelines at once, applying the
+    rules of assess_activity to arrays of answers.
+
+    Parameters:
+    - outdoor_play_days (numpy.ndarray): Outdoor play days per week of each child.
+    - outdoor_play_minutes (numpy.ndarray): Outdoor play minutes per day.
+    - screen_time (numpy.ndarray): Screen time hours per day.
+    - physical_education (numpy.ndarray): Physical education classes per week.
+    - active_days (numpy.ndarray): Active days per week.
+    - walk_or_cycle (list): Walking or cycling answer of each child.
+
+    Returns:
+    - dict: "scores", an array per score key as assess_activity computes them,
+      and "outcomes", an (n, aspects) array of the outcome number of each
+      aspect in ASPECT_OUTCOMES.
+    """
+    outdoor_play_days, outdoor_play_minutes, screen_time, physical_education, active_days = (
+        np.asarray(values, dtype=np.float64)
+        for values in (outdoor_play_days, outdoor_play_minutes, screen_time, physical_education, active_days)
+    )
+    max_screen_hours = GUIDELINES['screen_time']['max_hours']
+    walk_outcomes = walk_or_cycle_outcomes(walk_or_cycle)
+    scores = {
+        'outdoor_play_days': np.minimum(outdoor_play_days / GUIDELINES['outdoor_play']['min_days'] * 100, 100),
+        'outdoor_play_minutes': np.minimum(outdoor_play_minutes / GUIDELINES['outdoor_play']['min_minutes'] * 100, 100),
+        'screen_time': np.where(screen_time <= max_screen_hours, 100, np.maximum(0, 100 - ((screen_time - max_screen_hours) * 50))),
+        'physical_education': np.minimum(physical_education / GUIDELINES['physical_education']['min_classes'] * 100, 100),
+        'active_days': np.minimum(active_days / GUIDELINES['active_days']['min_days'] * 100, 100),
+        'walk_or_cycle': np.array([100.0, 50.0, 0.0])[walk_outcomes],
+    }
+
+    enough_days = outdoor_play_days >= GUIDELINES['outdoor_play']['min_days']
+    enough_minutes = outdoor_play_minutes >= GUIDELINES['outdoor_play']['min_minutes']
+    outcomes = np.column_stack([
+        np.where(enough_days & enough_minutes, 0, np.where(enough_days, 1, 2)),
+        (screen_time > max_screen_hours).astype(np.int64),
+        (physical_education < GUIDELINES['physical_education']['min_classes']).astype(np.int64),
+        (active_days < GUIDELINES['active_days']['min_days']).astype(np.int64),
+        walk_outcomes,
+    ])
+    return {'scores': scores, 'outcomes': outcomes}
+
+
+def assessment_results(assessment):
+    """Yield each child's assessment in the form assess_activity returns it."""
+    scores = np.column_stack([assessment['scores'][key] for key in SCORE_KEYS]).tolist()
+    for child_scores, numbers in zip(scores, assessment['outcomes'].tolist()):
+        status, recommendations = outcome_status(numbers)
+        yield {'status': status, 'recommendations': recommendations, 'scores': dict(zip(SCORE_KEYS, child_scores))}
+
+
+def assessment_lines(assessment, indexes):
+    """
+    Yield each child's result as one line of JSON: its index in the upload,
+    feedback, detailedAssessment and scores.
+    """
+    scores = np.column_stack([assessment['scores'][key] for key in SCORE_KEYS]).tolist()
+    codes = (assessment['outcomes'] @ OUTCOME_RADIX).tolist()
+    scores_format = ', '.join(f'"{key}": %r' for key in SCORE_KEYS)
+    template = '{"index": %d, "scores": {' + scores_format + '}, %s}'
+    for index, child_scores, code in zip(indexes, scores, codes):
+        yield template % (index, *child_scores, OUTCOME_FRAGMENTS[code])
+
+
+def cohort_summary(assessment):
+    """
+    Aggregate statistics of a cohort assessment.
+
+    Returns:
+    - dict: "assessed" count, "averageScores" and "medianScores" by score key,
+      "meetsCriteria" (percentage of children meeting each aspect) and
+      "recommendations" (how many children were given each).
+    """
+    count = len(assessment['outcomes'])
+    if not count:
+        return {'assessed': 0, 'averageScores': {}, 'medianScores': {}, 'meetsCriteria': {}, 'recommendations': {}}
+    meets_criteria, recommendations = {}, {}
+    for position, (aspect, outcomes) in enumerate(ASPECT_OUTCOMES):
+        counts = np.bincount(assessment['outcomes'][:, position], minlength=len(outcomes)).tolist()
+        meets_criteria[aspect] = round(100 * sum(n for n, (meets, _, _) in zip(counts, outcomes) if meets) / count, 1)
+        for n, (_, _, recommendation) in zip(counts, outcomes):
+            if recommendation is not None and n:
+                recommendations[recommendation] = recommendations.get(recommendation, 0) + n
+    return {
+        'assessed': count,
+        'averageScores': {key: round(float(np.mean(assessment['scores'][key])), 1) for key in SCORE_KEYS},
+        'medianScores': {key: round(float(np.median(assessment['scores'][key])), 1) for key in SCORE_KEYS},
+        'meetsCriteria': meets_criteria,
+        'recommendations': recommendations,
+    }
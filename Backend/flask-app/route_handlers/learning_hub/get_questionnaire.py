@@ -1,10 +1,8 @@
-import numpy as np
 import os
+import time
 import uuid
 import datetime
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from util.metrics import registry
 
 # Physical Activity Guidelines
 GUIDELINES = {
@@ -14,6 +12,11 @@ GUIDELINES = {
     "active_days": {"min_days": 5}
 }
 
+# Keys of the assessment scores, in the order they are reported and charted
+SCORE_KEYS = ['outdoor_play_days', 'outdoor_play_minutes', 'screen_time', 'physical_education', 'active_days', 'walk_or_cycle']
+
+chart_render_seconds = registry.histogram('chart_render_duration_seconds', 'Time to draw and save a spider chart.')
+
 def assess_activity(outdoor_play_days, outdoor_play_minutes, screen_time, physical_education, active_days, walk_or_cycle):
     """
     Assess the child's physical activity against defined guidelines.
@@ -77,15 +80,26 @@ def assess_activity(outdoor_play_days, outdoor_play_minutes, screen_time, physic
     return result
 
 
-def create_spider_chart(scores):
+def create_spider_chart(scores, chart_filename=None):
     """
     Generate a spider chart to visualize the assessment results.
-    
+
+    Parameters:
+    - scores (dict): Assessment scores by score key.
+    - chart_filename (str): Where to save the chart (default: a new timestamped file).
+
     Returns:
         - The file path of the saved chart.
     """
+    # Imported here so the assessment logic can be used without loading matplotlib
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    started = time.perf_counter()
     categories = ['Outdoor Play (Days)', 'Outdoor Play (Minutes)', 'Screen Time', 'Physical Education', 'Active Days', 'Walking/Cycling']
-    values = [scores[category.lower().replace(' ', '_')] for category in categories]
+    values = [scores[key] for key in SCORE_KEYS]
     values += values[:1]
 
     angles = np.linspace(0, 2 * np.pi, len(categories), endpoint=False).tolist()
@@ -104,11 +118,13 @@ def create_spider_chart(scores):
     ax.legend(loc='upper left', bbox_to_anchor=(1.05, 1))
 
     # Save the chart
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    unique_id = uuid.uuid4().hex[:8]
-    chart_filename = f"static/images/parent/spider_chart_{timestamp}_{unique_id}.png"
+    if chart_filename is None:
+        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        unique_id = uuid.uuid4().hex[:8]
+        chart_filename = f"static/images/parent/spider_chart_{timestamp}_{unique_id}.png"
     os.makedirs(os.path.dirname(chart_filename), exist_ok=True)
     plt.savefig(chart_filename, dpi=300, bbox_inches='tight')
     plt.close()
+    chart_render_seconds.labels().observe(time.perf_counter() - started)
 
     return chart_filename
@@ -1,6 +1,26 @@
+import csv
+import io
+import json
 import os
-from flask import jsonify, request
-from ..learning_hub.get_questionare import assess_activity, create_spider_chart
+import numpy as np
+from flask import Response, jsonify, request, stream_with_context
+from ..learning_hub.get_questionnaire import create_spider_chart
+from ..learning_hub.cohort_assessment import assess_activities, assessment_lines, cohort_summary, walk_or_cycle_outcome
+from .guidance_table import GUIDANCE_CHART_DIR, SURVEY_VALUES, answer_index, guidance_table
+
+# The same values as arrays indexed by answer level, for whole cohorts
+SURVEY_VALUE_ARRAYS = {
+    field: np.array([np.nan] + [values[level] for level in range(1, 5)]) for field, values in SURVEY_VALUES.items()
+}
+
+# Answer level of each accepted survey value; CSV uploads give them as text
+SURVEY_LEVELS = {**{level: level for level in range(1, 5)}, **{str(level): level for level in range(1, 5)}}
+
+# Most survey responses accepted in one cohort upload
+MAX_COHORT_RESPONSES = 200_000
+
+# Results per chunk of a streamed cohort assessment
+COHORT_CHUNK_SIZE = 1000
 
 
 def get_parental_guidance():
@@ -20,46 +40,123 @@ def get_parental_guidance():
     """
     try:
         data = request.json
-
-        # Map survey responses to numerical values
-        outdoor_play_minutes_map = {1: 15, 2: 45, 3: 90, 4: 150}
-        outdoor_play_days_map = {1: 0.5, 2: 1.5, 3: 3.5, 4: 6}
-        screen_time_map = {1: 0.5, 2: 1.5, 3: 3.0, 4: 5.0}
-        physical_education_map = {1: 0.5, 2: 1, 3: 2, 4: 5.5}
-        active_days_map = {1: 0.5, 2: 1.5, 3: 3.5, 4: 6}
-
-        outdoor_play_minutes = outdoor_play_minutes_map.get(data.get('outdoorTime'))
-        outdoor_play_days = outdoor_play_days_map.get(data.get('outdoorFrequency'))
-        screen_time = screen_time_map.get(data.get('screenTime'))
-        physical_education = physical_education_map.get(data.get('peFrequency'))
-        active_days = active_days_map.get(data.get('physicalActivityDays'))
+        levels = [data.get(field) for field in SURVEY_VALUES]
         walk_or_cycle = data.get('walkOrCycle', '')
 
         # Validate input
-        if None in [outdoor_play_minutes, outdoor_play_days, screen_time, physical_education, active_days]:
+        if any(level not in values for level, values in zip(levels, SURVEY_VALUES.values())):
             return jsonify({"error": "Invalid survey data provided"}), 400
 
-        # Assess activity levels
-        result = assess_activity(
-            outdoor_play_days, outdoor_play_minutes, screen_time,
-            physical_education, active_days, walk_or_cycle
-        )
-
-        # Generate spider chart
-        spider_chart_url = create_spider_chart(result['scores'])
+        # Every assessment is precomputed; look up this one and its shared chart
+        index = answer_index(levels, walk_or_cycle_outcome(walk_or_cycle))
+        spider_chart_url = guidance_table.chart(index)
 
-        # Prepare response
-        response = {
-            "feedback": result['status'],
-            "detailedAssessment": result['recommendations'],
-            "plotImageUrl": f'/{spider_chart_url}',
-        }
-        return jsonify(response)
+        response = f'{{{guidance_table.fragment(index)}, "plotImageUrl": {json.dumps(f"/{spider_chart_url}")}}}'
+        return Response(response, mimetype='application/json')
 
     except Exception as e:
         return jsonify({"error": "An error occurred while processing the survey data", "details": str(e)}), 500
 
 
+def read_cohort_responses():
+    """
+    Read the survey responses of a cohort upload: a JSON array (or an object
+    with a "responses" array), or CSV with the same column names, sent as the
+    request body or as a `file` upload.
+
+    Raises:
+    - ValueError: If the upload holds neither.
+    """
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        text = (upload.read() if upload is not None else request.get_data()).decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('responses')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of survey responses or a CSV file")
+    return data
+
+
+def survey_level(value):
+    """The answer level (1-4) of a survey field, or 0 if it is missing or invalid."""
+    try:
+        return SURVEY_LEVELS.get(value.strip() if isinstance(value, str) else value, 0)
+    except TypeError:
+        return 0
+
+
+def survey_answers(responses):
+    """
+    Answer levels of a cohort's survey responses.
+
+    Returns:
+    - tuple: An (n, fields) array of the answer level of each SURVEY_VALUES
+      field, the walking or cycling answers (None where invalid), and a boolean
+      array marking the responses that can be assessed.
+    """
+    answers = [response if isinstance(response, dict) else {} for response in responses]
+    levels = np.column_stack([
+        np.fromiter((survey_level(answer.get(field)) for answer in answers), dtype=np.int64, count=len(answers))
+        for field in SURVEY_VALUES
+    ]) if answers else np.zeros((0, len(SURVEY_VALUES)), dtype=np.int64)
+    walk_or_cycle = []
+    for response in responses:
+        walk = (response.get('walkOrCycle') or '') if isinstance(response, dict) else None
+        walk_or_cycle.append(walk if isinstance(walk, str) else None)
+    valid = (levels > 0).all(axis=1) & np.array([walk is not None for walk in walk_or_cycle], dtype=bool)
+    return levels, walk_or_cycle, valid
+
+
+def get_cohort_guidance():
+    """
+    Assess the survey responses of a whole class or cohort at once.
+
+    Expects the survey fields of `get_parental_guidance` for each child, as a
+    JSON array or as CSV with those column names (see read_cohort_responses).
+
+    Returns:
+        - A newline-delimited JSON stream with one line per response, in upload
+          order: its `index` and either `feedback`, `detailedAssessment` and
+          `scores`, or an `error`. The last line holds the `cohort` statistics
+          and the URL of one chart of the cohort's average scores.
+        - HTTP 400 if the upload can't be read, 413 if it is too large.
+    """
+    try:
+        responses = read_cohort_responses()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"error": str(e)}), 400
+    if len(responses) > MAX_COHORT_RESPONSES:
+        return jsonify({"error": f"At most {MAX_COHORT_RESPONSES} survey responses can be assessed at once"}), 413
+
+    levels, walk_or_cycle, valid = survey_answers(responses)
+    rows = np.flatnonzero(valid)
+    answers = [SURVEY_VALUE_ARRAYS[field][levels[rows, position]] for position, field in enumerate(SURVEY_VALUES)]
+    assessment = assess_activities(*answers, [walk_or_cycle[row] for row in rows.tolist()])
+
+    def generate():
+        lines = assessment_lines(assessment, rows.tolist())
+        chunk = []
+        for index, is_valid in enumerate(valid.tolist()):
+            chunk.append(next(lines) if is_valid else json.dumps({"index": index, "error": "Invalid survey data provided"}))
+            if len(chunk) == COHORT_CHUNK_SIZE:
+                yield "\n".join(chunk) + "\n"
+                chunk = []
+
+        summary = {"responses": len(responses), "invalid": len(responses) - len(rows), **cohort_summary(assessment)}
+        summary["plotImageUrl"] = None
+        if len(rows):
+            try:
+                summary["plotImageUrl"] = f'/{create_spider_chart(summary["averageScores"])}'
+            except Exception as e:
+                print(f"Error creating cohort chart: {e}")
+        chunk.append(json.dumps({"cohort": summary}))
+        yield "\n".join(chunk) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 def cleanup_spider_chart_png():
     """
     Cleanup spider chart PNG files from the server.
@@ -75,6 +172,9 @@ def cleanup_spider_chart_png():
         data = request.json
         file_name = data.get('filename')
 
+        if file_name and file_name.startswith(f'/{GUIDANCE_CHART_DIR}/'):
+            # Shared by every request with the same answers, so kept
+            return '', 204
         if file_name and file_name.startswith('/static/images/parent/spider_chart_') and file_name.endswith('.png'):
             file_path = file_name.lstrip('/')
             if os.path.exists(file_path):
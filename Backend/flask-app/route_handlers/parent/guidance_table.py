@@ -0,0 +1,107 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import numpy as np
+from ..learning_hub.cohort_assessment import OUTCOME_FRAGMENTS, OUTCOME_RADIX, assess_activities, outcome_status
+from ..learning_hub.get_questionnaire import SCORE_KEYS, create_spider_chart
+
+# Numerical value of each survey answer level (1-4), by field, in the order
+# assess_activity takes them
+SURVEY_VALUES = {
+    'outdoorFrequency': {1: 0.5, 2: 1.5, 3: 3.5, 4: 6},
+    'outdoorTime': {1: 15, 2: 45, 3: 90, 4: 150},
+    'screenTime': {1: 0.5, 2: 1.5, 3: 3.0, 4: 5.0},
+    'peFrequency': {1: 0.5, 2: 1, 3: 2, 4: 5.5},
+    'physicalActivityDays': {1: 0.5, 2: 1.5, 3: 3.5, 4: 6},
+}
+
+# A walking or cycling answer for each of its outcomes
+WALK_OR_CYCLE_ANSWERS = ["most of the time", "sometimes", ""]
+
+# Answers are encoded as mixed-radix digits: the level of each survey field,
+# less one, then the walking or cycling outcome
+ANSWER_RADIX = [4 ** (len(SURVEY_VALUES) - 1 - position) * len(WALK_OR_CYCLE_ANSWERS) for position in range(len(SURVEY_VALUES))]
+
+# Shared charts, named by a hash of what they show; unlike the charts drawn
+# per request, clients don't delete these
+GUIDANCE_CHART_DIR = 'static/images/parent/guidance'
+
+# Part of every chart hash; bump it when create_spider_chart draws differently
+CHART_STYLE = 1
+
+
+def answer_index(levels, walk_outcome):
+    """
+    Position in the guidance table of one set of answers.
+
+    Parameters:
+    - levels (list): Answer level (1-4) of each survey field, in SURVEY_VALUES order.
+    - walk_outcome (int): Outcome number of the walking or cycling answer.
+
+    Returns:
+    - int: The table index.
+    """
+    return sum((int(level) - 1) * radix for level, radix in zip(levels, ANSWER_RADIX)) + walk_outcome
+
+
+class GuidanceTable:
+    """
+    Every assess_activity result over the discrete survey answers, indexed by
+    answer_index, so answering a request is a lookup.
+
+    Each entry is the outcome code of the assessment, whose feedback and
+    recommendations are the shared OUTCOME_FRAGMENTS, its scores, and the key
+    of its chart. Charts are named by their content: answers with the same
+    scores share one image, drawn the first time it is asked for.
+    """
+    def __init__(self, chart_dir=None):
+        self.chart_dir = chart_dir or GUIDANCE_CHART_DIR
+        answers = list(itertools.product(*[sorted(values) for values in SURVEY_VALUES.values()], range(len(WALK_OR_CYCLE_ANSWERS))))
+        columns = [[SURVEY_VALUES[field][answer[position]] for answer in answers] for position, field in enumerate(SURVEY_VALUES)]
+        assessment = assess_activities(*columns, [WALK_OR_CYCLE_ANSWERS[answer[-1]] for answer in answers])
+
+        self.outcomes = assessment['outcomes'].astype(np.uint8)
+        self.outcome_codes = (assessment['outcomes'] @ OUTCOME_RADIX).astype(np.uint8)
+        self.scores = np.column_stack([assessment['scores'][key] for key in SCORE_KEYS])
+        self.chart_keys = [
+            hashlib.sha1(json.dumps([CHART_STYLE, scores]).encode('utf-8')).hexdigest()[:16]
+            for scores in self.scores.tolist()
+        ]
+        self._chart_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.outcome_codes)
+
+    def result(self, index):
+        """The entry at `index` in the form assess_activity returns it."""
+        status, recommendations = outcome_status(self.outcomes[index].tolist())
+        return {'status': status, 'recommendations': recommendations, 'scores': dict(zip(SCORE_KEYS, self.scores[index].tolist()))}
+
+    def fragment(self, index):
+        """The "feedback" and "detailedAssessment" members of the entry's response, as JSON."""
+        return OUTCOME_FRAGMENTS[self.outcome_codes[index]]
+
+    def chart(self, index):
+        """Path of the entry's chart, drawing it if no request has yet."""
+        path = f"{self.chart_dir}/spider_chart_{self.chart_keys[index]}.png"
+        if not os.path.exists(path):
+            with self._chart_lock:
+                if not os.path.exists(path):
+                    os.makedirs(self.chart_dir, exist_ok=True)
+                    # Drawn under a temporary name, so other workers never serve a partial file
+                    temporary_path = f"{path}.{os.getpid()}.png"
+                    create_spider_chart(dict(zip(SCORE_KEYS, self.scores[index].tolist())), temporary_path)
+                    os.replace(temporary_path, path)
+        return path
+
+
+guidance_table = GuidanceTable()
+
+
+if __name__ == '__main__':
+    # Draw every chart ahead of time, e.g. while building a release
+    for index in range(len(guidance_table)):
+        guidance_table.chart(index)
+    print(f"{len(set(guidance_table.chart_keys))} charts in {guidance_table.chart_dir}")
@@ -1,8 +1,8 @@
 from flask import jsonify, request
 import math
-from util.database import AppDatabaseContextManager
+import numpy as np
 from route_handlers.parks.get_weather_safety import get_weather_data
-
+from route_handlers.parks.park_catalog import get_park_catalog
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
@@ -36,68 +36,100 @@ def calculate_safety_rating(weather_score, crime_score, accident_score):
         return 1
 
 
-def get_safety_data(connection, latitude=None, longitude=None):
+def calculate_safety_ratings(weather_scores, crime_scores, accident_scores):
     """
-    Fetch and calculate safety data for parks, including weather, crime, and accident scores.
+    Vectorised `calculate_safety_rating` over arrays of scores.
     """
-    cursor = connection.cursor()
+    weighted_scores = (0.4 * weather_scores) + (0.3 * crime_scores) + (0.3 * accident_scores)
+    return np.select(
+        [weighted_scores >= 9, weighted_scores >= 7, weighted_scores >= 5, weighted_scores >= 3], [5, 4, 3, 2], 1,
+    )
+
 
-    # Fetch max values for normalization
-    cursor.execute("SELECT MAX(incidents_recorded_2014_2023) FROM Crime")
-    max_crime = cursor.fetchone()[0] or 1  # Prevent division by zero
+def calculate_weather_score(weather_main):
+    """
+    Score a weather condition from 0 (unsafe) to 10 (safe).
+    """
+    return 10 if weather_main in ["Clear", "Clouds"] else (5 if weather_main in ["Drizzle", "Mist", "Fog"] else 0)
 
-    cursor.execute("SELECT MAX(total_accidents) FROM Accident")
-    max_accidents = cursor.fetchone()[0] or 1
 
-    query = """
-        SELECT L.location_id, L.latitude, L.longitude, L.suburb_id,
-               C.incidents_recorded_2014_2023, A.total_accidents,
-               LM.landmark_name, LM.landmark_type, 
-               F.facility_name, F.sports_played, P.playground_name
-        FROM Location L
-        LEFT JOIN Crime C ON L.suburb_id = C.suburb_id
-        LEFT JOIN Accident A ON L.suburb_id = A.suburb_id
-        LEFT JOIN Landmark LM ON L.location_id = LM.location_id
-        LEFT JOIN Facility F ON L.location_id = F.location_id
-        LEFT JOIN Playground P ON L.location_id = P.location_id
+def get_cell_weather(catalog, cell_codes=None):
     """
-    cursor.execute(query)
-    locations = cursor.fetchall()
+    Fetch the current weather condition of weather cells holding parks.
 
-    if not locations:
-        return {'error': 'No location data found in the database'}, 404
+    Parameters:
+    - catalog (ParkCatalog): The park catalog of the current serving snapshot.
+    - cell_codes (iterable): Codes of the cells to look up (default: every cell).
 
-    features = []
-    for location in locations:
-        location_id, lat, lon, _, crime, accidents, landmark_name, landmark_type, facility_name, sports_played, playground_name = location
+    Returns:
+    - dict: Weather condition (e.g. "Clear") by cell.
+    """
+    cells = catalog.cells if cell_codes is None else [catalog.cells[code] for code in cell_codes]
+    cell_weather = {}
+    for lat, lon in cells:
+        weather_data = get_weather_data(None if math.isnan(lat) else lat, None if math.isnan(lon) else lon)
+        cell_weather[(lat, lon)] = weather_data.get('weather', [{}])[0].get('main', 'Unknown')
+    return cell_weather
 
-        # Determine facility type and name
-        facility = landmark_type if landmark_name else ('sports' if sports_played else 'parks')
-        name = landmark_name or facility_name or playground_name or "Unknown"
 
-        # Calculate scores
-        weather_data = get_weather_data(lat, lon)
-        weather_main = weather_data.get('weather', [{}])[0].get('main', 'Unknown')
-        weather_score = 10 if weather_main in ["Clear", "Clouds"] else (5 if weather_main in ["Drizzle", "Mist", "Fog"] else 0)
+def get_safety_features(catalog, cell_weather, rows=None):
+    """
+    Build the GeoJSON features of parks in the catalog.
+
+    Parameters:
+    - catalog (ParkCatalog): The park catalog of the current serving snapshot.
+    - cell_weather (dict): Weather condition by cell, from get_cell_weather.
+    - rows (numpy.ndarray): Catalog rows to include (default: all of them).
 
-        crime_score = max(0, 10 - (crime or 0) / max_crime * 10)
-        accident_score = max(0, 10 - (accidents or 0) / max_accidents * 10)
-        safety_rating = calculate_safety_rating(weather_score, crime_score, accident_score)
+    Returns:
+    - list: GeoJSON features, identified by location id.
+    """
+    columns = catalog.columns if rows is None else {name: column[rows] for name, column in catalog.columns.items()}
+    locations = zip(
+        columns['location_id'].tolist(),
+        columns['latitude'].tolist(), columns['longitude'].tolist(),
+        columns['crime'].tolist(), columns['accidents'].tolist(),
+        columns['crime_score'].tolist(), columns['accident_score'].tolist(),
+        catalog.strings(columns['facility_code']), catalog.strings(columns['name_code']),
+        columns['cell_code'].tolist(),
+    )
+
+    features = []
+    for location_id, lat, lon, crime, accidents, crime_score, accident_score, facility, name, cell_code in locations:
+        # Calculate scores
+        weather_main = cell_weather[catalog.cells[cell_code]]
+        safety_rating = calculate_safety_rating(calculate_weather_score(weather_main), crime_score, accident_score)
 
         features.append({
             "type": "Feature",
-            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "id": location_id,
+            "geometry": {"type": "Point", "coordinates": [None if math.isnan(lon) else lon, None if math.isnan(lat) else lat]},
             "properties": {
                 "facility": facility,
                 "name": name,
                 "safetyRating": safety_rating,
                 "weather": weather_main,
-                "crime": crime or 0,
-                "accidents": accidents or 0,
+                "crime": crime,
+                "accidents": accidents,
             },
         })
+    return features
+
+
+def get_safety_data(catalog, latitude=None, longitude=None):
+    """
+    Fetch and calculate safety data for parks, including weather, crime, and accident scores.
+
+    Parameters:
+    - catalog (ParkCatalog): The park catalog of the current serving snapshot.
+
+    Returns:
+    - dict: A GeoJSON FeatureCollection of the parks.
+    """
+    if not len(catalog):
+        return {'error': 'No location data found in the database'}, 404
 
-    return {"type": "FeatureCollection", "features": features}
+    return {"type": "FeatureCollection", "features": get_safety_features(catalog, get_cell_weather(catalog))}
 
 
 def get_crime_safety_data():
@@ -108,8 +140,7 @@ def get_crime_safety_data():
     longitude = request.args.get('longitude')
 
     try:
-        with AppDatabaseContextManager() as connection:
-            data = get_safety_data(connection, latitude, longitude)
-            return jsonify(data)
+        data = get_safety_data(get_park_catalog(), latitude, longitude)
+        return jsonify(data)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,30 +1,24 @@
 from flask import jsonify, request
 from random import sample
 import threading
+from util.coordinates import is_valid_coordinate
 from util.database import SafetyMapDatabaseContextManager
-from route_handlers.parks.get_crime_accident_safety import get_safety_data
 from route_handlers.parks.get_weather_safety import get_weather_data
+from route_handlers.parks.park_outlines import get_outline_features, parse_outline_options
+from route_handlers.parks.park_containment import get_containment_index
+from route_handlers.parks import park_catalog
+from route_handlers.parks.park_versions import get_safety_update, refresh_park_weather
+from route_handlers.parks.park_filters import get_safety_page, parse_filter_options
 
 
+# Every location, for the mean coordinates of each suburb
+SUBURB_LOCATIONS_QUERY = "SELECT latitude, longitude, suburb_id FROM Location"
+
 # Global variables for background thread management
 prefetch_thread = None
 cancel_prefetch = False
 
 
-def is_valid_coordinate(lat, lon):
-    """
-    Check if latitude and longitude are valid numerical values.
-    Latitude must be between -90 and 90.
-    Longitude must be between -180 and 180.
-    """
-    try:
-        lat = float(lat)
-        lon = float(lon)
-        return -90 <= lat <= 90 and -180 <= lon <= 180
-    except (ValueError, TypeError):
-        return False
-
-
 def get_suburb_locations():
     """
     Retrieve a dictionary of suburb locations with mean coordinates (latitude, longitude).
@@ -32,7 +26,7 @@ def get_suburb_locations():
     suburb_dict = {}
     with SafetyMapDatabaseContextManager() as connection:
         cursor = connection.cursor()
-        cursor.execute("SELECT latitude, longitude, suburb_id FROM Location")
+        cursor.execute(SUBURB_LOCATIONS_QUERY)
         all_locations = cursor.fetchall()
 
     # Organize locations by suburb_id
@@ -55,7 +49,9 @@ def get_suburb_locations():
 
 def prefetch_weather_data_task(percentage):
     """
-    Background task to prefetch weather data for a random selection of suburbs.
+    Background task to prefetch weather data for a random selection of suburbs,
+    then refresh the weather of every cell holding a park so that clients
+    subscribed to park updates hear about changes.
     """
     global cancel_prefetch
     suburb_locations = get_suburb_locations()
@@ -75,6 +71,13 @@ def prefetch_weather_data_task(percentage):
         except Exception as e:
             print(f"Error during weather prefetch: {e}")
 
+    if cancel_prefetch:
+        return
+    try:
+        refresh_park_weather()
+    except Exception as e:
+        print(f"Error refreshing park weather: {e}")
+
 
 def prefetch_weather_data():
     """
@@ -99,6 +102,23 @@ def prefetch_weather_data():
 def get_parks():
     """
     API endpoint to fetch park data including user location and safety details.
+
+    Optional JSON fields:
+        - outlineZoom: Map zoom level (0-24); when given, playground outlines are added
+          as MultiPolygon features at the matching level of detail.
+        - bbox: [minLon, minLat, maxLon, maxLat] limiting the outlines returned.
+        - version: The "version" of an earlier response; when given, only the
+          parks that changed since then are returned ("delta": true), along
+          with the ids of removed parks in "removed". The whole map is returned
+          instead ("delta": false) if the version is too old.
+        - facility, sport: A facility type (e.g. "sports", "parks" or a landmark
+          type) or sport, or a list of them, any of which may match.
+        - minSafetyRating: Lowest safety rating (1-5) to include.
+        - namePrefix: Start of the park name, ignoring case.
+        - limit, cursor: Page size (default 100, at most 500) and the
+          "nextCursor" of the previous page.
+          With any of these options the parks are returned a page at a time,
+          with "nextCursor" set until the last page, instead of versioned.
     """
     global cancel_prefetch
 
@@ -109,24 +129,49 @@ def get_parks():
     data = request.json
     latitude = data.get("latitude")
     longitude = data.get("longitude")
+    try:
+        filter_options = parse_filter_options(data)
+        outline_options = parse_outline_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     geojson_response = {"type": "FeatureCollection", "features": []}
 
     if latitude is not None and longitude is not None:
+        # Containment only needs the park outlines, so it doesn't depend on the weather service
+        inside_parks = []
+        if is_valid_coordinate(latitude, longitude):
+            inside_parks = [park["name"] for park in get_containment_index().containing(float(latitude), float(longitude))]
         try:
             user_location_weather = get_weather_data(latitude, longitude)
-            geojson_response["features"].append({
-                "type": "Feature",
-                "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
-                "properties": {"type": "user_location", "name": "Your Location", "weather": user_location_weather},
-            })
         except Exception as e:
             print(f"Error fetching user location weather: {e}")
-
-    with SafetyMapDatabaseContextManager() as connection:
-        safety_data = get_safety_data(connection, latitude, longitude)
+            user_location_weather = None
+        geojson_response["features"].append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+            "properties": {
+                "type": "user_location",
+                "name": "Your Location",
+                "weather": user_location_weather,
+                "insideParks": inside_parks,
+            },
+        })
+
+    catalog = park_catalog.get_park_catalog()
+    if filter_options is not None:
+        safety_page = get_safety_page(catalog, filter_options)
+        geojson_response["features"].extend(safety_page["features"])
+        geojson_response["nextCursor"] = safety_page["nextCursor"]
+    else:
+        safety_data = get_safety_update(catalog, data.get("version"), park_catalog.previous_park_catalog)
         if isinstance(safety_data, dict) and "features" in safety_data:
             geojson_response["features"].extend(safety_data["features"])
+            geojson_response.update(version=safety_data["version"], delta=safety_data["delta"], removed=safety_data["removed"])
+
+    if outline_options is not None:
+        with SafetyMapDatabaseContextManager() as connection:
+            geojson_response["features"].extend(get_outline_features(connection, *outline_options))
 
     # Hardcoded park names for a special property
     park_name_list = ["Fitzroy Gardens", "Flagstaff Gardens", "Carlton Gardens South", "Royal Botanic Gardens"]
@@ -0,0 +1,254 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import numpy as np
+from util.database import SafetyMapDatabaseContextManager
+from route_handlers.parks.get_weather_safety import round_coordinates
+
+# Catalog files, one per serving database snapshot
+PARK_CATALOG_DIR = 'database/park_catalog'
+
+# Serving queries; tests/test_query_plans.py checks each one is answered from indexes
+MAX_CRIME_QUERY = "SELECT MAX(incidents_recorded_2014_2023) FROM Crime"
+MAX_ACCIDENTS_QUERY = "SELECT MAX(total_accidents) FROM Accident"
+SAFETY_LOCATIONS_QUERY = """
+    SELECT L.location_id, L.latitude, L.longitude, L.suburb_id,
+           C.incidents_recorded_2014_2023, A.total_accidents,
+           LM.landmark_name, LM.landmark_type,
+           F.facility_name, F.sports_played, P.playground_name
+    FROM Location L
+    LEFT JOIN Crime C ON L.suburb_id = C.suburb_id
+    LEFT JOIN Accident A ON L.suburb_id = A.suburb_id
+    LEFT JOIN Landmark LM ON L.location_id = LM.location_id
+    LEFT JOIN Facility F ON L.location_id = F.location_id
+    LEFT JOIN Playground P ON L.location_id = P.location_id
+"""
+
+CATALOG_MAGIC = b'PARKCAT1'
+
+# Part of every catalog file name; bump it when the layout changes, so catalogs
+# written by an earlier release are rebuilt rather than misread
+CATALOG_FORMAT = 2
+
+# Per-location columns, stored one after another in the file. Facility types,
+# names and sports are codes into the catalog's string table, and cell codes index the
+# weather cells (coordinates rounded as for the weather lookup).
+CATALOG_COLUMNS = [
+    ('location_id', '<i8'),
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('suburb_id', '<i8'),
+    ('crime', '<i8'),
+    ('accidents', '<i8'),
+    ('crime_score', '<f8'),
+    ('accident_score', '<f8'),
+    ('facility_code', '<u4'),
+    ('name_code', '<u4'),
+    ('sports_code', '<u4'),
+    ('cell_code', '<u4'),
+]
+
+
+def align(offset, boundary=8):
+    return (offset + boundary - 1) // boundary * boundary
+
+
+class ParkCatalog:
+    """
+    Read-only park catalog backed by a memory-mapped file.
+
+    The columns are NumPy arrays over the mapping itself, so every worker
+    process that opens the same file shares one copy of the data in the OS
+    page cache instead of holding its own.
+
+    File layout: the magic bytes, a uint32 header length, a JSON header with
+    the row count, snapshot key and the offset of each column (relative to the
+    first 8-byte boundary after the header), then the columns, the weather cell
+    coordinates (float64 pairs), the string offsets (uint64, one more than the
+    string count) and the UTF-8 strings.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(CATALOG_MAGIC)] != CATALOG_MAGIC:
+            raise ValueError(f"{path} is not a park catalog")
+        (header_length,) = struct.unpack_from('<I', self._map, len(CATALOG_MAGIC))
+        header_start = len(CATALOG_MAGIC) + 4
+        header = json.loads(self._map[header_start:header_start + header_length])
+        base = align(header_start + header_length)
+
+        self.path = path
+        self.snapshot = header['snapshot']
+        self.count = header['count']
+        self.columns = {
+            name: np.frombuffer(self._map, dtype=dtype, count=self.count, offset=base + offset)
+            for name, (dtype, offset) in header['columns'].items()
+        }
+        cells = header['cells']
+        self.cell_coordinates = np.frombuffer(
+            self._map, dtype='<f8', count=cells['count'] * 2, offset=base + cells['offset'],
+        ).reshape(-1, 2)
+        self.cells = [tuple(cell) for cell in self.cell_coordinates.tolist()]
+        self.cell_codes = {cell: code for code, cell in enumerate(self.cells)}
+        self._cell_starts = None
+        strings = header['strings']
+        self._string_offsets = np.frombuffer(self._map, dtype='<u8', count=strings['count'] + 1, offset=base + strings['offsets'])
+        self._strings_start = base + strings['data']
+
+    def __len__(self):
+        return self.count
+
+    def cell_rows(self, cell_code):
+        """Rows of the locations in one weather cell."""
+        if self._cell_starts is None:
+            codes = self.columns['cell_code']
+            self._cell_order = np.argsort(codes, kind='stable')
+            self._cell_starts = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.cells)))])
+        return self._cell_order[self._cell_starts[cell_code]:self._cell_starts[cell_code + 1]]
+
+    def string(self, code):
+        """Decode one entry of the string table."""
+        start, end = self._string_offsets[code], self._string_offsets[code + 1]
+        return self._map[self._strings_start + int(start):self._strings_start + int(end)].decode('utf-8')
+
+    def strings(self, codes):
+        """Decode a column of string codes, decoding each distinct code once."""
+        decoded = {}
+        return [decoded[code] if code in decoded else decoded.setdefault(code, self.string(code)) for code in codes.tolist()]
+
+
+def catalog_rows(connection):
+    """
+    Run the safety map query once and derive everything a request needs from it.
+
+    Returns:
+    - tuple: (dict of column arrays, list of interned strings, list of weather cells)
+    """
+    cursor = connection.cursor()
+    max_crime = cursor.execute(MAX_CRIME_QUERY).fetchone()[0] or 1  # Prevent division by zero
+    max_accidents = cursor.execute(MAX_ACCIDENTS_QUERY).fetchone()[0] or 1
+    rows = cursor.execute(SAFETY_LOCATIONS_QUERY).fetchall()
+
+    strings, string_codes = [], {}
+    cells, cell_codes = [], {}
+
+    def intern(value, values=strings, codes=string_codes):
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        return codes[value]
+
+    values = {name: [] for name, _ in CATALOG_COLUMNS}
+    for location_id, lat, lon, suburb_id, crime, accidents, landmark_name, landmark_type, facility_name, sports_played, playground_name in rows:
+        # Determine facility type and name
+        facility = landmark_type if landmark_name else ('sports' if sports_played else 'parks')
+        name = landmark_name or facility_name or playground_name or "Unknown"
+
+        cell = round_coordinates(lat, lon) if lat is not None and lon is not None else (np.nan, np.nan)
+
+        values['location_id'].append(location_id)
+        values['latitude'].append(np.nan if lat is None else lat)
+        values['longitude'].append(np.nan if lon is None else lon)
+        values['suburb_id'].append(-1 if suburb_id is None else suburb_id)
+        values['crime'].append(crime or 0)
+        values['accidents'].append(accidents or 0)
+        values['crime_score'].append(max(0, 10 - (crime or 0) / max_crime * 10))
+        values['accident_score'].append(max(0, 10 - (accidents or 0) / max_accidents * 10))
+        values['facility_code'].append(intern(facility))
+        values['name_code'].append(intern(name))
+        values['sports_code'].append(intern(sports_played or ''))
+        values['cell_code'].append(intern(cell, cells, cell_codes))
+
+    columns = {name: np.array(values[name], dtype=dtype) for name, dtype in CATALOG_COLUMNS}
+    return columns, strings, cells
+
+
+def write_catalog(path, snapshot, columns, strings, cells):
+    """Write a catalog file, renaming it into place once complete."""
+    count = len(columns['latitude'])
+    encoded = [string.encode('utf-8') for string in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(string) for string in encoded], out=string_offsets[1:])
+    cell_coordinates = np.array(cells, dtype='<f8').reshape(-1, 2)
+
+    layout, offset = {}, 0
+    for name, dtype in CATALOG_COLUMNS:
+        layout[name] = [dtype, offset]
+        offset = align(offset + count * np.dtype(dtype).itemsize)
+    strings_offset = offset + cell_coordinates.nbytes
+    header = {
+        'snapshot': snapshot,
+        'count': count,
+        'columns': layout,
+        'cells': {'count': len(cell_coordinates), 'offset': offset},
+        'strings': {'count': len(encoded), 'offsets': strings_offset, 'data': strings_offset + string_offsets.nbytes},
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_end = len(CATALOG_MAGIC) + 4 + len(header_bytes)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(CATALOG_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            file.write(b'\0' * (align(header_end) - header_end))
+            for name, dtype in CATALOG_COLUMNS:
+                data = columns[name].astype(dtype, copy=False).tobytes()
+                file.write(data + b'\0' * (align(len(data)) - len(data)))
+            file.write(cell_coordinates.tobytes())
+            file.write(string_offsets.tobytes())
+            file.write(b''.join(encoded))
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def snapshot_key(db_path):
+    """Identify a database snapshot by its inode, size and modification time."""
+    stat = os.stat(db_path)
+    return f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def open_catalog(manager=SafetyMapDatabaseContextManager, catalog_dir=None):
+    """
+    Map the catalog of the current serving snapshot, building it first if no
+    worker has yet. Catalogs of earlier snapshots are removed once the new one
+    is in place; workers still mapping them keep their data until they remap.
+    """
+    catalog_dir = catalog_dir or PARK_CATALOG_DIR
+    snapshot = snapshot_key(manager().db_path)
+    path = os.path.join(catalog_dir, f"{snapshot}-{CATALOG_FORMAT}.bin")
+    if not os.path.exists(path):
+        with manager() as connection:
+            columns, strings, cells = catalog_rows(connection)
+        write_catalog(path, snapshot, columns, strings, cells)
+        for name in os.listdir(catalog_dir):
+            if name.endswith('.bin') and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(catalog_dir, name))
+                except OSError:
+                    pass
+    return ParkCatalog(path)
+
+
+# Catalog mapped on first use in this worker, and remapped when the snapshot
+# changes; the one it replaced stays mapped so clients can be sent the difference
+park_catalog = None
+previous_park_catalog = None
+park_catalog_lock = threading.Lock()
+
+
+def get_park_catalog():
+    """Return the park catalog of the current serving snapshot."""
+    global park_catalog, previous_park_catalog
+    snapshot = snapshot_key(SafetyMapDatabaseContextManager().db_path)
+    if park_catalog is None or park_catalog.snapshot != snapshot:
+        with park_catalog_lock:
+            if park_catalog is None or park_catalog.snapshot != snapshot:
+                previous_park_catalog, park_catalog = park_catalog, open_catalog()
+    return park_catalog
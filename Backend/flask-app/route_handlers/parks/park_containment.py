@@ -0,0 +1,187 @@
+import math
+import sqlite3
+import threading
+import numpy as np
+from flask import jsonify, request
+from util.coordinates import is_valid_coordinate
+from util.database import SafetyMapDatabaseContextManager
+from route_handlers.parks.park_catalog import snapshot_key
+from route_handlers.parks.park_outlines import decode_geometry
+
+FULL_DETAIL_OUTLINES_QUERY = """
+    SELECT O.playground_name, O.location_id, O.centroid_latitude, O.centroid_longitude, OL.geometry
+    FROM Playground_Outline O
+    JOIN Playground_Outline_Level OL ON O.outline_id = OL.outline_id
+    WHERE OL.level = 0
+"""
+
+
+class RTree:
+    """
+    Static R-tree over bounding boxes, bulk-loaded with Sort-Tile-Recursive packing.
+
+    Items are (bbox, value) pairs, with bbox as (min_x, min_y, max_x, max_y).
+    """
+    def __init__(self, items, node_capacity=16):
+        self.node_capacity = node_capacity
+        # A node is (bbox, children, is_leaf); leaf children are (bbox, value) items
+        nodes = self._pack([(bbox, value) for bbox, value in items], is_leaf=True)
+        while len(nodes) > 1:
+            nodes = self._pack([(node[0], node) for node in nodes], is_leaf=False)
+        self.root = nodes[0] if nodes else None
+
+    def _pack(self, entries, is_leaf):
+        """Group entries into nodes of up to `node_capacity`, tiled by x then y."""
+        if not entries:
+            return []
+        capacity = self.node_capacity
+        slab_count = math.ceil(math.sqrt(math.ceil(len(entries) / capacity)))
+        slab_size = slab_count * capacity
+        entries = sorted(entries, key=lambda entry: entry[0][0] + entry[0][2])
+
+        nodes = []
+        for slab_start in range(0, len(entries), slab_size):
+            slab = sorted(entries[slab_start:slab_start + slab_size], key=lambda entry: entry[0][1] + entry[0][3])
+            for node_start in range(0, len(slab), capacity):
+                children = slab[node_start:node_start + capacity]
+                bbox = (
+                    min(child[0][0] for child in children), min(child[0][1] for child in children),
+                    max(child[0][2] for child in children), max(child[0][3] for child in children),
+                )
+                nodes.append((bbox, [child if is_leaf else child[1] for child in children], is_leaf))
+        return nodes
+
+    def query_point(self, x, y):
+        """Return the values whose bounding box contains the point."""
+        if self.root is None:
+            return []
+        results = []
+        stack = [self.root]
+        while stack:
+            bbox, children, is_leaf = stack.pop()
+            if not (bbox[0] <= x <= bbox[2] and bbox[1] <= y <= bbox[3]):
+                continue
+            if is_leaf:
+                results.extend(
+                    value for (min_x, min_y, max_x, max_y), value in children
+                    if min_x <= x <= max_x and min_y <= y <= max_y
+                )
+            else:
+                stack.extend(children)
+        return results
+
+
+class PolygonEdges:
+    """
+    Edge arrays of one polygon (outer ring plus holes) for vectorised
+    even-odd point-in-polygon tests.
+    """
+    def __init__(self, rings):
+        starts = [np.asarray(ring[:-1], dtype=np.float64) for ring in rings if len(ring) > 3]
+        ends = [np.asarray(ring[1:], dtype=np.float64) for ring in rings if len(ring) > 3]
+        start = np.concatenate(starts) if starts else np.empty((0, 2))
+        end = np.concatenate(ends) if ends else np.empty((0, 2))
+        self.x1, self.y1 = start[:, 0], start[:, 1]
+        self.x2, self.y2 = end[:, 0], end[:, 1]
+        # Horizontal edges never cross the ray; avoid dividing by zero for them
+        dy = self.y2 - self.y1
+        self.inverse_slope = np.divide(self.x2 - self.x1, dy, out=np.zeros_like(dy), where=dy != 0)
+
+    def contains(self, x, y):
+        crosses = (self.y1 > y) != (self.y2 > y)
+        intersect_x = self.x1 + (y - self.y1) * self.inverse_slope
+        return bool(np.count_nonzero(crosses & (x < intersect_x)) % 2)
+
+
+class ParkContainmentIndex:
+    """
+    Answers "which parks contain this point": an R-tree over outline bounding
+    boxes narrows the candidates, then each candidate polygon is tested exactly.
+    """
+    def __init__(self, outlines, snapshot=None):
+        """
+        Parameters:
+        - outlines (list): (properties dict, MultiPolygon coordinates) pairs, with
+          coordinates as [longitude, latitude].
+        - snapshot (str): Key of the database snapshot the outlines were read from.
+        """
+        self.snapshot = snapshot
+        self.outlines = []
+        items = []
+        for properties, multipolygon in outlines:
+            polygons = [PolygonEdges(polygon) for polygon in multipolygon]
+            vertices = [point for polygon in multipolygon for ring in polygon for point in ring]
+            if not vertices:
+                continue
+            bbox = (
+                min(point[0] for point in vertices), min(point[1] for point in vertices),
+                max(point[0] for point in vertices), max(point[1] for point in vertices),
+            )
+            items.append((bbox, len(self.outlines)))
+            self.outlines.append((properties, polygons))
+        self.rtree = RTree(items)
+
+    def __len__(self):
+        return len(self.outlines)
+
+    def containing(self, latitude, longitude):
+        """Return the properties of every outline containing the point."""
+        x, y = float(longitude), float(latitude)
+        matches = []
+        for outline_index in self.rtree.query_point(x, y):
+            properties, polygons = self.outlines[outline_index]
+            if any(polygon.contains(x, y) for polygon in polygons):
+                matches.append(properties)
+        return matches
+
+
+def load_outlines(connection):
+    """
+    Load full-detail playground outlines from the safety map database.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(FULL_DETAIL_OUTLINES_QUERY)
+    except sqlite3.OperationalError:
+        # The outline tables are only present once the geometry pipeline stage has run
+        return []
+    return [
+        ({"name": name, "type": "playground", "locationId": location_id}, decode_geometry(blob, lon, lat, precision=9))
+        for name, location_id, lat, lon, blob in cursor.fetchall()
+    ]
+
+
+# Index built on first use and shared by all requests in this worker
+containment_index = None
+containment_index_lock = threading.Lock()
+
+
+def get_containment_index(manager=SafetyMapDatabaseContextManager):
+    """Return the park containment index of the current serving snapshot, building it on first use."""
+    global containment_index
+    snapshot = snapshot_key(manager().db_path)
+    if containment_index is None or containment_index.snapshot != snapshot:
+        with containment_index_lock:
+            if containment_index is None or containment_index.snapshot != snapshot:
+                with manager() as connection:
+                    containment_index = ParkContainmentIndex(load_outlines(connection), snapshot)
+    return containment_index
+
+
+def get_containing_parks():
+    """
+    API endpoint returning the parks and playgrounds whose outline contains a point.
+
+    Expects a JSON payload with:
+        - latitude: Latitude of the point.
+        - longitude: Longitude of the point.
+
+    Returns:
+        - JSON response with the enclosing parks, or an error for invalid coordinates.
+    """
+    data = request.json or {}
+    if not is_valid_coordinate(data.get("latitude"), data.get("longitude")):
+        return jsonify({"error": "Valid latitude and longitude are required"}), 400
+    latitude, longitude = float(data["latitude"]), float(data["longitude"])
+
+    return jsonify({"parks": get_containment_index().containing(latitude, longitude)})
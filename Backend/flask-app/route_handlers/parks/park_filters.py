@@ -0,0 +1,244 @@
+import base64
+import bisect
+import json
+import re
+import threading
+import zlib
+from collections import defaultdict
+import numpy as np
+from route_handlers.parks.get_crime_accident_safety import (
+    calculate_safety_ratings, calculate_weather_score, get_cell_weather, get_safety_features,
+)
+
+# Parks per page when the request doesn't say, and the most it may ask for
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Sports are listed as free text separated by commas, some with details in
+# parentheses, e.g. "Cricket, Soccer (Indoor Soccer / Futsal)"
+SPORT_SEPARATOR = re.compile(r',(?![^()]*\))')
+
+NO_MATCHES = np.empty(0, dtype=np.int64)
+
+
+def sport_keys(sports_played):
+    """
+    Index keys of a free-text sports list: each sport, and each sport without
+    its parenthesised detail, so "tennis" finds "Tennis (Outdoor)".
+    """
+    keys = set()
+    for sport in SPORT_SEPARATOR.split(sports_played):
+        sport = sport.strip().casefold()
+        if sport:
+            keys.add(sport)
+            keys.add(sport.split('(')[0].strip())
+    return keys
+
+
+class ParkFilterIndex:
+    """
+    Inverted indexes over one catalog snapshot: the parks of each facility
+    type and each sport, and park names in sorted order for prefix search.
+
+    Parks are referred to by rank, their position in location id order, which
+    is also the order pages are served in. Each posting list is a sorted array
+    of ranks, so filters combine by intersecting them and a page is a slice.
+    """
+    def __init__(self, catalog):
+        self.snapshot = catalog.snapshot
+        ids = catalog.columns['location_id']
+        self.rows = np.argsort(ids, kind='stable')    # row of each rank
+        self.ids = ids[self.rows]                      # location id of each rank, ascending
+        ranks = np.empty(len(ids), dtype=np.int64)
+        ranks[self.rows] = np.arange(len(ids))
+
+        self.by_facility = self._postings(catalog, 'facility_code', ranks, lambda facility: [facility.casefold()])
+        self.by_sport = self._postings(catalog, 'sports_code', ranks, sport_keys)
+        self.by_name = self._postings(catalog, 'name_code', ranks, lambda name: [name.casefold()])
+        self.names = sorted(self.by_name)
+
+    @staticmethod
+    def _postings(catalog, column, ranks, keys_of):
+        """Ranks by key, where `keys_of` gives the keys of each string in the column."""
+        codes, inverse = np.unique(catalog.columns[column], return_inverse=True)
+        by_code = np.argsort(inverse, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(codes)))])
+        parts = defaultdict(list)
+        for position, code in enumerate(codes.tolist()):
+            code_ranks = ranks[by_code[starts[position]:starts[position + 1]]]
+            for key in keys_of(catalog.string(code)):
+                parts[key].append(code_ranks)
+        return {key: np.unique(np.concatenate(key_parts)) for key, key_parts in parts.items()}
+
+    def names_with_prefix(self, prefix):
+        """Indexed (case-folded) names starting with a prefix, in sorted order."""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.names, prefix)
+        end = bisect.bisect_left(self.names, prefix + '\U0010ffff', lo=start)
+        return self.names[start:end]
+
+    def matching(self, facilities=None, sports=None, name_prefix=None):
+        """
+        Ranks of the parks matching every given filter.
+
+        Parameters:
+        - facilities (list): Facility types, any of which may match (default: any type).
+        - sports (list): Sports, any of which may be played (default: any sport).
+        - name_prefix (str): Start of the park name, ignoring case (default: any name).
+
+        Returns:
+        - numpy.ndarray: Matching ranks, ascending.
+        """
+        postings = []
+        if facilities:
+            postings.append(self._union(self.by_facility, [facility.strip().casefold() for facility in facilities]))
+        if sports:
+            postings.append(self._union(self.by_sport, [sport.strip().casefold() for sport in sports]))
+        if name_prefix:
+            postings.append(self._union(self.by_name, self.names_with_prefix(name_prefix)))
+        if not postings:
+            return np.arange(len(self.ids))
+
+        # Intersect the shortest lists first
+        postings.sort(key=len)
+        matches = postings[0]
+        for posting in postings[1:]:
+            matches = np.intersect1d(matches, posting, assume_unique=True)
+        return matches
+
+    @staticmethod
+    def _union(postings, keys):
+        lists = [postings[key] for key in keys if key in postings]
+        if len(lists) == 1:
+            return lists[0]
+        return np.unique(np.concatenate(lists)) if lists else NO_MATCHES
+
+
+# Filter index of the catalog snapshot last served by this worker
+filter_index = None
+filter_index_lock = threading.Lock()
+
+
+def get_filter_index(catalog):
+    """Return the filter index of a catalog, building it on first use."""
+    global filter_index
+    if filter_index is None or filter_index.snapshot != catalog.snapshot:
+        with filter_index_lock:
+            if filter_index is None or filter_index.snapshot != catalog.snapshot:
+                filter_index = ParkFilterIndex(catalog)
+    return filter_index
+
+
+def as_list(value, name):
+    """A filter given as one string or a list of strings, as a list."""
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not all(isinstance(item, str) for item in values):
+        raise ValueError(f"{name} must be a string or a list of strings")
+    return values
+
+
+def parse_filter_options(data):
+    """
+    Read the filter and pagination options of a get_parks request.
+
+    Returns:
+    - dict: The options, or None if the request uses none of them.
+
+    Raises:
+    - ValueError: If an option is invalid.
+    """
+    names = ['facility', 'sport', 'minSafetyRating', 'namePrefix', 'limit', 'cursor']
+    if not any(data.get(name) is not None for name in names):
+        return None
+
+    options = {
+        'facilities': as_list(data['facility'], 'facility') if data.get('facility') is not None else None,
+        'sports': as_list(data['sport'], 'sport') if data.get('sport') is not None else None,
+        'min_safety_rating': data.get('minSafetyRating'),
+        'name_prefix': data.get('namePrefix'),
+    }
+    rating = options['min_safety_rating']
+    if rating is not None and (not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5):
+        raise ValueError("minSafetyRating must be a whole number from 1 to 5")
+    if options['name_prefix'] is not None and not isinstance(options['name_prefix'], str):
+        raise ValueError("namePrefix must be a string")
+
+    limit = data.get('limit', DEFAULT_PAGE_SIZE)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be a whole number from 1 to {MAX_PAGE_SIZE}")
+    options['limit'] = limit
+    options['after'] = decode_cursor(data['cursor'], options) if data.get('cursor') is not None else None
+    return options
+
+
+def filters_fingerprint(options):
+    """Checksum of the filters, so a cursor can't be replayed with different ones."""
+    filters = {name: options[name] for name in ['facilities', 'sports', 'min_safety_rating', 'name_prefix']}
+    return zlib.crc32(json.dumps(filters, sort_keys=True).encode('utf-8'))
+
+
+def encode_cursor(location_id, options):
+    """Opaque cursor for the page after the park with `location_id`."""
+    payload = json.dumps({'after': location_id, 'filters': filters_fingerprint(options)})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, options):
+    """The location id a cursor continues after; raises ValueError if it is invalid."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(str(cursor).encode('ascii')))
+        after, fingerprint = int(payload['after']), payload['filters']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("cursor is not valid")
+    if fingerprint != filters_fingerprint(options):
+        raise ValueError("cursor was issued for different filters")
+    return after
+
+
+def get_safety_page(catalog, options):
+    """
+    Fetch one page of the parks matching the filter options.
+
+    Pages are in location id order and the cursor holds the last id served,
+    so a page continues where the previous one stopped even if ratings or the
+    snapshot changed in between. Features are built, and weather looked up,
+    only for the parks scanned for the page.
+
+    Parameters:
+    - catalog (ParkCatalog): The park catalog of the current serving snapshot.
+    - options (dict): Options from parse_filter_options.
+
+    Returns:
+    - dict: {"features", "nextCursor"}; nextCursor is None on the last page.
+    """
+    index = get_filter_index(catalog)
+    ranks = index.matching(options['facilities'], options['sports'], options['name_prefix'])
+    if options['after'] is not None:
+        ranks = ranks[np.searchsorted(index.ids[ranks], options['after'], side='right'):]
+
+    limit, min_rating = options['limit'], options['min_safety_rating']
+    cell_weather, page = {}, []
+    scanned = 0
+    while scanned < len(ranks) and len(page) < limit:
+        # Scan a few pages' worth at a time, as the rating filter may reject some
+        chunk = ranks[scanned:scanned + (limit - len(page)) * (4 if min_rating else 1)]
+        rows = index.rows[chunk]
+        codes = catalog.columns['cell_code'][rows]
+        missing = [code for code in np.unique(codes).tolist() if catalog.cells[code] not in cell_weather]
+        cell_weather.update(get_cell_weather(catalog, missing))
+        if min_rating:
+            weather_scores = np.array([calculate_weather_score(cell_weather[catalog.cells[code]]) for code in codes.tolist()])
+            ratings = calculate_safety_ratings(
+                weather_scores, catalog.columns['crime_score'][rows], catalog.columns['accident_score'][rows],
+            )
+            passing = np.flatnonzero(ratings >= min_rating)
+            taken = passing[:limit - len(page)]
+            scanned += int(taken[-1]) + 1 if len(taken) == limit - len(page) else len(chunk)
+            page.extend(chunk[taken].tolist())
+        else:
+            page.extend(chunk.tolist())
+            scanned += len(chunk)
+
+    features = get_safety_features(catalog, cell_weather, index.rows[page]) if page else []
+    next_cursor = encode_cursor(int(index.ids[page[-1]]), options) if page and scanned < len(ranks) else None
+    return {"features": features, "nextCursor": next_cursor}
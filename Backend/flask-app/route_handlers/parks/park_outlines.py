@@ -0,0 +1,138 @@
+import math
+import sqlite3
+import struct
+from array import array
+
+# Map zoom thresholds to levels of detail: (minimum zoom, level).
+# Level 0 is the full outline; levels 1-3 are simplified to 1 m, 5 m and 20 m.
+ZOOM_LEVELS = [(17, 0), (15, 1), (13, 2), (0, 3)]
+
+# Highest map zoom level accepted for outlines
+MAX_ZOOM = 24
+
+OUTLINES_QUERY = """
+    SELECT O.playground_name, O.centroid_latitude, O.centroid_longitude, OL.level, OL.geometry
+    FROM Playground_Outline O
+    JOIN Playground_Outline_Level OL ON O.outline_id = OL.outline_id
+    WHERE OL.level = ?
+"""
+# Outlines overlapping the map: candidates come from the R*Tree of bounding
+# boxes, which stores them as 32-bit floats, so the exact bounds are checked too.
+# CROSS JOIN keeps the R*Tree as the outer loop, so the outline table is not scanned.
+OUTLINES_IN_BBOX_QUERY = """
+    SELECT O.playground_name, O.centroid_latitude, O.centroid_longitude, OL.level, OL.geometry
+    FROM Playground_Outline_Bounds B
+    CROSS JOIN Playground_Outline O ON O.outline_id = B.outline_id
+    JOIN Playground_Outline_Level OL ON O.outline_id = OL.outline_id
+    WHERE OL.level = :level
+      AND B.max_longitude >= :min_lon AND B.min_longitude <= :max_lon
+      AND B.max_latitude >= :min_lat AND B.min_latitude <= :max_lat
+      AND O.max_longitude >= :min_lon AND O.min_longitude <= :max_lon
+      AND O.max_latitude >= :min_lat AND O.min_latitude <= :max_lat
+"""
+
+
+def parse_outline_options(data):
+    """
+    Read the outline options of a get_parks request.
+
+    Returns:
+    - tuple: (zoom, bbox), or None if the request doesn't ask for outlines.
+
+    Raises:
+    - ValueError: If an option is invalid.
+    """
+    zoom = data.get('outlineZoom')
+    if zoom is None:
+        return None
+    if not isinstance(zoom, int) or isinstance(zoom, bool) or not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f"outlineZoom must be a whole number from 0 to {MAX_ZOOM}")
+
+    bbox = data.get('bbox')
+    if bbox is not None:
+        is_number = lambda value: isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        if not isinstance(bbox, list) or len(bbox) != 4 or not all(is_number(value) for value in bbox) \
+                or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            raise ValueError("bbox must be four numbers [minLon, minLat, maxLon, maxLat]")
+    return zoom, bbox
+
+
+def level_for_zoom(zoom):
+    """
+    Pick the outline level of detail for a map zoom level.
+    """
+    for min_zoom, level in ZOOM_LEVELS:
+        if zoom >= min_zoom:
+            return level
+    return ZOOM_LEVELS[-1][1]
+
+
+def decode_geometry(blob, centroid_longitude, centroid_latitude, precision=6):
+    """
+    Decode a packed outline into GeoJSON MultiPolygon coordinates.
+
+    The blob is written by the playground geometry pipeline stage as little-endian
+    uint32 polygon_count, uint32 ring_count[polygon_count], uint32
+    vertex_count[total_rings], then float32 (longitude, latitude) offsets from the
+    centroid.
+    """
+    (polygon_count,) = struct.unpack_from('<I', blob, 0)
+    ring_counts = struct.unpack_from(f'<{polygon_count}I', blob, 4)
+    total_rings = sum(ring_counts)
+    vertex_counts = struct.unpack_from(f'<{total_rings}I', blob, 4 * (1 + polygon_count))
+
+    offsets = array('f')
+    offsets.frombytes(blob[4 * (1 + polygon_count + total_rings):])
+
+    polygons = []
+    position = 0
+    ring_index = 0
+    for ring_count in ring_counts:
+        polygon = []
+        for vertex_count in vertex_counts[ring_index:ring_index + ring_count]:
+            values = offsets[position:position + 2 * vertex_count]
+            polygon.append([
+                [round(centroid_longitude + values[i], precision), round(centroid_latitude + values[i + 1], precision)]
+                for i in range(0, len(values), 2)
+            ])
+            position += 2 * vertex_count
+        polygons.append(polygon)
+        ring_index += ring_count
+    return polygons
+
+
+def get_outline_features(connection, zoom, bbox=None):
+    """
+    Fetch playground outlines as GeoJSON features at the level of detail for `zoom`.
+
+    Parameters:
+    - connection: SQLite connection to the safety map database.
+    - zoom (int): Map zoom level.
+    - bbox (list): Optional [min_longitude, min_latitude, max_longitude, max_latitude]
+      to only return outlines overlapping the visible map.
+
+    Returns:
+    - list: GeoJSON features with MultiPolygon geometries.
+    """
+    query = OUTLINES_QUERY
+    params = [level_for_zoom(zoom)]
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        query = OUTLINES_IN_BBOX_QUERY
+        params = {'level': params[0], 'min_lon': min_lon, 'max_lon': max_lon, 'min_lat': min_lat, 'max_lat': max_lat}
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+    except sqlite3.OperationalError:
+        # The outline tables are only present once the geometry pipeline stage has run
+        return []
+
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "MultiPolygon", "coordinates": decode_geometry(blob, lon, lat)},
+            "properties": {"type": "park_outline", "name": name, "level": level},
+        }
+        for name, lat, lon, level, blob in cursor.fetchall()
+    ]
@@ -0,0 +1,286 @@
+import bisect
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+import numpy as np
+from flask import jsonify, request
+from util.coordinates import is_valid_coordinate
+from util.database import SafetyMapDatabaseContextManager
+from route_handlers.parks.park_catalog import snapshot_key
+
+# Every searchable name with the location it belongs to; each table is read in full
+SEARCH_NAMES_QUERY = """
+    SELECT L.location_id, L.latitude, L.longitude, 'landmark', LM.landmark_name
+    FROM Landmark LM JOIN Location L ON L.location_id = LM.location_id
+    WHERE LM.landmark_name != ''
+    UNION ALL
+    SELECT L.location_id, L.latitude, L.longitude, 'facility', F.facility_name
+    FROM Facility F JOIN Location L ON L.location_id = F.location_id
+    WHERE F.facility_name != ''
+    UNION ALL
+    SELECT L.location_id, L.latitude, L.longitude, 'playground', P.playground_name
+    FROM Playground P JOIN Location L ON L.location_id = P.location_id
+    WHERE P.playground_name != ''
+"""
+
+# Suggestions returned when the request doesn't say, and the most it may ask for
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+# Words shorter than this are only matched by prefix; longer ones that start no
+# indexed word may match with one typo, or two from FUZZY_TWO_EDITS_LENGTH letters
+FUZZY_MIN_LENGTH = 4
+FUZZY_TWO_EDITS_LENGTH = 7
+
+# Indexed words sharing the most trigrams with a misspelt word that are checked for a close match
+FUZZY_CANDIDATES = 100
+
+# Ranking keys are match class * RANK_STRIDE + distance in km (or name length),
+# so every name starting with the query ranks above those with it later on,
+# and those above typo matches
+RANK_STRIDE = 100_000.0
+
+EARTH_RADIUS_KM = 6371.0
+
+WORD = re.compile(r'\w+')
+
+
+def normalise(text):
+    """Case-fold a name and strip its accents, so "Café" is found by "cafe"."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def trigrams(word):
+    """Trigrams of a word, marked at the start so prefixes share the first one."""
+    padded = '^' + word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance(query, word, max_edits):
+    """
+    Fewest single-letter edits turning `query` into the start of `word`, or
+    max_edits + 1 if it takes more.
+    """
+    word = word[:len(query) + max_edits]
+    previous = list(range(len(word) + 1))
+    for i, char in enumerate(query, 1):
+        current = [i]
+        for j, other in enumerate(word, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        if min(current) > max_edits:
+            return max_edits + 1
+        previous = current
+    return min(previous)
+
+
+def distances_km(latitude, longitude, latitudes, longitudes):
+    """Haversine distances from one point to arrays of points."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class NameSearchIndex:
+    """
+    Word index over the landmark, facility and playground names of one serving
+    snapshot, for search-as-you-type.
+
+    Every word of a query matches the indexed words it starts: the distinct
+    words are kept sorted, so those form one range found by bisection, and the
+    names holding each word are stored grouped in the same order, so a range
+    of words maps to one slice of name numbers. When too few names match as
+    typed, a trigram index over the words finds close spellings of the query
+    words that start none.
+    """
+    def __init__(self, rows, snapshot=None):
+        """
+        Parameters:
+        - rows (iterable): (location_id, latitude, longitude, kind, name) of each name.
+        - snapshot (str): Snapshot key of the database the rows were read from.
+        """
+        self.snapshot = snapshot
+        self.names, self.kinds, self.location_ids, latitudes, longitudes = [], [], [], [], []
+        entry_words, seen = [], set()
+        for location_id, latitude, longitude, kind, name in rows:
+            name = (name or '').strip()
+            words = list(dict.fromkeys(WORD.findall(normalise(name))))
+            if not words or (location_id, name) in seen:
+                continue
+            seen.add((location_id, name))
+            self.names.append(name)
+            self.kinds.append(kind)
+            self.location_ids.append(location_id)
+            latitudes.append(np.nan if latitude is None else latitude)
+            longitudes.append(np.nan if longitude is None else longitude)
+            entry_words.append(words)
+
+        self.latitudes = np.array(latitudes, dtype=np.float64)
+        self.longitudes = np.array(longitudes, dtype=np.float64)
+        self.name_lengths = np.array([len(name) for name in self.names], dtype=np.float64)
+
+        self.words = sorted({word for words in entry_words for word in words})
+        word_ids = {word: number for number, word in enumerate(self.words)}
+        self.first_words = np.array([word_ids[words[0]] for words in entry_words], dtype=np.int64)
+        pair_words = np.array([word_ids[word] for words in entry_words for word in words], dtype=np.int64)
+        pair_entries = np.repeat(np.arange(len(entry_words)), [len(words) for words in entry_words])
+        self.postings = pair_entries[np.argsort(pair_words, kind='stable')]
+        self.word_starts = np.concatenate([[0], np.cumsum(np.bincount(pair_words, minlength=len(self.words)))])
+
+        by_trigram = defaultdict(list)
+        for number, word in enumerate(self.words):
+            for trigram in trigrams(word):
+                by_trigram[trigram].append(number)
+        self.by_trigram = {trigram: np.array(numbers, dtype=np.int64) for trigram, numbers in by_trigram.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def word_range(self, prefix):
+        """First and past-the-last number of the indexed words starting with a prefix."""
+        start = bisect.bisect_left(self.words, prefix)
+        return start, bisect.bisect_left(self.words, prefix + '\U0010ffff', lo=start)
+
+    def similar_words(self, word):
+        """Numbers of the indexed words whose start is within a typo or two of `word`."""
+        max_edits = 2 if len(word) >= FUZZY_TWO_EDITS_LENGTH else 1
+        lists = [self.by_trigram[trigram] for trigram in trigrams(word) if trigram in self.by_trigram]
+        if not lists:
+            return []
+        # Each edit changes at most three trigrams
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.words))
+        candidates = np.flatnonzero(shared >= max(1, len(trigrams(word)) - 3 * max_edits))
+        if len(candidates) > FUZZY_CANDIDATES:
+            candidates = candidates[np.argpartition(-shared[candidates], FUZZY_CANDIDATES)[:FUZZY_CANDIDATES]]
+        return [number for number in candidates.tolist() if prefix_distance(word, self.words[number], max_edits) <= max_edits]
+
+    def _matches(self, words, fuzzy):
+        """
+        Names holding every query word, and which of them matched only
+        fuzzily. If `fuzzy`, words that start no indexed word match close
+        spellings instead.
+        """
+        candidates = exact = None
+        for word in words:
+            start, end = self.word_range(word)
+            matched = np.zeros(len(self.names), dtype=bool)
+            matched[self.postings[self.word_starts[start]:self.word_starts[end]]] = True
+            word_exact = matched
+            if fuzzy and start == end and len(word) >= FUZZY_MIN_LENGTH:
+                word_exact = matched.copy()
+                for number in self.similar_words(word):
+                    matched[self.postings[self.word_starts[number]:self.word_starts[number + 1]]] = True
+            candidates = matched if candidates is None else candidates & matched
+            exact = word_exact if exact is None else exact & word_exact
+        entries = np.flatnonzero(candidates)
+        return entries, ~exact[entries]
+
+    def search(self, query, limit=DEFAULT_SUGGESTIONS, latitude=None, longitude=None):
+        """
+        Suggest names for a partly typed query.
+
+        Names starting with the query come first, then names with the query's
+        words further in, then names matching only with a typo. Within each,
+        names nearer the user come first when their location is given, and
+        shorter names otherwise.
+
+        Parameters:
+        - query (str): The text typed so far.
+        - limit (int): The most suggestions to return.
+        - latitude (float): User latitude, to rank by distance (optional).
+        - longitude (float): User longitude, to rank by distance (optional).
+
+        Returns:
+        - list: {"id", "name", "kind", "coordinates", "match"} of each suggestion,
+          with "distanceKm" when the user location is given.
+        """
+        words = list(dict.fromkeys(WORD.findall(normalise(query))))
+        if not words or not len(self.names):
+            return []
+        entries, fuzzy = self._matches(words, fuzzy=False)
+        if len(entries) < limit and any(len(word) >= FUZZY_MIN_LENGTH for word in words):
+            entries, fuzzy = self._matches(words, fuzzy=True)
+        if not len(entries):
+            return []
+
+        start, end = self.word_range(words[0])
+        first_words = self.first_words[entries]
+        match_class = np.where(fuzzy, 2, np.where((first_words >= start) & (first_words < end), 0, 1))
+        ranked_by_distance = latitude is not None and longitude is not None
+        if ranked_by_distance:
+            distances = distances_km(latitude, longitude, self.latitudes[entries], self.longitudes[entries])
+            secondary = np.nan_to_num(distances, nan=RANK_STRIDE - 1)
+        else:
+            secondary = self.name_lengths[entries]
+        keys = match_class * RANK_STRIDE + secondary
+
+        top = np.arange(len(entries))
+        if len(entries) > limit:
+            top = np.argpartition(keys, limit - 1)[:limit]
+        top = sorted(top.tolist(), key=lambda position: (keys[position], self.names[entries[position]]))
+
+        suggestions = []
+        for position in top:
+            entry = int(entries[position])
+            latitude_value, longitude_value = self.latitudes[entry], self.longitudes[entry]
+            suggestion = {
+                "id": self.location_ids[entry],
+                "name": self.names[entry],
+                "kind": self.kinds[entry],
+                "coordinates": None if np.isnan(latitude_value) else [float(longitude_value), float(latitude_value)],
+                "match": "fuzzy" if fuzzy[position] else "prefix",
+            }
+            if ranked_by_distance:
+                suggestion["distanceKm"] = None if np.isnan(distances[position]) else round(float(distances[position]), 2)
+            suggestions.append(suggestion)
+        return suggestions
+
+
+# Search index of the serving snapshot last searched by this worker
+search_index = None
+search_index_lock = threading.Lock()
+
+
+def get_search_index(manager=SafetyMapDatabaseContextManager):
+    """Return the name search index of the current serving snapshot, building it on first use."""
+    global search_index
+    snapshot = snapshot_key(manager().db_path)
+    if search_index is None or search_index.snapshot != snapshot:
+        with search_index_lock:
+            if search_index is None or search_index.snapshot != snapshot:
+                with manager() as connection:
+                    rows = connection.execute(SEARCH_NAMES_QUERY).fetchall()
+                search_index = NameSearchIndex(rows, snapshot)
+    return search_index
+
+
+def search_parks():
+    """
+    Suggest landmarks, facilities and playgrounds by name as the user types.
+
+    Query parameters:
+        - q: The text typed so far.
+        - limit: The most suggestions to return (default DEFAULT_SUGGESTIONS).
+        - latitude, longitude: User location, to rank nearer places first (optional).
+
+    Returns:
+        - JSON response with "results", best match first.
+    """
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SUGGESTIONS))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return jsonify({'error': f'limit must be a whole number from 1 to {MAX_SUGGESTIONS}'}), 400
+
+    latitude, longitude = request.args.get('latitude'), request.args.get('longitude')
+    if latitude is not None or longitude is not None:
+        if not is_valid_coordinate(latitude, longitude):
+            return jsonify({'error': 'Invalid latitude or longitude values'}), 400
+        latitude, longitude = float(latitude), float(longitude)
+
+    results = get_search_index().search(query, limit, latitude, longitude)
+    return jsonify({'results': results})
@@ -0,0 +1,326 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+import numpy as np
+from flask import Response, jsonify, request, stream_with_context
+from util.concurrency_gate import GateSaturated
+from util.sse import format_sse
+from route_handlers.parks.get_crime_accident_safety import calculate_safety_rating, calculate_weather_score
+from route_handlers.parks.park_catalog import get_park_catalog
+from route_handlers.parks.park_versions import format_version, weather_generations
+
+# Weather cells are coordinates rounded to two decimals, so each covers this
+# far either side of its centre
+CELL_HALF_SIZE_DEG = 0.005
+
+# How often each worker checks for weather changes recorded by other workers
+UPDATES_POLL_SEC = 2
+
+# Idle time after which a comment is sent to keep the connection open
+HEARTBEAT_SEC = 15
+
+# Messages queued for a slow client before they are replaced by a resync event
+MAX_PENDING_MESSAGES = 32
+
+RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+# Each open stream holds a worker thread: at most this many streams per worker,
+# each ended after this long without an update (clients reconnect when needed)
+MAX_SUBSCRIBERS = int(os.getenv('PARK_UPDATES_MAX_SUBSCRIBERS', 64))
+MAX_IDLE_SEC = float(os.getenv('PARK_UPDATES_MAX_IDLE_SEC', 300))
+
+# Suggested wait before a rejected client tries to subscribe again
+SUBSCRIBE_RETRY_AFTER_SEC = 30
+
+IDLE_MESSAGE = "event: idle\ndata: {}\n\n"
+
+
+class Subscription:
+    """
+    One client's subscription to a bounding box, with the messages waiting to
+    be streamed to it.
+    """
+    def __init__(self, bbox):
+        self.bbox = bbox
+        # The box grown by half a cell: the cells overlapping it have their centre in here
+        min_lon, min_lat, max_lon, max_lat = bbox
+        self.bounds = (min_lat - CELL_HALF_SIZE_DEG, min_lon - CELL_HALF_SIZE_DEG,
+                       max_lat + CELL_HALF_SIZE_DEG, max_lon + CELL_HALF_SIZE_DEG)
+        self._messages = deque()
+        self._condition = threading.Condition()
+
+    def overlaps(self, cell):
+        """Whether a weather cell overlaps the subscribed box."""
+        lat, lon = cell
+        south, west, north, east = self.bounds
+        return south <= lat <= north and west <= lon <= east
+
+    def push(self, message):
+        """
+        Queue a message. If the client has fallen too far behind, its queue is
+        replaced by a resync event telling it to fetch the map again.
+        """
+        with self._condition:
+            if len(self._messages) >= MAX_PENDING_MESSAGES:
+                self._messages.clear()
+                message = RESYNC_MESSAGE
+            self._messages.append(message)
+            self._condition.notify()
+
+    def next(self, timeout):
+        """Wait up to `timeout` seconds for the next message; None if there is none."""
+        with self._condition:
+            if not self._messages:
+                self._condition.wait(timeout)
+            return self._messages.popleft() if self._messages else None
+
+
+class SubscriptionIndex:
+    """
+    Subscriptions by weather cell. Each subscription is listed under the cells
+    holding parks that overlap its box, so a change in a cell reaches its
+    subscribers with one lookup and no per-subscription checks.
+    """
+    def __init__(self):
+        self._cells = defaultdict(set)
+        self._subscriptions = {}    # subscription -> cells it is listed under
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cells_of(subscription, catalog):
+        south, west, north, east = subscription.bounds
+        lat, lon = catalog.cell_coordinates[:, 0], catalog.cell_coordinates[:, 1]
+        codes = np.flatnonzero((south <= lat) & (lat <= north) & (west <= lon) & (lon <= east))
+        return [catalog.cells[code] for code in codes.tolist()]
+
+    def _list(self, subscription, catalog):
+        cells = self._cells_of(subscription, catalog)
+        self._subscriptions[subscription] = cells
+        for cell in cells:
+            self._cells[cell].add(subscription)
+
+    def add(self, subscription, catalog):
+        with self._lock:
+            self._reindex(catalog)
+            self._list(subscription, catalog)
+
+    def remove(self, subscription):
+        with self._lock:
+            for cell in self._subscriptions.pop(subscription, ()):
+                self._cells[cell].discard(subscription)
+                if not self._cells[cell]:
+                    del self._cells[cell]
+
+    def reindex(self, catalog):
+        """List every subscription under the cells of a new catalog snapshot."""
+        with self._lock:
+            self._reindex(catalog)
+
+    def _reindex(self, catalog):
+        if catalog.snapshot == self._snapshot:
+            return
+        self._snapshot = catalog.snapshot
+        self._cells.clear()
+        for subscription in list(self._subscriptions):
+            self._list(subscription, catalog)
+
+    def subscribers(self, cell):
+        """Subscriptions whose box overlaps a weather cell."""
+        with self._lock:
+            return list(self._cells.get(cell, ()))
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+
+def cell_fragment(catalog, cell_code, weather_main):
+    """JSON of the new weather and safety rating of every park in a cell, without the brackets."""
+    rows = catalog.cell_rows(cell_code)
+    weather_score = calculate_weather_score(weather_main)
+    columns = zip(
+        catalog.columns['location_id'][rows].tolist(),
+        catalog.columns['crime_score'][rows].tolist(),
+        catalog.columns['accident_score'][rows].tolist(),
+    )
+    return ", ".join(
+        json.dumps({"id": location_id, "weather": weather_main, "safetyRating": calculate_safety_rating(weather_score, crime_score, accident_score)})
+        for location_id, crime_score, accident_score in columns
+    )
+
+
+def publish(index, catalog, cell_weather, version):
+    """
+    Push the parks in cells whose weather changed to the subscriptions
+    covering them. The features of each cell are serialised once, however
+    many subscriptions receive them, and each subscription gets one message.
+
+    Parameters:
+    - index (SubscriptionIndex): The subscriptions.
+    - catalog (ParkCatalog): The park catalog of the current serving snapshot.
+    - cell_weather (dict): New weather condition by changed cell.
+    - version (str): Map version token after the change.
+
+    Returns:
+    - int: The number of subscriptions a message was pushed to.
+    """
+    index.reindex(catalog)
+    fragments = defaultdict(list)
+    for cell, weather_main in cell_weather.items():
+        cell_code = catalog.cell_codes.get(cell)
+        subscribers = index.subscribers(cell) if cell_code is not None else []
+        if subscribers:
+            fragment = cell_fragment(catalog, cell_code, weather_main)
+            for subscription in subscribers:
+                fragments[subscription].append(fragment)
+
+    prefix = f'event: update\ndata: {{"version": {json.dumps(version)}, "features": ['
+    for subscription, subscription_fragments in fragments.items():
+        subscription.push(prefix + ", ".join(subscription_fragments) + "]}\n\n")
+    return len(fragments)
+
+
+class ParkUpdateBroadcaster:
+    """
+    Pushes weather changes to the clients subscribed in this worker process.
+
+    Changes recorded in this process wake the broadcaster straight away;
+    those recorded by other workers are picked up from the shared weather
+    generations every `poll_sec` seconds while anyone is subscribed.
+    At most `max_subscribers` clients are subscribed at once, and their
+    streams end after `max_idle_sec` seconds without an update.
+    """
+    def __init__(self, generations=None, poll_sec=UPDATES_POLL_SEC,
+                 max_subscribers=MAX_SUBSCRIBERS, max_idle_sec=MAX_IDLE_SEC):
+        self.index = SubscriptionIndex()
+        self.poll_sec = poll_sec
+        self.max_subscribers = max_subscribers
+        self.max_idle_sec = max_idle_sec
+        self._generations = generations or weather_generations
+        self._generation = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._generations.add_listener(lambda generation: self._wake.set())
+
+    def subscribe(self, bbox):
+        """
+        Start streaming changes in a box; returns the subscription and the current version.
+
+        Raises:
+        - GateSaturated: If this worker already has `max_subscribers` subscriptions.
+        """
+        subscription = Subscription(bbox)
+        with self._lock:
+            if len(self.index) >= self.max_subscribers:
+                raise GateSaturated("Too many park update streams", 503, SUBSCRIBE_RETRY_AFTER_SEC)
+            if not len(self.index):
+                # Nobody was listening: start from the current generation rather than replaying
+                self._generation = None
+                self.poll()
+            self.index.add(subscription, get_park_catalog())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return subscription, format_version(get_park_catalog().snapshot, self._generation)
+
+    def unsubscribe(self, subscription):
+        self.index.remove(subscription)
+
+    def poll(self):
+        """Publish the weather changes recorded since the last poll, by any worker."""
+        if self._generation is None:
+            self._generation = self._generations.current_generation()
+            return
+        generation, cell_weather = self._generations.changed_since(self._generation)
+        if cell_weather:
+            catalog = get_park_catalog()
+            publish(self.index, catalog, cell_weather, format_version(catalog.snapshot, generation))
+        self._generation = generation
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_sec)
+            self._wake.clear()
+            if not len(self.index):
+                continue
+            try:
+                with self._lock:
+                    self.poll()
+            except Exception as e:
+                print(f"Error publishing park updates: {e}")
+
+
+broadcaster = ParkUpdateBroadcaster()
+
+
+def parse_bbox(value):
+    """Parse "minLon,minLat,maxLon,maxLat" into a tuple of floats, or None if invalid."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in str(value).split(','))
+    except ValueError:
+        return None
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        return None
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def get_park_updates():
+    """
+    Stream weather and safety rating changes for the parks in a bounding box
+    as Server-Sent Events, so clients don't need to poll `get_parks`.
+
+    Query parameters:
+        - bbox: "minLon,minLat,maxLon,maxLat" of the map view.
+
+    Events:
+        - `subscribed`: Sent first, with the current map `version`.
+        - `update`: The new `version` and, for each park in a cell whose weather
+          changed, `{"id", "weather", "safetyRating"}`.
+        - `resync`: Updates were dropped because the client fell behind; fetch
+          `get_parks` again with the last version.
+        - `idle`: Sent before the stream ends, after MAX_IDLE_SEC seconds
+          without an update; subscribe again while the map is in use.
+        - Comment lines are sent every HEARTBEAT_SEC seconds while idle.
+
+    Returns:
+        - A `text/event-stream` response, a JSON error if the box is invalid,
+          or a 503 with Retry-After if this worker has MAX_SUBSCRIBERS streams open.
+    """
+    bbox = parse_bbox(request.args.get('bbox'))
+    if bbox is None:
+        return jsonify({'error': 'bbox must be "minLon,minLat,maxLon,maxLat"'}), 400
+
+    try:
+        subscription, version = broadcaster.subscribe(bbox)
+    except GateSaturated as e:
+        response = jsonify({'error': str(e), 'retryAfter': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, e.status_code
+
+    max_idle_sec = broadcaster.max_idle_sec
+
+    def generate():
+        try:
+            yield format_sse({'version': version}, event='subscribed')
+            last_update = time.monotonic()
+            while True:
+                idle_sec = time.monotonic() - last_update
+                if idle_sec >= max_idle_sec:
+                    yield IDLE_MESSAGE
+                    return
+                message = subscription.next(min(HEARTBEAT_SEC, max_idle_sec - idle_sec))
+                if message is not None:
+                    last_update = time.monotonic()
+                    yield message
+                elif time.monotonic() - last_update < max_idle_sec:
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscription))
+    return response
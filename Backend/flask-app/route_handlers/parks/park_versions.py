@@ -0,0 +1,243 @@
+import threading
+import numpy as np
+from util.database import AppDatabaseContextManager
+from route_handlers.parks.get_crime_accident_safety import get_cell_weather, get_safety_data, get_safety_features
+from route_handlers.parks.park_catalog import get_park_catalog
+
+# Send the whole map instead of a delta that would hold more than this share of it
+MAX_DELTA_SHARE = 0.5
+
+# Catalog columns that, with the weather, determine a park feature
+FEATURE_COLUMNS = ['latitude', 'longitude', 'crime', 'accidents', 'crime_score', 'accident_score']
+
+
+class WeatherGenerations:
+    """
+    Generation counter per weather cell, shared by every worker process through
+    the app state database.
+
+    The map version is the highest generation. Whenever the weather condition
+    of some cells changes, those cells move to a new generation, so the parks
+    changed since a version are the ones in cells with a later generation.
+    """
+    def __init__(self, db_manager=AppDatabaseContextManager):
+        self._db_manager = db_manager
+        self._table_initialized = False
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def initialize_table(self):
+        """Create the weather generation table if it does not exist."""
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS weather_generations (
+                cell_latitude REAL,
+                cell_longitude REAL,
+                weather TEXT,
+                generation INTEGER,
+                PRIMARY KEY (cell_latitude, cell_longitude)
+            )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_weather_generations_generation ON weather_generations (generation)")
+            conn.commit()
+        self._table_initialized = True
+
+    def record(self, cell_weather):
+        """
+        Store the current weather of each cell, moving the cells whose weather
+        changed to a new generation.
+
+        Parameters:
+        - cell_weather (dict): Weather condition by cell.
+
+        Returns:
+        - tuple: (current generation, dict of generation by cell)
+        """
+        self._ensure_table()
+        changed = []
+        with self._db_manager() as conn:
+            stored = self._read(conn)
+            if self._changed(stored, cell_weather):
+                # Re-read under the write lock, as another worker may have recorded the same change
+                conn.execute("BEGIN IMMEDIATE")
+                stored = self._read(conn)
+                changed = self._changed(stored, cell_weather)
+                if changed:
+                    generation = max((generation for _, generation in stored.values()), default=0) + 1
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO weather_generations (cell_latitude, cell_longitude, weather, generation) VALUES (?, ?, ?, ?)",
+                        [(*cell, cell_weather[cell], generation) for cell in changed],
+                    )
+                    stored.update((cell, (cell_weather[cell], generation)) for cell in changed)
+                conn.commit()
+
+        generations = {cell: generation for cell, (_, generation) in stored.items()}
+        current = max(generations.values(), default=0)
+        if changed:
+            for listener in list(self._listeners):
+                listener(current)
+        return current, generations
+
+    def changed_since(self, generation):
+        """
+        Fetch the cells whose weather changed after a generation.
+
+        Parameters:
+        - generation (int): The last generation the caller has seen.
+
+        Returns:
+        - tuple: (latest generation among the changes, or `generation` if none; dict of weather condition by changed cell)
+        """
+        self._ensure_table()
+        with self._db_manager() as conn:
+            rows = conn.execute(
+                "SELECT cell_latitude, cell_longitude, weather, generation FROM weather_generations WHERE generation > ?",
+                (generation,),
+            ).fetchall()
+        return max((row[3] for row in rows), default=generation), {(lat, lon): weather for lat, lon, weather, _ in rows}
+
+    def current_generation(self):
+        """The latest generation recorded by any worker."""
+        self._ensure_table()
+        with self._db_manager() as conn:
+            return conn.execute("SELECT MAX(generation) FROM weather_generations").fetchone()[0] or 0
+
+    def add_listener(self, listener):
+        """Call `listener(generation)` whenever this process records a new generation."""
+        self._listeners.append(listener)
+
+    def _ensure_table(self):
+        with self._lock:
+            if not self._table_initialized:
+                self.initialize_table()
+
+    @staticmethod
+    def _read(conn):
+        rows = conn.execute("SELECT cell_latitude, cell_longitude, weather, generation FROM weather_generations").fetchall()
+        return {(lat, lon): (weather, generation) for lat, lon, weather, generation in rows}
+
+    @staticmethod
+    def _changed(stored, cell_weather):
+        return [cell for cell, weather in cell_weather.items() if stored.get(cell, (None,))[0] != weather]
+
+
+weather_generations = WeatherGenerations()
+
+
+def refresh_park_weather(generations=None):
+    """
+    Look up the weather of every cell holding a park (from the API cache while
+    it is fresh) and record the cells whose weather changed, which pushes them
+    to clients subscribed to park updates.
+    """
+    catalog = get_park_catalog()
+    if len(catalog):
+        (generations or weather_generations).record(get_cell_weather(catalog))
+
+
+def format_version(snapshot, generation):
+    """Version token for the parks map of a snapshot at a weather generation."""
+    return f"{snapshot}:{generation}"
+
+
+def parse_version(version):
+    """Split a version token into (snapshot, generation), or None if it is malformed."""
+    try:
+        snapshot, generation = str(version).rsplit(':', 1)
+        return snapshot, int(generation)
+    except ValueError:
+        return None
+
+
+def changed_rows(catalog, previous, since, generations):
+    """
+    Catalog rows whose feature differs from the one a client saw at `since`,
+    and the ids of locations that are gone, or None if that can't be told.
+
+    Parameters:
+    - catalog (ParkCatalog): The park catalog of the current snapshot.
+    - previous (ParkCatalog): The catalog the client's version belongs to.
+    - since (int): The weather generation of the client's version.
+    - generations (dict): Generation by cell.
+
+    Returns:
+    - tuple: (numpy.ndarray of rows, list of removed location ids), or None.
+    """
+    cell_generations = np.array([generations.get(cell, 0) for cell in catalog.cells], dtype=np.int64)
+    changed = cell_generations[catalog.columns['cell_code']] > since
+    if previous is catalog:
+        return np.flatnonzero(changed), []
+
+    ids, previous_ids = catalog.columns['location_id'], previous.columns['location_id']
+    if len(np.unique(ids)) != len(ids) or len(np.unique(previous_ids)) != len(previous_ids):
+        return None
+
+    # Match each location to its row in the previous catalog
+    kept = np.zeros(len(ids), dtype=bool)
+    matches = np.zeros(len(ids), dtype=np.int64)
+    if len(previous_ids):
+        order = np.argsort(previous_ids)
+        matches = order[np.searchsorted(previous_ids, ids, sorter=order).clip(max=len(order) - 1)]
+        kept = previous_ids[matches] == ids
+
+    changed |= ~kept
+    rows, previous_rows = np.flatnonzero(kept), matches[kept]
+    for name in FEATURE_COLUMNS:
+        current, before = catalog.columns[name][rows], previous.columns[name][previous_rows]
+        same = current == before
+        if current.dtype.kind == 'f':
+            same |= np.isnan(current) & np.isnan(before)
+        changed[rows] |= ~same
+    for name in ['facility_code', 'name_code']:
+        current = catalog.strings(catalog.columns[name][rows])
+        before = previous.strings(previous.columns[name][previous_rows])
+        changed[rows] |= np.array([a != b for a, b in zip(current, before)], dtype=bool)
+
+    removed = np.setdiff1d(previous_ids, ids).tolist()
+    return np.flatnonzero(changed), removed
+
+
+def get_safety_update(catalog, version=None, previous=None, generations=None):
+    """
+    Fetch the parks safety map, or only what changed since the version a
+    client last received.
+
+    A delta holds the features whose properties changed and the ids of parks
+    removed since `version`. The whole map is sent instead when there is no
+    version, when it belongs to a snapshot older than `previous`, or when the
+    delta would not be much smaller.
+
+    Parameters:
+    - catalog (ParkCatalog): The park catalog of the current serving snapshot.
+    - version (str): Version token from an earlier response (default: None).
+    - previous (ParkCatalog): The catalog this worker served before `catalog` (default: None).
+    - generations (WeatherGenerations): Weather generation store (default: the shared one).
+
+    Returns:
+    - dict: {"features", "removed", "version", "delta"}, or an error tuple if the catalog is empty.
+    """
+    if not len(catalog):
+        return get_safety_data(catalog)
+    generations = generations or weather_generations
+
+    cell_weather = get_cell_weather(catalog)
+    generation, cell_generations = generations.record(cell_weather)
+    update = {"features": None, "removed": [], "version": format_version(catalog.snapshot, generation), "delta": False}
+
+    parsed = parse_version(version) if version is not None else None
+    if parsed is not None and parsed[1] <= generation:
+        snapshot, since = parsed
+        base = {catalog.snapshot: catalog}
+        if previous is not None:
+            base.setdefault(previous.snapshot, previous)
+        if snapshot in base:
+            changes = changed_rows(catalog, base[snapshot], since, cell_generations)
+            if changes is not None and len(changes[0]) + len(changes[1]) <= MAX_DELTA_SHARE * len(catalog):
+                rows, update["removed"] = changes
+                update["features"] = get_safety_features(catalog, cell_weather, rows)
+                update["delta"] = True
+
+    if update["features"] is None:
+        update["features"] = get_safety_features(catalog, cell_weather)
+    return update
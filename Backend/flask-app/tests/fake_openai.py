@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+
+class FakeRunStream:
+    """
+    Stand-in for the Assistants run stream manager: replays canned text deltas
+    through the event handler, like the real SDK does.
+    """
+    def __init__(self, client, event_handler):
+        self.client = client
+        self.event_handler = event_handler
+
+    def __enter__(self):
+        self.event_handler.text_deltas = self._text_deltas()
+        self.event_handler.until_done = lambda: list(self.event_handler.text_deltas)
+        return self.event_handler
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def _text_deltas(self):
+        for chunk in self.client.reply_chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            self.event_handler.on_text_delta(SimpleNamespace(value=chunk), None)
+            yield chunk
+
+
+class FakeOpenAI:
+    """
+    Local fake of the OpenAI client covering the Assistants API calls the
+    chatbot makes. Every call is recorded in `calls`.
+    """
+    def __init__(self, api_key=None, reply_chunks=("Hello ", "there", "!")):
+        self.api_key = api_key
+        self.reply_chunks = list(reply_chunks)
+        self.calls = []
+        self._thread_count = 0
+        self.beta = SimpleNamespace(
+            assistants=SimpleNamespace(create=self._create_assistant, delete=self._delete_assistant),
+            threads=SimpleNamespace(
+                create=self._create_thread,
+                messages=SimpleNamespace(create=self._create_message),
+                runs=SimpleNamespace(stream=self._stream_run),
+            ),
+        )
+
+    def _create_assistant(self, **kwargs):
+        self.calls.append(('assistants.create', kwargs))
+        return SimpleNamespace(id='asst_fake')
+
+    def _delete_assistant(self, assistant_id):
+        self.calls.append(('assistants.delete', assistant_id))
+        return SimpleNamespace(id=assistant_id, deleted=True)
+
+    def _create_thread(self, **kwargs):
+        self._thread_count += 1
+        self.calls.append(('threads.create', kwargs))
+        return SimpleNamespace(id=f'thread_fake_{self._thread_count}')
+
+    def _create_message(self, **kwargs):
+        self.calls.append(('threads.messages.create', kwargs))
+        return SimpleNamespace(id='msg_fake')
+
+    def _stream_run(self, event_handler=None, **kwargs):
+        self.calls.append(('threads.runs.stream', kwargs))
+        return FakeRunStream(self, event_handler)
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import unittest
+from app import app, create_app
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be loaded on first use or by the warm-up hook
+HEAVY_MODULES = ['numpy', 'matplotlib', 'openai', 'polyline', 'requests']
+
+
+class TestAppStartup(unittest.TestCase):
+
+    def test_import_does_not_load_heavy_modules(self):
+        # A fresh interpreter, since other tests may already have imported them
+        code = (
+            "import sys, app; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_factory_registers_routes(self):
+        rules = {rule.rule for rule in create_app().url_map.iter_rules()}
+        self.assertIn('/api/parks/get_parks', rules)
+        self.assertIn('/api/chat/get_chat_response', rules)
+
+    def test_handler_module_imported_on_first_request(self):
+        response = app.test_client().get('/api/chat/session_stats')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('route_handlers.chat.get_chat_response', sys.modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+from functools import partial
+from unittest.mock import patch
+from flask import Flask
+from fake_openai import FakeOpenAI
+from util.database import SQLiteContextManager
+from route_handlers.chat import openAi_chatbot as chatbot
+from route_handlers.chat import get_chat_response as chat_handler
+from route_handlers.chat.answer_cache import AnswerCache, normalise_question
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.db_manager = partial(SQLiteContextManager, self.db_path)
+        self.clock = FakeClock()
+        self.cache = AnswerCache(threshold=0.8, ttl_sec=60, db_manager=self.db_manager, clock=self.clock)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_normalise_question(self):
+        self.assertEqual(normalise_question("  Which PARK is safe?! "), "which park is safe")
+
+    def test_similar_question_hits(self):
+        self.cache.store("Which park is safe?", "Fitzroy Gardens has a 5-star rating!", remote_sec=2.0)
+        self.cache.store("How much screen time is OK?", "Two hours or less a day.", remote_sec=2.0)
+        self.assertEqual(self.cache.lookup("which park is safe"), "Fitzroy Gardens has a 5-star rating!")
+        self.assertEqual(self.cache.lookup("Hi Pal, how much screen time is ok"), "Two hours or less a day.")
+        self.assertIsNone(self.cache.lookup("What is the weather tomorrow?"))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertAlmostEqual(stats['hitRate'], 2 / 3)
+        self.assertGreater(stats['estimatedSavedMs'], 3000)
+
+    def test_entries_expire(self):
+        self.cache.store("Which park is safe?", "Fitzroy Gardens.")
+        self.clock.now += 61
+        self.assertIsNone(self.cache.lookup("Which park is safe?"))
+
+    def test_entries_persist(self):
+        self.cache.store("Which park is safe?", "Fitzroy Gardens.")
+        other_worker = AnswerCache(threshold=0.8, ttl_sec=60, db_manager=self.db_manager, clock=self.clock)
+        self.assertEqual(other_worker.lookup("which park is safe"), "Fitzroy Gardens.")
+
+    def test_workers_read_each_others_answers(self):
+        other_worker = AnswerCache(threshold=0.8, ttl_sec=60, refresh_sec=10, db_manager=self.db_manager, clock=self.clock)
+        self.assertIsNone(other_worker.lookup("How much screen time is OK?"))
+        self.clock.now += 1
+        self.cache.store("How much screen time is OK?", "Two hours or less a day.")
+        self.assertIsNone(other_worker.lookup("How much screen time is OK?"))
+        self.clock.now += 10
+        self.assertEqual(other_worker.lookup("How much screen time is OK?"), "Two hours or less a day.")
+
+    def test_personal_questions_are_not_cached(self):
+        self.cache.store("My son is 7, which park near 12 Smith St is safe?", "Try Fitzroy Gardens, Sam!")
+        self.cache.store("I'm worried about screen time, is it OK?", "Two hours or less a day.")
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+        self.cache.store("How much screen time is OK?", "Two hours or less a day.")
+        self.assertIsNone(self.cache.lookup("We think how much screen time is OK?"))
+        self.assertEqual(self.cache.lookup("how much screen time is ok"), "Two hours or less a day.")
+
+    def test_store_indexes_without_full_rebuild(self):
+        topics = [first + second for first in "bcdfghkl" for second in ("ab", "ek", "ix", "om", "uz", "yn")]
+        for topic in topics[:40]:
+            self.cache.store(f"What do {topic} birds eat?", f"{topic} seeds.")
+        self.cache.lookup("what do bab birds eat")
+        with patch.object(self.cache, '_rebuild', wraps=self.cache._rebuild) as rebuild:
+            self.cache.store("Which park is safe?", "Fitzroy Gardens.")
+            self.assertEqual(self.cache.lookup("which park is safe"), "Fitzroy Gardens.")
+            self.assertEqual(self.cache.lookup("what do dek birds eat"), "dek seeds.")
+            rebuild.assert_not_called()
+
+            for topic in topics[40:45]:
+                self.cache.store(f"What do {topic} birds eat?", f"{topic} seeds.")
+            self.assertEqual(self.cache.lookup(f"what do {topics[44]} birds eat"), f"{topics[44]} seeds.")
+            rebuild.assert_called_once()
+
+
+class TestChatResponseWithAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.fake_client = FakeOpenAI(reply_chunks=["Two hours ", "or less."])
+        cache = AnswerCache(db_manager=partial(SQLiteContextManager, self.db_path))
+        patchers = (
+            patch.object(chatbot, 'client', self.fake_client),
+            patch.object(chatbot, 'assistant_id', 'asst_test'),
+            patch.object(chat_handler, 'answer_cache', cache),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        test_app = Flask(__name__)
+        test_app.add_url_rule('/reply', view_func=chat_handler.get_chat_response, methods=['POST'])
+        self.app = test_app.test_client()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def runs(self):
+        return [call for call in self.fake_client.calls if call[0] == 'threads.runs.stream']
+
+    def test_repeated_question_skips_assistant(self):
+        first = self.app.post('/reply', json={'message': 'How much screen time is OK?'})
+        second = self.app.post('/reply', json={'message': 'how much screen time is ok'})
+        self.assertEqual(second.json['reply'], first.json['reply'])
+        self.assertEqual(len(self.runs()), 1)
+
+        # A follow-up in the cached session seeds a new thread with the cached turn
+        self.app.post('/reply', json={'message': 'Why?', 'sessionId': second.json['sessionId']})
+        self.assertEqual(len(self.runs()), 2)
+        thread_create = [call for call in self.fake_client.calls if call[0] == 'threads.create'][-1]
+        self.assertEqual(thread_create[1]['messages'][1], {"role": "assistant", "content": "Two hours or less."})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from functools import partial
+from unittest.mock import patch
+from fake_openai import FakeOpenAI
+from util.database import SQLiteContextManager
+from route_handlers.chat import openAi_chatbot as chatbot
+
+
+class TestLazyAssistant(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.fake_client = FakeOpenAI()
+        patchers = [
+            patch.object(chatbot, 'client', self.fake_client),
+            patch.object(chatbot, 'assistant_id', None),
+            patch.object(chatbot, 'AppDatabaseContextManager', partial(SQLiteContextManager, self.db_path)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def assistant_creates(self):
+        return [call for call in self.fake_client.calls if call[0] == 'assistants.create']
+
+    def test_client_requires_key_only_on_use(self):
+        with patch.object(chatbot, 'client', None), patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(chatbot.client)
+            with self.assertRaises(EnvironmentError):
+                chatbot.get_client()
+
+    def test_assistant_created_once_and_reused(self):
+        first_id = chatbot.get_assistant_id()
+        self.assertEqual(len(self.assistant_creates()), 1)
+
+        # A fresh worker or restart finds the persisted ID
+        chatbot.assistant_id = None
+        self.assertEqual(chatbot.get_assistant_id(), first_id)
+        self.assertEqual(len(self.assistant_creates()), 1)
+
+    def test_changed_prompt_creates_new_assistant(self):
+        chatbot.get_assistant_id()
+        chatbot.assistant_id = None
+        with patch.object(chatbot, 'SYSTEM_PROMPT', "A different prompt"):
+            chatbot.get_assistant_id()
+        self.assertEqual(len(self.assistant_creates()), 2)
+
+    def test_assistant_created_without_holding_the_database(self):
+        create_assistant = self.fake_client.beta.assistants.create
+
+        def create_while_another_worker_stores(**kwargs):
+            # Other writers go ahead during the OpenAI call; here another worker stores its assistant first
+            connection = sqlite3.connect(self.db_path, timeout=0)
+            connection.execute("INSERT INTO openai_assistants VALUES (?, 'asst_other', '')", (chatbot.assistant_config_hash(),))
+            connection.commit()
+            connection.close()
+            return create_assistant(**kwargs)
+
+        with patch.object(self.fake_client.beta.assistants, 'create', side_effect=create_while_another_worker_stores):
+            self.assertEqual(chatbot.get_assistant_id(), 'asst_other')
+        self.assertIn(('assistants.delete', 'asst_fake'), self.fake_client.calls)
+
+    def test_first_request_uses_lazy_assistant(self):
+        reply, thread_id = chatbot.send_prompt_and_get_response("Hi")
+        self.assertEqual(reply, "Hello there!")
+        run = [call for call in self.fake_client.calls if call[0] == 'threads.runs.stream'][0]
+        self.assertEqual(run[1]['assistant_id'], 'asst_fake')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from fake_openai import FakeOpenAI
+from route_handlers.chat import openAi_chatbot as chatbot
+from route_handlers.chat import get_chat_response as chat_handler
+
+
+def parse_sse(body):
+    """Split an SSE body into (event, data) tuples."""
+    events = []
+    for message in body.strip().split('\n\n'):
+        event, data = 'message', None
+        for line in message.split('\n'):
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        events.append((event, data))
+    return events
+
+
+class TestChatResponseStream(unittest.TestCase):
+
+    def setUp(self):
+        self.fake_client = FakeOpenAI(reply_chunks=["Try ", "the ", "park!"])
+        patchers = (
+            patch.object(chatbot, 'client', self.fake_client),
+            patch.object(chatbot, 'assistant_id', 'asst_test'),
+            patch.object(chat_handler, 'answer_cache', None),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        test_app = Flask(__name__)
+        test_app.add_url_rule('/stream', view_func=chat_handler.get_chat_response_stream, methods=['POST'])
+        test_app.add_url_rule('/reply', view_func=chat_handler.get_chat_response, methods=['POST'])
+        self.app = test_app.test_client()
+
+    def test_stream_forwards_deltas(self):
+        response = self.app.post('/stream', json={'message': 'Where can I play?'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/event-stream'))
+
+        events = parse_sse(response.get_data(as_text=True))
+        self.assertEqual(events[0][0], 'session')
+        deltas = [data['delta'] for event, data in events if event == 'message']
+        self.assertEqual(deltas, ["Try ", "the ", "park!"])
+        done = events[-1]
+        self.assertEqual(done[0], 'done')
+        self.assertEqual(done[1]['sessionId'], events[0][1]['sessionId'])
+        self.assertIsNotNone(done[1]['timeToFirstTokenMs'])
+
+        # The full reply is stored in the session, which continues on the same thread
+        session = chat_handler.session_store.get(done[1]['sessionId'])
+        self.assertEqual(session['conversation'][-1]['ai'], "Try the park!")
+        self.app.post('/stream', json={'message': 'Thanks', 'sessionId': done[1]['sessionId']}).get_data()
+        thread_creates = [call for call in self.fake_client.calls if call[0] == 'threads.create']
+        self.assertEqual(len(thread_creates), 1)
+
+    def test_stream_reports_errors(self):
+        self.fake_client.reply_chunks = ["Partial", RuntimeError("run failed")]
+        response = self.app.post('/stream', json={'message': 'Hi'})
+        events = parse_sse(response.get_data(as_text=True))
+        self.assertEqual(events[-1], ('error', {'error': 'run failed'}))
+
+    def test_stream_requires_message(self):
+        response = self.app.post('/stream', json={})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_streaming_reply_matches(self):
+        response = self.app.post('/reply', json={'message': 'Hi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['reply'], "Try the park!")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import csv
+import io
+import itertools
+import json
+import os
+import unittest
+from unittest.mock import patch
+from app import app
+from route_handlers.learning_hub.cohort_assessment import assess_activities, assessment_lines, assessment_results, cohort_summary
+from route_handlers.learning_hub.get_questionnaire import assess_activity, create_spider_chart
+from route_handlers.parent import get_parental_guidance
+from route_handlers.parent.get_parental_guidance import SURVEY_VALUES
+
+WALK_OR_CYCLE_ANSWERS = ["Most of the time", "sometimes", "SOMETIMES, but most of the time by car", "Never", ""]
+FIELDS = list(SURVEY_VALUES)
+
+
+def every_response():
+    """A survey response for every combination of answers."""
+    for levels in itertools.product(range(1, 5), repeat=len(FIELDS)):
+        for walk_or_cycle in WALK_OR_CYCLE_ANSWERS:
+            yield {**dict(zip(FIELDS, levels)), 'walkOrCycle': walk_or_cycle}
+
+
+def scalar_assessment(response):
+    values = [SURVEY_VALUES[field][response[field]] for field in FIELDS]
+    return assess_activity(*values, response['walkOrCycle'])
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+class TestCohortAssessment(unittest.TestCase):
+
+    def setUp(self):
+        self.responses = list(every_response())
+        columns = [[SURVEY_VALUES[field][response[field]] for response in self.responses] for field in FIELDS]
+        self.assessment = assess_activities(*columns, [response['walkOrCycle'] for response in self.responses])
+        self.expected = [scalar_assessment(response) for response in self.responses]
+
+    def test_matches_scalar_assessment(self):
+        results = list(assessment_results(self.assessment))
+        self.assertEqual(len(results), len(self.expected))
+        for response, result, expected in zip(self.responses, results, self.expected):
+            with self.subTest(response=response):
+                self.assertEqual(result, expected)
+                self.assertEqual(list(result['scores']), list(expected['scores']))
+
+    def test_lines_match_scalar_assessment(self):
+        for index, (line, expected) in enumerate(zip(assessment_lines(self.assessment, range(len(self.expected))), self.expected)):
+            self.assertEqual(json.loads(line), {
+                'index': index, 'scores': expected['scores'],
+                'feedback': expected['status'], 'detailedAssessment': expected['recommendations'],
+            })
+
+    def test_cohort_summary(self):
+        summary = cohort_summary(self.assessment)
+        self.assertEqual(summary['assessed'], len(self.expected))
+        screen_scores = [expected['scores']['screen_time'] for expected in self.expected]
+        self.assertEqual(summary['averageScores']['screen_time'], round(sum(screen_scores) / len(screen_scores), 1))
+        meets_screen_time = sum(expected['status'][1]['meets_criteria'] for expected in self.expected)
+        self.assertEqual(summary['meetsCriteria']['Screen Time'], round(100 * meets_screen_time / len(self.expected), 1))
+        recommended = sum(len(expected['recommendations']) for expected in self.expected)
+        self.assertEqual(sum(summary['recommendations'].values()), recommended)
+
+    def test_chart_of_cohort_averages(self):
+        chart_path = create_spider_chart(cohort_summary(self.assessment)['averageScores'])
+        self.addCleanup(os.remove, chart_path)
+        self.assertTrue(os.path.getsize(chart_path) > 0)
+
+    @patch.object(get_parental_guidance, 'create_spider_chart', return_value='static/images/parent/spider_chart_mock.png')
+    def test_cohort_route_streams_results_in_order(self, mock_create_spider_chart):
+        client = app.test_client()
+        uploaded = self.responses[:1500] + [{'outdoorTime': 5}, 'not a response', {**self.responses[0], 'walkOrCycle': 3}]
+        lines = read_lines(client.post('/api/parent/get_cohort_guidance', json=uploaded))
+
+        self.assertEqual([line.get('index') for line in lines[:-1]], list(range(len(uploaded))))
+        self.assertEqual(lines[0]['feedback'], self.expected[0]['status'])
+        self.assertEqual(lines[1499]['detailedAssessment'], self.expected[1499]['recommendations'])
+        self.assertTrue(all('error' in line for line in lines[1500:-1]))
+        cohort = lines[-1]['cohort']
+        self.assertEqual((cohort['responses'], cohort['assessed'], cohort['invalid']), (1503, 1500, 3))
+        self.assertEqual(cohort['plotImageUrl'], '/static/images/parent/spider_chart_mock.png')
+        mock_create_spider_chart.assert_called_once_with(cohort['averageScores'])
+
+    def test_cohort_route_renders_chart(self):
+        client = app.test_client()
+        cohort = read_lines(client.post('/api/parent/get_cohort_guidance', json=self.responses[:50]))[-1]['cohort']
+        self.assertIsNotNone(cohort['plotImageUrl'])
+        chart_path = cohort['plotImageUrl'].lstrip('/')
+        self.addCleanup(os.remove, chart_path)
+        self.assertTrue(os.path.getsize(chart_path) > 0)
+
+    @patch.object(get_parental_guidance, 'create_spider_chart', return_value='static/images/parent/spider_chart_mock.png')
+    def test_cohort_route_reads_csv(self, mock_create_spider_chart):
+        client = app.test_client()
+        csv_file = io.StringIO()
+        writer = csv.DictWriter(csv_file, FIELDS + ['walkOrCycle'])
+        writer.writeheader()
+        writer.writerows(self.responses[:20])
+        lines = read_lines(client.post('/api/parent/get_cohort_guidance', data=csv_file.getvalue(), content_type='text/csv'))
+        self.assertEqual([line['feedback'] for line in lines[:-1]], [expected['status'] for expected in self.expected[:20]])
+        self.assertEqual(lines[-1]['cohort']['assessed'], 20)
+
+    def test_cohort_route_rejects_bad_uploads(self):
+        client = app.test_client()
+        self.assertEqual(client.post('/api/parent/get_cohort_guidance', json={'outdoorTime': 1}).status_code, 400)
+        with patch.object(get_parental_guidance, 'MAX_COHORT_RESPONSES', 2):
+            self.assertEqual(client.post('/api/parent/get_cohort_guidance', json=self.responses[:3]).status_code, 413)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from functools import partial
+from unittest.mock import patch
+from flask import Flask
+from fake_openai import FakeOpenAI
+from util.concurrency_gate import ConcurrencyGate, GateSaturated, SharedSlots
+from util.database import SQLiteContextManager
+from route_handlers.chat import openAi_chatbot as chatbot
+from route_handlers.chat import get_chat_response as chat_handler
+
+
+class NoWaitDatabase(SQLiteContextManager):
+    """Fails at once, instead of after the default timeout, when the database is locked."""
+    def connect(self):
+        return sqlite3.connect(self.db_path, timeout=0)
+
+
+class TestConcurrencyGate(unittest.TestCase):
+
+    def test_admits_up_to_limit_then_rejects(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=0)
+        gate.acquire('a')
+        with self.assertRaises(GateSaturated) as context:
+            gate.acquire('b')
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        gate.release()
+        gate.acquire('b')
+        self.assertEqual(gate.stats()['rejected'], 1)
+
+    def test_per_session_queue_limit(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=4, max_queue_per_key=1, max_wait_sec=5)
+        gate.acquire('a')
+        waiter = threading.Thread(target=lambda: (gate.acquire('a'), gate.release()))
+        waiter.start()
+        while gate.stats()['queueDepth'] < 1:
+            time.sleep(0.001)
+        with self.assertRaises(GateSaturated) as context:
+            gate.acquire('a')
+        self.assertEqual(context.exception.status_code, 429)
+        gate.release()
+        waiter.join()
+
+    def test_queue_wait_times_out(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=4, max_wait_sec=0.05)
+        gate.acquire('a')
+        with self.assertRaises(GateSaturated):
+            gate.acquire('b')
+        stats = gate.stats()
+        self.assertEqual(stats['timedOut'], 1)
+        self.assertEqual(stats['queueDepth'], 0)
+
+    def test_slots_granted_round_robin_across_sessions(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=8, max_queue_per_key=4, max_wait_sec=5)
+        gate.acquire('holder')
+        order = []
+
+        def worker(key):
+            gate.acquire(key)
+            order.append(key)
+            gate.release()
+
+        # Session 'a' queues three requests before 'b' queues one
+        threads = []
+        for key in ['a', 'a', 'a', 'b']:
+            thread = threading.Thread(target=worker, args=(key,))
+            thread.start()
+            threads.append(thread)
+            while gate.stats()['queueDepth'] < len(threads):
+                time.sleep(0.001)
+        gate.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order[:2], ['a', 'b'])
+
+
+class TestSharedSlots(unittest.TestCase):
+
+    def setUp(self):
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, db_path)
+        self.db_manager = partial(SQLiteContextManager, db_path)
+
+    def test_limit_holds_across_workers(self):
+        # Each gate stands in for another gunicorn worker
+        first, second = (
+            ConcurrencyGate(max_concurrent=2, max_queue=4, max_wait_sec=0.2, shared=SharedSlots('chat', 2, db_manager=self.db_manager))
+            for _ in range(2)
+        )
+        first.acquire('a')
+        first.acquire('b')
+        with self.assertRaises(GateSaturated):
+            second.acquire('c')
+        self.assertEqual(second.stats()['inFlight'], 0)
+        self.assertEqual(second.stats()['sharedInFlight'], 2)
+
+        # A waiting caller gets the slot another worker gives back
+        releaser = threading.Timer(0.05, first.release)
+        releaser.start()
+        second.acquire('c')
+        releaser.join()
+        self.assertEqual(second.stats()['sharedInFlight'], 2)
+
+    def test_waiting_caller_gives_back_its_local_slot(self):
+        shared = SharedSlots('chat', 1, db_manager=self.db_manager)
+        ConcurrencyGate(max_concurrent=1, shared=shared).acquire('a')
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=4, max_wait_sec=0.3, shared=shared)
+        waiter = threading.Thread(target=self.assertRaises, args=(GateSaturated, gate.acquire, 'b'))
+        waiter.start()
+        time.sleep(0.1)
+        self.assertEqual(gate.stats()['inFlight'], 0)
+        waiter.join()
+
+        stats = gate.stats()
+        self.assertEqual((stats['admitted'], stats['timedOut']), (0, 1))
+        self.assertEqual((stats['avgWaitMs'], stats['maxWaitMs']), (0.0, 0.0))
+        self.assertEqual(gate.total_wait_sec, 0.0)
+
+    def test_locked_database_counts_as_no_slot(self):
+        shared = SharedSlots('chat', 1, db_manager=partial(NoWaitDatabase, self.db_manager.args[0]))
+        shared.held()
+        with self.db_manager() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self.assertFalse(shared.try_acquire(shared.new_holder()))
+            conn.rollback()
+        self.assertTrue(shared.try_acquire(shared.new_holder()))
+
+    def test_without_queue_rejects_at_once(self):
+        shared = SharedSlots('chat', 1, db_manager=self.db_manager)
+        ConcurrencyGate(max_concurrent=1, shared=shared).acquire('a')
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=0, max_wait_sec=5, shared=shared)
+        started = time.monotonic()
+        with self.assertRaises(GateSaturated):
+            gate.acquire('b')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(gate.stats()['rejected'], 1)
+
+    def test_slots_of_dead_or_expired_holders_are_reclaimed(self):
+        clock = [1000.0]
+        shared = SharedSlots('chat', 1, lease_sec=60, db_manager=self.db_manager, clock=lambda: clock[0])
+        self.assertTrue(shared.try_acquire(shared.new_holder()))
+        self.assertFalse(shared.try_acquire(shared.new_holder()))
+        clock[0] += 61
+        self.assertTrue(shared.try_acquire(shared.new_holder()))
+
+        with self.db_manager() as conn:
+            conn.execute("UPDATE concurrency_slots SET pid = -1")
+        with patch('util.concurrency_gate.process_alive', return_value=False):
+            self.assertTrue(shared.try_acquire(shared.new_holder()))
+
+
+class TestChatResponseSaturated(unittest.TestCase):
+
+    def setUp(self):
+        gate = ConcurrencyGate(max_concurrent=1, max_queue=0)
+        patchers = (
+            patch.object(chatbot, 'client', FakeOpenAI()),
+            patch.object(chatbot, 'assistant_id', 'asst_test'),
+            patch.object(chat_handler, 'answer_cache', None),
+            patch.object(chat_handler, 'chat_gate', gate),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.gate = gate
+
+        test_app = Flask(__name__)
+        test_app.add_url_rule('/reply', view_func=chat_handler.get_chat_response, methods=['POST'])
+        test_app.add_url_rule('/stream', view_func=chat_handler.get_chat_response_stream, methods=['POST'])
+        self.app = test_app.test_client()
+
+    def test_rejected_with_retry_after(self):
+        self.gate.acquire('someone-else')
+        for path in ('/reply', '/stream'):
+            response = self.app.post(path, json={'message': 'Hi'})
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response.headers)
+        self.gate.release()
+
+    def test_stream_releases_slot(self):
+        self.app.post('/stream', json={'message': 'Hi'}).get_data()
+        self.assertEqual(self.gate.stats()['inFlight'], 0)
+        response = self.app.post('/reply', json={'message': 'Hi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.gate.stats()['inFlight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from app import app
+from route_handlers.learning_hub.cohort_assessment import walk_or_cycle_outcome
+from route_handlers.learning_hub.get_questionnaire import assess_activity
+from route_handlers.parent import guidance_table as guidance_table_module
+from route_handlers.parent.guidance_table import SURVEY_VALUES, GuidanceTable, answer_index, guidance_table
+
+WALK_OR_CYCLE_ANSWERS = ["Most of the time", "Sometimes", "SOMETIMES, most of the time by car", "Never", ""]
+
+
+def every_answer():
+    """Every combination of survey answer levels and walking or cycling answers."""
+    for levels in itertools.product(range(1, 5), repeat=len(SURVEY_VALUES)):
+        for walk_or_cycle in WALK_OR_CYCLE_ANSWERS:
+            yield list(levels), walk_or_cycle
+
+
+def draw_chart(scores, chart_filename):
+    with open(chart_filename, 'wb') as file:
+        file.write(b'png')
+    return chart_filename
+
+
+class TestGuidanceTable(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_table_matches_live_assessment(self):
+        indexes = set()
+        for levels, walk_or_cycle in every_answer():
+            values = [SURVEY_VALUES[field][level] for field, level in zip(SURVEY_VALUES, levels)]
+            expected = assess_activity(*values, walk_or_cycle)
+            index = answer_index(levels, walk_or_cycle_outcome(walk_or_cycle))
+            indexes.add(index)
+            with self.subTest(levels=levels, walk_or_cycle=walk_or_cycle):
+                self.assertEqual(guidance_table.result(index), expected)
+                self.assertEqual(json.loads(f'{{{guidance_table.fragment(index)}}}'), {
+                    'feedback': expected['status'], 'detailedAssessment': expected['recommendations'],
+                })
+        self.assertEqual(indexes, set(range(len(guidance_table))))
+        self.assertEqual(len(guidance_table), 4 ** 5 * 3)
+
+    def test_charts_are_shared_by_equal_scores(self):
+        table = GuidanceTable(chart_dir=self.workdir)
+        keys = {}
+        for index in range(len(table)):
+            keys.setdefault(tuple(table.scores[index].tolist()), set()).add(table.chart_keys[index])
+        self.assertTrue(all(len(chart_keys) == 1 for chart_keys in keys.values()))
+        self.assertEqual(len(set(table.chart_keys)), len(keys))
+
+        # 90 and 150 outdoor minutes both score 100, so share a chart
+        first = answer_index([1, 3, 1, 1, 1], 0)
+        second = answer_index([1, 4, 1, 1, 1], 0)
+        with patch.object(guidance_table_module, 'create_spider_chart', side_effect=draw_chart) as mock_create_spider_chart:
+            self.assertEqual(table.chart(first), table.chart(second))
+            self.assertTrue(os.path.exists(table.chart(first)))
+        mock_create_spider_chart.assert_called_once()
+        self.assertEqual(os.listdir(self.workdir), [os.path.basename(table.chart(first))])
+
+    def test_route_serves_table_and_keeps_shared_charts(self):
+        client = app.test_client()
+        table = GuidanceTable(chart_dir=self.workdir)
+        data = {"outdoorTime": 4, "outdoorFrequency": 4, "screenTime": 3, "peFrequency": 2, "physicalActivityDays": 4, "walkOrCycle": "Sometimes"}
+        expected = assess_activity(6, 150, 3.0, 1, 6, "Sometimes")
+
+        with patch('route_handlers.parent.get_parental_guidance.guidance_table', table), \
+                patch.object(guidance_table_module, 'create_spider_chart', side_effect=draw_chart):
+            response = client.post('/api/parent/get_parental_guidance', json=data)
+            chart_url = response.json['plotImageUrl']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['feedback'], expected['status'])
+        self.assertEqual(response.json['detailedAssessment'], expected['recommendations'])
+        self.assertTrue(os.path.exists(chart_url[1:]))
+
+        shared_url = f"/{guidance_table_module.GUIDANCE_CHART_DIR}/spider_chart_{table.chart_keys[0]}.png"
+        with patch('route_handlers.parent.get_parental_guidance.os.remove') as mock_remove:
+            response = client.post('/api/parent/cleanup_spider_chart_png', json={"filename": shared_url})
+        self.assertEqual(response.status_code, 204)
+        mock_remove.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
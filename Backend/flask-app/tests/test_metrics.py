@@ -0,0 +1,247 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import requests
+import util.api_catching as api_caching
+import util.database as database
+from app import app, requests_in_flight
+from util import metrics
+from util.metrics import MetricsRegistry, aggregate
+from util.processes import process_alive
+
+WEATHER_URL = 'http://api.openweathermap.org/data/2.5/weather'
+WEATHER_NAMESPACE = 'api.openweathermap.org/data/2.5/weather'
+
+
+def sample(registry, line_start):
+    """Value of the one exposed sample whose line starts with `line_start`."""
+    values = [line.rsplit(' ', 1)[1] for line in registry.render().splitlines() if line.startswith(line_start)]
+    return float(values[0]) if values else 0.0
+
+
+def exited_pid():
+    """A process ID no running process has."""
+    return next(pid for pid in range(4_194_303, 0, -1) if not process_alive(pid))
+
+
+def upstream_response(status_code=200, body=None):
+    response = Mock(status_code=status_code)
+    response.json.return_value = body if body is not None else {'temp': 20}
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} error")
+    return response
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_histogram_exposition(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram('job_seconds', 'Job time.', ('job',), buckets=(0.1, 1.0))
+        for value in [0.05, 0.1, 0.5, 3.0]:
+            latency.labels('say "hi"\n').observe(value)
+
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP job_seconds Job time.',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{job="say \\"hi\\"\\n",le="0.1"} 2.0',
+            'job_seconds_bucket{job="say \\"hi\\"\\n",le="1.0"} 3.0',
+            'job_seconds_bucket{job="say \\"hi\\"\\n",le="+Inf"} 4.0',
+            'job_seconds_sum{job="say \\"hi\\"\\n"} 3.65',
+            'job_seconds_count{job="say \\"hi\\"\\n"} 4.0',
+        ])
+
+    def test_counters_gauges_and_functions(self):
+        registry = MetricsRegistry()
+        hits = registry.counter('hits_total', 'Hits.', ('kind',))
+        hits.labels('a').inc()
+        hits.labels('a').inc(2)
+        busy = registry.gauge('busy', 'Busy.')
+        with busy.labels().track_in_progress():
+            self.assertEqual(sample(registry, 'busy '), 1.0)
+        registry.gauge_function('depth', 'Depth.', lambda: 7)
+
+        self.assertEqual(sample(registry, 'hits_total{kind="a"}'), 3.0)
+        self.assertEqual(sample(registry, 'busy '), 0.0)
+        self.assertEqual(sample(registry, 'depth '), 7.0)
+        with self.assertRaises(ValueError):
+            hits.labels('a', 'b')
+
+    def test_registering_again_shares_the_metric(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('calls_total', 'Calls.', ('route',))
+        self.assertIs(registry.counter('calls_total', 'Calls.', ('route',)), counter)
+        with self.assertRaises(ValueError):
+            registry.gauge('calls_total', 'Calls.', ('route',))
+
+    def test_disabled_metrics_record_nothing(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('calls_total', 'Calls.')
+        latency = registry.histogram('call_seconds', 'Call time.')
+        with patch.object(metrics, 'enabled', False):
+            counter.labels().inc()
+            latency.labels().observe(0.5)
+        self.assertEqual(sample(registry, 'calls_total '), 0.0)
+        self.assertEqual(sample(registry, 'call_seconds_count '), 0.0)
+
+
+class TestWorkerAggregation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def worker_registry(self, hits, latency, busy):
+        registry = MetricsRegistry()
+        registry.counter('hits_total', 'Hits.', ('kind',)).labels('a').inc(hits)
+        registry.histogram('job_seconds', 'Job time.', ('job',), buckets=(0.1, 1.0)).labels('load').observe(latency)
+        registry.gauge('busy', 'Busy.').labels().inc(busy)
+        registry.gauge_function('depth', 'Depth.', lambda: busy)
+        return registry
+
+    def test_workers_are_merged(self):
+        self.worker_registry(hits=2, latency=0.05, busy=1).write_snapshot(self.directory)
+        self.worker_registry(hits=3, latency=0.5, busy=4).write_snapshot(self.directory, pid=os.getppid())
+        # A worker that has exited still counts towards the totals, but not the gauges
+        self.worker_registry(hits=5, latency=3.0, busy=10).write_snapshot(self.directory, pid=exited_pid())
+
+        merged = aggregate(self.directory)
+        self.assertEqual(sample(merged, 'hits_total{kind="a"}'), 10.0)
+        self.assertEqual(sample(merged, 'job_seconds_bucket{job="load",le="0.1"}'), 1.0)
+        self.assertEqual(sample(merged, 'job_seconds_bucket{job="load",le="1.0"}'), 2.0)
+        self.assertEqual(sample(merged, 'job_seconds_count{job="load"}'), 3.0)
+        self.assertAlmostEqual(sample(merged, 'job_seconds_sum{job="load"}'), 3.55)
+        self.assertEqual(sample(merged, 'busy '), 5.0)
+        self.assertEqual(sample(merged, 'depth '), 5.0)
+
+    def test_snapshots_are_rewritten_whole(self):
+        registry = self.worker_registry(hits=1, latency=0.05, busy=0)
+        registry.write_snapshot(self.directory)
+        registry.counter('hits_total', 'Hits.', ('kind',)).labels('a').inc()
+        registry.write_snapshot(self.directory)
+        self.assertEqual(os.listdir(self.directory), [f'metrics_{os.getpid()}.json'])
+        self.assertEqual(sample(aggregate(self.directory), 'hits_total{kind="a"}'), 2.0)
+
+    def test_exited_workers_are_folded_into_retained_totals(self):
+        self.worker_registry(hits=2, latency=0.05, busy=1).write_snapshot(self.directory)
+        self.worker_registry(hits=5, latency=3.0, busy=10).write_snapshot(self.directory, pid=exited_pid())
+
+        for _ in range(2):
+            merged = aggregate(self.directory)
+            self.assertEqual(sample(merged, 'hits_total{kind="a"}'), 7.0)
+            self.assertEqual(sample(merged, 'job_seconds_count{job="load"}'), 2.0)
+            self.assertEqual(sample(merged, 'busy '), 1.0)
+        snapshots = [name for name in os.listdir(self.directory) if name.startswith('metrics_') and name.endswith('.json')]
+        self.assertEqual(snapshots, [f'metrics_{os.getpid()}.json'])
+        self.assertIn(metrics.RETAINED_FILE, os.listdir(self.directory))
+
+    def test_fold_interrupted_before_delete_is_not_counted_twice(self):
+        self.worker_registry(hits=5, latency=3.0, busy=10).write_snapshot(self.directory, pid=exited_pid())
+        with patch('util.metrics.os.remove', side_effect=KeyboardInterrupt), self.assertRaises(KeyboardInterrupt):
+            aggregate(self.directory)
+        self.assertEqual(sample(aggregate(self.directory), 'hits_total{kind="a"}'), 5.0)
+        self.assertEqual(sample(aggregate(self.directory), 'hits_total{kind="a"}'), 5.0)
+
+    def test_reused_pid_keeps_earlier_totals(self):
+        # Left by an earlier process that had this process's pid
+        self.worker_registry(hits=5, latency=3.0, busy=10).write_snapshot(self.directory, token='earlier-process')
+        self.assertEqual(sample(aggregate(self.directory), 'hits_total{kind="a"}'), 5.0)
+        self.worker_registry(hits=2, latency=0.05, busy=1).write_snapshot(self.directory)
+
+        merged = aggregate(self.directory)
+        self.assertEqual(sample(merged, 'hits_total{kind="a"}'), 7.0)
+        self.assertEqual(sample(merged, 'busy '), 1.0)
+
+    def test_endpoint_serves_every_worker(self):
+        other_worker = MetricsRegistry()
+        other_worker.counter('upstream_failures_total', 'Failures.', ('namespace',)).labels('other.example.com').inc(7)
+        other_worker.write_snapshot(self.directory, pid=exited_pid())
+
+        # As if this worker's periodic writer were already running
+        with patch.object(metrics, 'directory', self.directory), patch.object(metrics, 'public', True), \
+                patch.object(metrics, '_writer_pid', os.getpid()):
+            body = app.test_client().get('/metrics').get_data(as_text=True)
+        self.assertIn('upstream_failures_total{namespace="other.example.com"} 7.0', body)
+        self.assertIn('http_requests_in_flight{route="/metrics"} 1.0', body)
+        self.assertIn(f'metrics_{os.getpid()}.json', os.listdir(self.directory))
+
+
+class TestMetricsAccess(unittest.TestCase):
+
+    def test_metrics_need_a_token_or_public_access(self):
+        client = app.test_client()
+        with patch.object(metrics, 'public', False), patch.object(metrics, 'token', None):
+            self.assertEqual(client.get('/metrics').status_code, 404)
+        with patch.object(metrics, 'public', False), patch.object(metrics, 'token', 's3cret'):
+            self.assertEqual(client.get('/metrics').status_code, 401)
+            self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+            self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+
+
+class TestAppMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        for patcher in [
+            patch.object(database, 'API_CACHE_DATABASE_PATH', os.path.join(self.workdir, 'api_cache.db')),
+            patch.object(database, 'API_CACHE_SHARDS', 1),
+            patch.object(api_caching, 'API_CACHE_SHARDS', 1),
+            patch.object(api_caching, 'cache_table_initialized', False),
+            patch.object(api_caching.time, 'sleep'),
+            patch.object(metrics, 'public', True),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_metrics_endpoint_reports_requests_and_queries(self):
+        client = app.test_client()
+        count_line = 'http_request_duration_seconds_count{method="GET",route="/api/parks/search",status="200"}'
+        before = sample(metrics.registry, count_line)
+        queries_before = sample(metrics.registry, 'db_connection_duration_seconds_count{database="serving"}')
+        with patch('route_handlers.parks.park_search.search_index', None):
+            self.assertEqual(client.get('/api/parks/search?q=fitzroy').status_code, 200)
+
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        self.assertEqual(sample(metrics.registry, count_line), before + 1)
+        self.assertGreater(sample(metrics.registry, 'db_connection_duration_seconds_count{database="serving"}'), queries_before)
+
+        self.assertEqual(client.get('/no/such/route').status_code, 404)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}',
+                      client.get('/metrics').get_data(as_text=True))
+        self.assertEqual(requests_in_flight.labels('/api/parks/search').value, 0)
+
+    def test_cache_results_and_retries(self):
+        def lookups(result):
+            return sample(metrics.registry, f'api_cache_lookups_total{{namespace="{WEATHER_NAMESPACE}",result="{result}"}}')
+
+        def upstream(name):
+            return sample(metrics.registry, f'{name}{{namespace="{WEATHER_NAMESPACE}"}}')
+
+        before = {result: lookups(result) for result in ['hit', 'miss', 'stale']}
+        retries, failures = upstream('upstream_retries_total'), upstream('upstream_failures_total')
+        params = {'lat': -37.81, 'lon': 144.96}
+
+        with patch.object(api_caching.requests, 'get', side_effect=[upstream_response(503), upstream_response()]) as mock_get:
+            self.assertEqual(api_caching.make_api_request(WEATHER_URL, params=params), {'temp': 20})
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(api_caching.make_api_request(WEATHER_URL, params=params), {'temp': 20})
+        with patch.object(api_caching.requests, 'get', return_value=upstream_response()), \
+                patch.object(api_caching, 'get_cache_timestamp', return_value='2000-01-01T00:00:00'):
+            api_caching.make_api_request(WEATHER_URL, params=params, max_cache_age_sec=60)
+        with patch.object(api_caching.requests, 'get', return_value=upstream_response(500)):
+            with self.assertRaises(requests.HTTPError):
+                api_caching.make_api_request(WEATHER_URL, params={'lat': 0}, max_retries=2)
+
+        self.assertEqual({result: lookups(result) - before[result] for result in before}, {'hit': 1, 'miss': 2, 'stale': 1})
+        self.assertEqual(upstream('upstream_retries_total') - retries, 2)
+        self.assertEqual(upstream('upstream_failures_total') - failures, 1)
+        self.assertEqual(upstream('upstream_requests_in_flight'), 0)
+        self.assertGreater(sample(metrics.registry, f'upstream_request_duration_seconds_count{{namespace="{WEATHER_NAMESPACE}",outcome="503"}}'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import util.database as database
+from route_handlers.parks import park_catalog
+from route_handlers.parks.get_crime_accident_safety import calculate_safety_rating, get_safety_data
+from route_handlers.parks.park_catalog import (
+    MAX_ACCIDENTS_QUERY, MAX_CRIME_QUERY, SAFETY_LOCATIONS_QUERY, get_park_catalog, open_catalog,
+)
+from util.database import SafetyMapDatabaseContextManager
+
+
+def fake_weather(lat, lon, *args, **kwargs):
+    return {'weather': [{'main': 'Clear'}]}
+
+
+def safety_data_from_sql():
+    """The safety map features computed straight from the serving database."""
+    with SafetyMapDatabaseContextManager() as connection:
+        max_crime = connection.execute(MAX_CRIME_QUERY).fetchone()[0] or 1
+        max_accidents = connection.execute(MAX_ACCIDENTS_QUERY).fetchone()[0] or 1
+        rows = connection.execute(SAFETY_LOCATIONS_QUERY).fetchall()
+
+    features = []
+    for location_id, lat, lon, _, crime, accidents, landmark_name, landmark_type, facility_name, sports_played, playground_name in rows:
+        crime_score = max(0, 10 - (crime or 0) / max_crime * 10)
+        accident_score = max(0, 10 - (accidents or 0) / max_accidents * 10)
+        features.append({
+            "type": "Feature",
+            "id": location_id,
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {
+                "facility": landmark_type if landmark_name else ('sports' if sports_played else 'parks'),
+                "name": landmark_name or facility_name or playground_name or "Unknown",
+                "safetyRating": calculate_safety_rating(10, crime_score, accident_score),
+                "weather": "Clear",
+                "crime": crime or 0,
+                "accidents": accidents or 0,
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+class TestParkCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.catalog_dir = os.path.join(self.workdir, 'park_catalog')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    @patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather)
+    def test_matches_serving_database(self, mock_weather):
+        catalog = open_catalog(catalog_dir=self.catalog_dir)
+        self.assertEqual(get_safety_data(catalog), safety_data_from_sql())
+
+    def test_columns_are_read_only_views_of_the_file(self):
+        catalog = open_catalog(catalog_dir=self.catalog_dir)
+        for name, column in catalog.columns.items():
+            with self.subTest(column=name):
+                self.assertEqual(len(column), len(catalog))
+                self.assertFalse(column.flags.owndata)
+                self.assertFalse(column.flags.writeable)
+
+    def test_rebuilt_when_snapshot_changes(self):
+        serving_path = os.path.join(self.workdir, 'ILikeToMoveIt.db')
+        shutil.copy(database.SERVING_DATABASE_PATH, serving_path)
+        with patch.object(database, 'SERVING_DATABASE_PATH', serving_path), \
+                patch.object(park_catalog, 'PARK_CATALOG_DIR', self.catalog_dir), \
+                patch.object(park_catalog, 'park_catalog', None), \
+                patch.object(park_catalog, 'previous_park_catalog', None):
+            first = get_park_catalog()
+            self.assertIs(get_park_catalog(), first)
+
+            # Swap in a new snapshot the way the data transfer does
+            shutil.copy(database.SERVING_DATABASE_PATH, serving_path + '.staging')
+            os.replace(serving_path + '.staging', serving_path)
+            second = get_park_catalog()
+
+            self.assertIsNot(second, first)
+            self.assertIs(park_catalog.previous_park_catalog, first)
+            self.assertEqual(os.listdir(self.catalog_dir), [os.path.basename(second.path)])
+            self.assertEqual(first.strings(first.columns['name_code']), second.strings(second.columns['name_code']))
+
+    def test_empty_catalog(self):
+        serving_path = os.path.join(self.workdir, 'empty.db')
+        with SafetyMapDatabaseContextManager() as connection:
+            schema = [sql for (sql,) in connection.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN "
+                "('Location', 'Crime', 'Accident', 'Landmark', 'Facility', 'Playground')"
+            )]
+        with database.SQLiteContextManager(serving_path) as connection:
+            for sql in schema:
+                connection.execute(sql)
+
+        catalog = open_catalog(lambda: SafetyMapDatabaseContextManager(serving_path), self.catalog_dir)
+        self.assertEqual(len(catalog), 0)
+        self.assertEqual(get_safety_data(catalog)[1], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
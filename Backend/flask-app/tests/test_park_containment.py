@@ -0,0 +1,123 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from functools import partial
+from unittest.mock import patch
+from app import app
+from route_handlers.parks import park_containment
+from route_handlers.parks.park_catalog import snapshot_key
+from route_handlers.parks.park_containment import ParkContainmentIndex, RTree
+from util.database import SafetyMapDatabaseContextManager
+
+
+def fake_weather(lat, lon, *args, **kwargs):
+    return {'weather': [{'main': 'Clear'}]}
+
+
+def square(min_x, min_y, size):
+    return [[min_x, min_y], [min_x + size, min_y], [min_x + size, min_y + size], [min_x, min_y + size], [min_x, min_y]]
+
+
+class TestParkContainment(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_rtree_query_point(self):
+        items = [((x, y, x + 1, y + 1), (x, y)) for x in range(40) for y in range(40)]
+        rtree = RTree(items, node_capacity=4)
+        self.assertEqual(rtree.query_point(10.5, 20.5), [(10, 20)])
+        self.assertEqual(sorted(rtree.query_point(10, 20)), [(9, 19), (9, 20), (10, 19), (10, 20)])
+        self.assertEqual(rtree.query_point(-5, -5), [])
+        self.assertEqual(RTree([]).query_point(0, 0), [])
+
+    def test_polygon_with_hole(self):
+        # A 10x10 park with a 2x2 hole, and a small park nested inside the hole
+        outer_park = [[square(0, 0, 10), square(4, 4, 2)]]
+        nested_park = [[square(4.5, 4.5, 1)]]
+        index = ParkContainmentIndex([({'name': 'Outer'}, outer_park), ({'name': 'Nested'}, nested_park)])
+
+        self.assertEqual(index.containing(1, 1), [{'name': 'Outer'}])
+        self.assertEqual(index.containing(4.2, 4.2), [])
+        self.assertEqual(index.containing(5, 5), [{'name': 'Nested'}])
+        self.assertEqual(index.containing(11, 5), [])
+
+    def test_containing_parks_endpoint(self):
+        with SafetyMapDatabaseContextManager() as connection:
+            name, lat, lon = connection.execute(
+                "SELECT playground_name, centroid_latitude, centroid_longitude FROM Playground_Outline "
+                "WHERE playground_name = 'Lincoln Square Playground'"
+            ).fetchone()
+
+        response = self.app.post('/api/parks/get_containing_parks', json={'latitude': lat, 'longitude': lon})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(name, [park['name'] for park in response.json['parks']])
+
+        response = self.app.post('/api/parks/get_containing_parks', json={'latitude': -30.0, 'longitude': 140.0})
+        self.assertEqual(response.json['parks'], [])
+
+        for coordinates in [{'latitude': 'north'}, {'latitude': 'nan', 'longitude': 144.9},
+                            {'latitude': -37.8, 'longitude': 200.0}, {'latitude': 91, 'longitude': 144.9}]:
+            response = self.app.post('/api/parks/get_containing_parks', json=coordinates)
+            self.assertEqual(response.status_code, 400)
+
+    def test_index_rebuilt_for_new_snapshot(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        db_path = os.path.join(workdir, 'serving.db')
+        shutil.copyfile(SafetyMapDatabaseContextManager().db_path, db_path)
+        manager = partial(SafetyMapDatabaseContextManager, db_path)
+
+        with patch.object(park_containment, 'containment_index', None):
+            first = park_containment.get_containment_index(manager)
+            self.assertIs(park_containment.get_containment_index(manager), first)
+            self.assertTrue(first.containing(*self.lincoln_square()))
+
+            # Swap in a snapshot without outlines, as the pipeline does with os.replace
+            replacement = os.path.join(workdir, 'replacement.db')
+            with sqlite3.connect(replacement) as connection:
+                connection.execute("CREATE TABLE Location (location_id INTEGER)")
+            os.replace(replacement, db_path)
+            second = park_containment.get_containment_index(manager)
+            self.assertIsNot(second, first)
+            self.assertEqual(second.containing(*self.lincoln_square()), [])
+
+    def lincoln_square(self):
+        with SafetyMapDatabaseContextManager() as connection:
+            return connection.execute(
+                "SELECT centroid_latitude, centroid_longitude FROM Playground_Outline "
+                "WHERE playground_name = 'Lincoln Square Playground'"
+            ).fetchone()
+
+    def test_missing_outline_tables(self):
+        self.assertEqual(park_containment.load_outlines(sqlite3.connect(':memory:')), [])
+
+    @patch('route_handlers.parks.get_parks.get_weather_data', side_effect=fake_weather)
+    @patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather)
+    def test_get_parks_user_location_inside_parks(self, mock_safety_weather, mock_weather):
+        index = ParkContainmentIndex([({'name': 'Test Park'}, [[square(144.9, -37.9, 0.1)]])],
+                                     snapshot_key(SafetyMapDatabaseContextManager().db_path))
+        with patch.object(park_containment, 'containment_index', index):
+            response = self.app.post('/api/parks/get_parks', json={'latitude': -37.85, 'longitude': 144.95})
+
+        user_location = [f for f in response.json['features'] if f['properties'].get('type') == 'user_location']
+        self.assertEqual(user_location[0]['properties']['insideParks'], ['Test Park'])
+
+    @patch('route_handlers.parks.get_parks.get_weather_data', side_effect=RuntimeError("weather service down"))
+    @patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather)
+    def test_get_parks_user_location_without_weather(self, mock_safety_weather, mock_weather):
+        index = ParkContainmentIndex([({'name': 'Test Park'}, [[square(144.9, -37.9, 0.1)]])],
+                                     snapshot_key(SafetyMapDatabaseContextManager().db_path))
+        with patch.object(park_containment, 'containment_index', index):
+            response = self.app.post('/api/parks/get_parks', json={'latitude': -37.85, 'longitude': 144.95})
+
+        user_location = [f for f in response.json['features'] if f['properties'].get('type') == 'user_location']
+        self.assertIsNone(user_location[0]['properties']['weather'])
+        self.assertEqual(user_location[0]['properties']['insideParks'], ['Test Park'])
+
+
+if __name__ == '__main__':
+    unittest.main()
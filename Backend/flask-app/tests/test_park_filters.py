@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from app import app
+from route_handlers.parks import park_catalog
+from route_handlers.parks.get_crime_accident_safety import get_cell_weather, get_safety_features
+from route_handlers.parks.park_catalog import open_catalog
+from route_handlers.parks.park_filters import ParkFilterIndex, get_safety_page, parse_filter_options, sport_keys
+
+
+def fake_weather(lat, lon, *args, **kwargs):
+    # Rain over half the cells, so safety ratings differ between parks
+    return {'weather': [{'main': 'Rain' if round(lat * 100) % 2 else 'Clear'}]}
+
+
+class TestParkFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.catalog = open_catalog(catalog_dir=os.path.join(self.workdir, 'park_catalog'))
+        self.index = ParkFilterIndex(self.catalog)
+        self.weather = patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather)
+        self.mock_weather = self.weather.start()
+        self.addCleanup(self.weather.stop)
+
+        features = get_safety_features(self.catalog, get_cell_weather(self.catalog))
+        sports = self.catalog.strings(self.catalog.columns['sports_code'])
+        self.parks = [(feature, sport_keys(sports_played)) for feature, sports_played in zip(features, sports)]
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def expected_ids(self, facility=None, sport=None, min_rating=None, name_prefix=None):
+        return sorted(
+            feature['id'] for feature, sports in self.parks
+            if (facility is None or feature['properties']['facility'].casefold() == facility.casefold())
+            and (sport is None or sport.casefold() in sports)
+            and (min_rating is None or feature['properties']['safetyRating'] >= min_rating)
+            and (name_prefix is None or feature['properties']['name'].casefold().startswith(name_prefix.casefold()))
+        )
+
+    def all_pages(self, **filters):
+        options = parse_filter_options(filters)
+        ids, pages = [], 0
+        while True:
+            page = get_safety_page(self.catalog, options)
+            ids += [feature['id'] for feature in page['features']]
+            pages += 1
+            if page['nextCursor'] is None:
+                return ids, pages
+            options = parse_filter_options({**filters, 'cursor': page['nextCursor']})
+
+    def test_sport_keys(self):
+        self.assertEqual(
+            sport_keys("Cricket, Soccer (Indoor Soccer / Futsal), Tennis (Outdoor)"),
+            {'cricket', 'soccer (indoor soccer / futsal)', 'soccer', 'tennis (outdoor)', 'tennis'},
+        )
+        self.assertEqual(sport_keys(""), set())
+
+    def test_filters_match_brute_force(self):
+        cases = [
+            {},
+            {'facility': 'sports'},
+            {'facility': 'Informal Outdoor Facility (Park/Garden/Reserve)'},
+            {'sport': 'Tennis'},
+            {'sport': 'cricket', 'min_rating': 3},
+            {'min_rating': 4},
+            {'name_prefix': 'p'},
+            {'name_prefix': 'Carlton', 'facility': 'parks'},
+            {'sport': 'quidditch'},
+        ]
+        for case in cases:
+            with self.subTest(**case):
+                ids, _ = self.all_pages(
+                    facility=case.get('facility'), sport=case.get('sport'),
+                    minSafetyRating=case.get('min_rating'), namePrefix=case.get('name_prefix'), limit=7,
+                )
+                self.assertEqual(ids, self.expected_ids(**case))
+        self.assertGreater(len(self.expected_ids(sport='tennis')), 0)
+
+    def test_pages_are_stable_and_bounded(self):
+        ids, pages = self.all_pages(limit=10, minSafetyRating=2)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(pages, -(-len(ids) // 10) or 1)
+
+        # Only the weather of the cells on the page is looked up
+        self.mock_weather.reset_mock()
+        page = get_safety_page(self.catalog, parse_filter_options({'limit': 5}))
+        cells = {tuple(round(c, 2) for c in feature['geometry']['coordinates']) for feature in page['features']}
+        self.assertEqual(self.mock_weather.call_count, len(cells))
+
+    def test_invalid_options(self):
+        self.assertIsNone(parse_filter_options({'latitude': -37.8}))
+        cursor = get_safety_page(self.catalog, parse_filter_options({'limit': 1}))['nextCursor']
+        for options in [
+            {'limit': 0}, {'limit': 501}, {'limit': '5'}, {'minSafetyRating': 6},
+            {'minSafetyRating': True}, {'minSafetyRating': 1.0}, {'sport': 3},
+            {'cursor': 'not-a-cursor'}, {'cursor': cursor, 'sport': 'tennis'},
+        ]:
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    parse_filter_options(options)
+
+    def test_get_parks_route(self):
+        client = app.test_client()
+        with patch.object(park_catalog, 'park_catalog', self.catalog), \
+                patch.object(park_catalog, 'snapshot_key', return_value=self.catalog.snapshot):
+            first = client.post('/api/parks/get_parks', json={'sport': 'tennis', 'limit': 2}).json
+            second = client.post('/api/parks/get_parks', json={'sport': 'tennis', 'limit': 2, 'cursor': first['nextCursor']}).json
+            rejected = client.post('/api/parks/get_parks', json={'sport': 'cricket', 'cursor': first['nextCursor']})
+
+        expected = self.expected_ids(sport='tennis')
+        self.assertEqual([f['id'] for f in first['features'] + second['features']], expected[:4])
+        self.assertNotIn('version', first)
+        self.assertEqual(rejected.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import struct
+import unittest
+from array import array
+from unittest.mock import patch
+from app import app
+from route_handlers.parks.park_outlines import decode_geometry, level_for_zoom
+
+
+def fake_weather(lat, lon, *args, **kwargs):
+    return {'weather': [{'main': 'Clear'}]}
+
+
+class TestParkOutlines(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_level_for_zoom(self):
+        self.assertEqual(level_for_zoom(18), 0)
+        self.assertEqual(level_for_zoom(15), 1)
+        self.assertEqual(level_for_zoom(13), 2)
+        self.assertEqual(level_for_zoom(5), 3)
+
+    def test_decode_geometry(self):
+        # One polygon with one square ring, stored as offsets from the centroid
+        offsets = array('f', [-0.5, -0.5, 0.5, -0.5, 0.5, 0.5, -0.5, 0.5, -0.5, -0.5])
+        blob = struct.pack('<III', 1, 1, 5) + offsets.tobytes()
+        coordinates = decode_geometry(blob, 145.0, -37.0)
+        self.assertEqual(coordinates, [[[[144.5, -37.5], [145.5, -37.5], [145.5, -36.5], [144.5, -36.5], [144.5, -37.5]]]])
+
+    @patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather)
+    def test_get_parks_with_outlines(self, mock_weather):
+        detailed = self.app.post('/api/parks/get_parks', json={'outlineZoom': 18}).json
+        coarse = self.app.post('/api/parks/get_parks', json={'outlineZoom': 12}).json
+
+        def outlines(response):
+            return [f for f in response['features'] if f['properties'].get('type') == 'park_outline']
+
+        self.assertTrue(outlines(detailed))
+        self.assertEqual(len(outlines(detailed)), len(outlines(coarse)))
+        vertex_count = lambda features: sum(len(ring) for f in features for polygon in f['geometry']['coordinates'] for ring in polygon)
+        self.assertLess(vertex_count(outlines(coarse)), vertex_count(outlines(detailed)))
+
+        # Outlines outside the bounding box are left out
+        far_away = self.app.post('/api/parks/get_parks', json={'outlineZoom': 12, 'bbox': [140.0, -30.0, 140.1, -29.9]}).json
+        self.assertEqual(outlines(far_away), [])
+
+    @patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=fake_weather)
+    def test_get_parks_without_outlines(self, mock_weather):
+        response = self.app.post('/api/parks/get_parks', json={})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(f['properties'].get('type') == 'park_outline' for f in response.json['features']))
+
+    def test_invalid_outline_options_rejected(self):
+        invalid = [
+            {'outlineZoom': 'twelve'},
+            {'outlineZoom': True},
+            {'outlineZoom': 12.5},
+            {'outlineZoom': 99},
+            {'outlineZoom': 12, 'bbox': [140.0, -30.0, 140.1]},
+            {'outlineZoom': 12, 'bbox': [140.0, -30.0, 140.1, 'north']},
+            {'outlineZoom': 12, 'bbox': [140.1, -30.0, 140.0, -29.9]},
+            {'outlineZoom': 12, 'bbox': 'everywhere'},
+        ]
+        for options in invalid:
+            with self.subTest(options=options):
+                response = self.app.post('/api/parks/get_parks', json=options)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from app import app
+from route_handlers.parks.park_search import SEARCH_NAMES_QUERY, WORD, NameSearchIndex, normalise, prefix_distance
+from util.database import SafetyMapDatabaseContextManager
+
+
+class TestParkSearch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with SafetyMapDatabaseContextManager() as connection:
+            cls.rows = connection.execute(SEARCH_NAMES_QUERY).fetchall()
+        cls.index = NameSearchIndex(cls.rows)
+
+    def expected_names(self, query):
+        """Names with a word starting with each query word, by brute force."""
+        query_words = WORD.findall(normalise(query))
+        return {
+            name.strip() for _, _, _, _, name in self.rows
+            if all(any(word.startswith(query_word) for word in WORD.findall(normalise(name))) for query_word in query_words)
+        }
+
+    def test_prefix_matches_brute_force(self):
+        for query in ['pr', 'Car', 'carlton gar', 'GARDENS', 'park play', 'reserve']:
+            with self.subTest(query=query):
+                results = self.index.search(query, limit=50)
+                expected = self.expected_names(query)
+                self.assertTrue(0 < len(expected) < 50)
+                self.assertEqual({result['name'] for result in results}, expected)
+                self.assertTrue(all(result['match'] == 'prefix' for result in results))
+
+    def test_names_starting_with_query_rank_first(self):
+        results = self.index.search('north', limit=50)
+        starts = [normalise(result['name']).startswith('north') for result in results]
+        self.assertIn(True, starts)
+        self.assertIn(False, starts)
+        self.assertEqual(starts, sorted(starts, reverse=True))
+
+    def test_ranks_by_distance_from_user(self):
+        results = self.index.search('playground', limit=20, latitude=-37.81, longitude=144.96)
+        distances = [result['distanceKm'] for result in results]
+        self.assertEqual(len(results), 20)
+        self.assertEqual(distances, sorted(distances))
+
+    def test_typos_match_close_spellings(self):
+        results = self.index.search('fitzroi gardens', limit=5)
+        self.assertIn('Fitzroy Gardens', [result['name'] for result in results])
+        self.assertTrue(all(result['match'] == 'fuzzy' for result in results))
+
+        results = self.index.search('playgrnd', limit=5)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all('playground' in normalise(result['name']) for result in results))
+
+        # Short words are only matched as typed
+        self.assertEqual(self.index.search('qx', limit=5), [])
+
+    def test_prefix_distance(self):
+        self.assertEqual(prefix_distance('playgr', 'playground', 1), 0)
+        self.assertEqual(prefix_distance('plaground', 'playground', 2), 1)
+        self.assertEqual(prefix_distance('fitzroi', 'fitzroy', 1), 1)
+        self.assertEqual(prefix_distance('gardens', 'reserve', 2), 3)
+
+    def test_accents_and_duplicates(self):
+        index = NameSearchIndex([
+            (1, -37.8, 144.9, 'landmark', 'Café Reserve'),
+            (1, -37.8, 144.9, 'facility', 'Café Reserve'),
+            (2, None, None, 'playground', 'Cafe Corner'),
+            (3, -37.9, 145.0, 'facility', ''),
+        ])
+        self.assertEqual(len(index), 2)
+        results = index.search('cafe', latitude=-37.8, longitude=144.9)
+        self.assertEqual([result['name'] for result in results], ['Café Reserve', 'Cafe Corner'])
+        self.assertIsNone(results[1]['coordinates'])
+        self.assertIsNone(results[1]['distanceKm'])
+
+    def test_search_route(self):
+        client = app.test_client()
+        response = client.get('/api/parks/search?q=fitzroy&limit=3&latitude=-37.81&longitude=144.98')
+        self.assertEqual(response.status_code, 200)
+        results = response.json['results']
+        self.assertTrue(results and all(result['name'].startswith('Fitzroy') for result in results))
+        self.assertEqual(client.get('/api/parks/search?q=').json, {'results': []})
+        for query in ['q=park&limit=0', 'q=park&limit=ten', 'q=park&latitude=-37.8', 'q=park&latitude=95&longitude=144']:
+            with self.subTest(query=query):
+                self.assertEqual(client.get(f'/api/parks/search?{query}').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from route_handlers.parks import park_catalog, park_updates
+from route_handlers.parks.get_crime_accident_safety import get_safety_features
+from route_handlers.parks.park_catalog import open_catalog
+from route_handlers.parks.park_updates import ParkUpdateBroadcaster, Subscription, SubscriptionIndex, publish
+from route_handlers.parks.park_versions import WeatherGenerations
+from util.database import AppDatabaseContextManager
+
+SUBSCRIBERS = 5000
+
+
+def parse_sse(message):
+    """The (event, data) of one SSE message."""
+    event, data = 'message', None
+    for line in message.strip().split('\n'):
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: '):
+            data = json.loads(line[len('data: '):])
+    return event, data
+
+
+class TestParkUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.catalog = open_catalog(catalog_dir=os.path.join(self.workdir, 'park_catalog'))
+        self.generations = WeatherGenerations(lambda: AppDatabaseContextManager(os.path.join(self.workdir, 'app_state.db')))
+        patcher = patch.object(park_catalog, 'get_park_catalog', return_value=self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(park_updates, 'get_park_catalog', return_value=self.catalog)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def random_bbox(self, rng):
+        lats, lons = [cell[0] for cell in self.catalog.cells], [cell[1] for cell in self.catalog.cells]
+        lat, lon = rng.uniform(min(lats) - 0.05, max(lats) + 0.05), rng.uniform(min(lons) - 0.05, max(lons) + 0.05)
+        size = rng.choice([0.005, 0.02, 0.1, 0.4])
+        return lon, lat, lon + size, lat + size
+
+    def test_fan_out_to_thousands_of_subscribers(self):
+        rng = random.Random(0)
+        index = SubscriptionIndex()
+        subscriptions = [Subscription(self.random_bbox(rng)) for _ in range(SUBSCRIBERS)]
+        for subscription in subscriptions:
+            index.add(subscription, self.catalog)
+        changed = {cell: 'Rain' for cell in rng.sample(self.catalog.cells, 10)}
+
+        started = time.perf_counter()
+        pushed = publish(index, self.catalog, changed, 'v2')
+        elapsed = time.perf_counter() - started
+
+        features = {
+            feature['id']: feature for feature in
+            get_safety_features(self.catalog, {cell: changed.get(cell, 'Clear') for cell in self.catalog.cells})
+        }
+        cell_of = dict(zip(self.catalog.columns['location_id'].tolist(), self.catalog.columns['cell_code'].tolist()))
+        receivers = 0
+        for subscription in subscriptions:
+            expected = {
+                location_id for location_id, code in cell_of.items()
+                if self.catalog.cells[code] in changed and subscription.overlaps(self.catalog.cells[code])
+            }
+            message = subscription.next(timeout=0)
+            if not expected:
+                self.assertIsNone(message)
+                continue
+            receivers += 1
+            event, data = parse_sse(message)
+            self.assertEqual(event, 'update')
+            self.assertEqual(data['version'], 'v2')
+            self.assertEqual({feature['id'] for feature in data['features']}, expected)
+            for feature in data['features']:
+                self.assertEqual(feature['safetyRating'], features[feature['id']]['properties']['safetyRating'])
+                self.assertEqual(feature['weather'], 'Rain')
+
+        self.assertEqual(pushed, receivers)
+        self.assertGreater(receivers, 0)
+        self.assertLess(elapsed, 1.0)
+
+    def test_unsubscribed_clients_receive_nothing(self):
+        index = SubscriptionIndex()
+        subscription = Subscription((144.0, -38.5, 145.5, -37.0))
+        index.add(subscription, self.catalog)
+        index.remove(subscription)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(publish(index, self.catalog, {self.catalog.cells[0]: 'Rain'}, 'v2'), 0)
+
+    def test_slow_client_gets_resync(self):
+        subscription = Subscription((144.0, -38.5, 145.5, -37.0))
+        for number in range(park_updates.MAX_PENDING_MESSAGES + 1):
+            subscription.push(f"data: {number}\n\n")
+        self.assertEqual(subscription.next(timeout=0), park_updates.RESYNC_MESSAGE)
+        self.assertIsNone(subscription.next(timeout=0))
+
+    def test_stream_pushes_recorded_changes(self):
+        broadcaster = ParkUpdateBroadcaster(self.generations, poll_sec=0.05)
+        test_app = Flask(__name__)
+        test_app.add_url_rule('/updates', view_func=park_updates.get_park_updates, methods=['GET'])
+        client = test_app.test_client()
+        cell = self.catalog.cells[0]
+        self.generations.record({cell: 'Clear'})
+
+        with patch.object(park_updates, 'broadcaster', broadcaster):
+            self.assertEqual(client.get('/updates?bbox=north').status_code, 400)
+
+            lat, lon = cell
+            response = client.get(f'/updates?bbox={lon - 0.001},{lat - 0.001},{lon + 0.001},{lat + 0.001}', buffered=False)
+            self.assertTrue(response.mimetype.startswith('text/event-stream'))
+            stream = response.response
+            event, data = parse_sse(next(stream).decode())
+            self.assertEqual(event, 'subscribed')
+            self.assertTrue(data['version'].endswith(':1'))
+
+            # A change recorded by another worker is picked up by polling
+            WeatherGenerations(self.generations._db_manager).record({cell: 'Rain'})
+            event, data = parse_sse(next(stream).decode())
+            self.assertEqual(event, 'update')
+            self.assertTrue(data['version'].endswith(':2'))
+            self.assertEqual({feature['weather'] for feature in data['features']}, {'Rain'})
+            self.assertEqual(len(data['features']), len(self.catalog.cell_rows(0)))
+
+            response.close()
+            self.assertEqual(len(broadcaster.index), 0)
+
+    def test_streams_are_capped_and_end_when_idle(self):
+        broadcaster = ParkUpdateBroadcaster(self.generations, poll_sec=0.05, max_subscribers=1, max_idle_sec=0.2)
+        test_app = Flask(__name__)
+        test_app.add_url_rule('/updates', view_func=park_updates.get_park_updates, methods=['GET'])
+        client = test_app.test_client()
+        lat, lon = self.catalog.cells[0]
+        url = f'/updates?bbox={lon - 0.001},{lat - 0.001},{lon + 0.001},{lat + 0.001}'
+
+        with patch.object(park_updates, 'broadcaster', broadcaster):
+            response = client.get(url, buffered=False)
+            stream = response.response
+            self.assertEqual(parse_sse(next(stream).decode())[0], 'subscribed')
+
+            rejected = client.get(url)
+            self.assertEqual(rejected.status_code, 503)
+            self.assertEqual(rejected.headers['Retry-After'], str(park_updates.SUBSCRIBE_RETRY_AFTER_SEC))
+
+            self.assertEqual(parse_sse(next(stream).decode())[0], 'idle')
+            self.assertEqual(list(stream), [])
+            response.close()
+            self.assertEqual(len(broadcaster.index), 0)
+            response = client.get(url, buffered=False)
+            self.assertEqual(response.status_code, 200)
+            response.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
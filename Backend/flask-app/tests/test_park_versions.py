@@ -0,0 +1,126 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from app import app
+from route_handlers.parks import park_catalog, park_versions
+from route_handlers.parks.park_catalog import open_catalog
+from route_handlers.parks.park_versions import WeatherGenerations, format_version, get_safety_update
+from util.database import SERVING_DATABASE_PATH, AppDatabaseContextManager, SafetyMapDatabaseContextManager
+
+
+class FakeWeather:
+    """Weather by rounded cell, 'Clear' unless set otherwise."""
+    def __init__(self):
+        self.conditions = {}
+
+    def __call__(self, lat, lon, *args, **kwargs):
+        return {'weather': [{'main': self.conditions.get((round(lat, 2), round(lon, 2)), 'Clear')}]}
+
+
+class TestParkVersions(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.weather = FakeWeather()
+        self.generations = WeatherGenerations(lambda: AppDatabaseContextManager(os.path.join(self.workdir, 'app_state.db')))
+        patchers = [
+            patch('route_handlers.parks.get_crime_accident_safety.get_weather_data', side_effect=self.weather),
+            patch.object(park_versions, 'weather_generations', self.generations),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.catalog = open_catalog(catalog_dir=os.path.join(self.workdir, 'park_catalog'))
+        self.app = app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def snapshot_catalog(self, sql):
+        """Catalog of a copy of the serving database changed by `sql`."""
+        path = os.path.join(self.workdir, f'snapshot_{len(os.listdir(self.workdir))}.db')
+        shutil.copy(SERVING_DATABASE_PATH, path)
+        with sqlite3.connect(path) as connection:
+            connection.executescript(sql)
+        return open_catalog(lambda: SafetyMapDatabaseContextManager(path), os.path.join(self.workdir, 'park_catalog'))
+
+    def test_unchanged_map_sends_empty_delta(self):
+        full = get_safety_update(self.catalog)
+        self.assertFalse(full['delta'])
+        self.assertEqual(len(full['features']), len(self.catalog))
+
+        delta = get_safety_update(self.catalog, full['version'])
+        self.assertTrue(delta['delta'])
+        self.assertEqual((delta['features'], delta['removed'], delta['version']), ([], [], full['version']))
+
+    def test_delta_holds_parks_in_cells_whose_weather_changed(self):
+        full = get_safety_update(self.catalog)
+        cell = self.catalog.cells[0]
+        self.weather.conditions[cell] = 'Rain'
+
+        delta = get_safety_update(self.catalog, full['version'])
+        expected = {f['id'] for f in full['features'] if tuple(round(c, 2) for c in reversed(f['geometry']['coordinates'])) == cell}
+        self.assertTrue(delta['delta'])
+        self.assertNotEqual(delta['version'], full['version'])
+        self.assertEqual({f['id'] for f in delta['features']}, expected)
+        self.assertTrue(all(f['properties']['weather'] == 'Rain' for f in delta['features']))
+
+        # A client that already has the change gets nothing more
+        self.assertEqual(get_safety_update(self.catalog, delta['version'])['features'], [])
+
+    def test_falls_back_to_full_map(self):
+        full = get_safety_update(self.catalog)
+        snapshot, generation = full['version'].rsplit(':', 1)
+        for version in ['garbage', format_version('old-snapshot', 1), format_version(snapshot, int(generation) + 1)]:
+            with self.subTest(version=version):
+                update = get_safety_update(self.catalog, version)
+                self.assertFalse(update['delta'])
+                self.assertEqual(len(update['features']), len(self.catalog))
+
+        # Most cells changing makes the delta no smaller than the map
+        for cell in self.catalog.cells:
+            self.weather.conditions[cell] = 'Snow'
+        self.assertFalse(get_safety_update(self.catalog, full['version'])['delta'])
+
+    def test_delta_across_snapshots(self):
+        previous = self.snapshot_catalog("SELECT 1")
+        removed_id, renamed_id = previous.columns['location_id'][:2].tolist()
+        current = self.snapshot_catalog(f"""
+            DELETE FROM Location WHERE location_id = {removed_id};
+            UPDATE Landmark SET landmark_name = 'Renamed' WHERE location_id = {renamed_id};
+            UPDATE Facility SET facility_name = 'Renamed' WHERE location_id = {renamed_id};
+            UPDATE Playground SET playground_name = 'Renamed' WHERE location_id = {renamed_id};
+        """)
+        full = get_safety_update(previous)
+
+        delta = get_safety_update(current, full['version'], previous=previous)
+        self.assertTrue(delta['delta'])
+        self.assertEqual(delta['removed'], [removed_id])
+        self.assertEqual([(f['id'], f['properties']['name']) for f in delta['features']], [(renamed_id, 'Renamed')])
+
+        # A version from before the previous snapshot gets the whole map
+        self.assertFalse(get_safety_update(current, full['version'])['delta'])
+
+    def test_generations_shared_between_stores(self):
+        other_worker = WeatherGenerations(lambda: AppDatabaseContextManager(os.path.join(self.workdir, 'app_state.db')))
+        generation, _ = self.generations.record({(-37.81, 144.96): 'Clear'})
+        self.assertEqual(other_worker.record({(-37.81, 144.96): 'Clear'})[0], generation)
+        self.assertEqual(other_worker.record({(-37.81, 144.96): 'Rain'})[0], generation + 1)
+        self.assertEqual(self.generations.record({(-37.81, 144.96): 'Rain'})[0], generation + 1)
+
+    def test_get_parks_route(self):
+        with patch.object(park_catalog, 'park_catalog', self.catalog), \
+                patch.object(park_catalog, 'snapshot_key', return_value=self.catalog.snapshot):
+            full = self.app.post('/api/parks/get_parks', json={}).json
+            delta = self.app.post('/api/parks/get_parks', json={'version': full['version']}).json
+
+        self.assertFalse(full['delta'])
+        self.assertEqual(len(full['features']), len(self.catalog))
+        self.assertEqual((delta['delta'], delta['features'], delta['removed']), (True, [], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import sqlite3
+import unittest
+from route_handlers.parks.park_catalog import MAX_ACCIDENTS_QUERY, MAX_CRIME_QUERY, SAFETY_LOCATIONS_QUERY
+from route_handlers.parks.get_parks import SUBURB_LOCATIONS_QUERY
+from route_handlers.parks.park_containment import FULL_DETAIL_OUTLINES_QUERY
+from route_handlers.parks.park_outlines import OUTLINES_IN_BBOX_QUERY, OUTLINES_QUERY
+from route_handlers.parks.park_search import SEARCH_NAMES_QUERY
+
+SERVING_DATABASE_PATH = 'database/ILikeToMoveIt.db'
+
+LOCATIONS = 1_000_000
+SUBURBS = 3_000
+OUTLINES = 20_000
+
+# Each production query, its parameters, and the tables it is meant to read in
+# full (those that return every row); any other full scan fails the test
+PRODUCTION_QUERIES = {
+    'max_crime': (MAX_CRIME_QUERY, [], set()),
+    'max_accidents': (MAX_ACCIDENTS_QUERY, [], set()),
+    'safety_locations': (SAFETY_LOCATIONS_QUERY, [], {'L'}),
+    'suburb_locations': (SUBURB_LOCATIONS_QUERY, [], {'Location'}),
+    'outlines': (OUTLINES_QUERY, [1], set()),
+    'outlines_in_bbox': (
+        OUTLINES_IN_BBOX_QUERY, {'level': 1, 'min_lon': 144.9, 'max_lon': 144.95, 'min_lat': -37.9, 'max_lat': -37.85}, set(),
+    ),
+    'full_detail_outlines': (FULL_DETAIL_OUTLINES_QUERY, [], set()),
+    'search_names': (SEARCH_NAMES_QUERY, [], {'LM', 'F', 'P'}),
+}
+
+
+def build_synthetic_database():
+    """
+    An in-memory database with the serving database's tables and indexes,
+    filled with a million locations spread over a few thousand suburbs.
+    """
+    serving = sqlite3.connect(f'file:{SERVING_DATABASE_PATH}?mode=ro', uri=True)
+    schema = serving.execute(
+        "SELECT type, sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY type = 'index'"
+    ).fetchall()
+    serving.close()
+
+    connection = sqlite3.connect(':memory:')
+    for _, sql in schema:
+        # Shadow tables of the R*Tree are created with it
+        connection.execute(sql.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+    connection.executescript(f"""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {LOCATIONS})
+        INSERT INTO Location (location_id, latitude, longitude, suburb_id)
+        SELECT i, -38 + (i % 1000) / 1000.0, 144 + (i / 1000) / 1000.0, 1 + i % {SUBURBS} FROM n;
+
+        INSERT INTO Facility (facility_id, facility_name, sports_played, location_id)
+        SELECT 'F' || location_id, 'Facility', 'Tennis', location_id FROM Location WHERE location_id % 3 = 0;
+        INSERT INTO Landmark (landmark_id, landmark_name, landmark_type, location_id)
+        SELECT location_id, 'Landmark', 'Reserve', location_id FROM Location WHERE location_id % 3 = 1;
+        INSERT INTO Playground (playground_id, playground_name, location_id)
+        SELECT location_id, 'Playground', location_id FROM Location WHERE location_id % 3 = 2;
+
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {SUBURBS})
+        INSERT INTO Crime (crime_id, incidents_recorded_2014_2023, suburb_id) SELECT i, i * 7 % 20000, i FROM n;
+        INSERT INTO Accident (id, total_accidents, suburb_id) SELECT suburb_id, incidents_recorded_2014_2023 % 3000, suburb_id FROM Crime;
+
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {OUTLINES})
+        INSERT INTO Playground_Outline
+        SELECT i, 'Playground', i, lat, lon, lat - 0.001, lon - 0.001, lat + 0.001, lon + 0.001
+        FROM (SELECT i, -38 + (i % 100) / 100.0 AS lat, 144 + (i / 100) / 200.0 AS lon FROM n);
+        INSERT INTO Playground_Outline_Bounds
+        SELECT outline_id, min_longitude, max_longitude, min_latitude, max_latitude FROM Playground_Outline;
+        INSERT INTO Playground_Outline_Level (outline_id, level, vertex_count, geometry)
+        SELECT outline_id, level.value, 4, x'00' FROM Playground_Outline, (SELECT 0 AS value UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3) AS level;
+
+        ANALYZE;
+    """)
+    return connection
+
+
+def query_plan(connection, query, params):
+    """The detail lines of EXPLAIN QUERY PLAN for a query."""
+    return [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+
+
+def full_scans(plan):
+    """
+    Tables (or aliases) the plan reads in full, with or without an index. A
+    virtual table scan is full only with index number 0 (no constraints used).
+    """
+    return {
+        line.split()[1] for line in plan
+        if line.startswith('SCAN ') and ('VIRTUAL TABLE' not in line or 'VIRTUAL TABLE INDEX 0:' in line)
+    }
+
+
+class TestQueryPlans(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.connection = build_synthetic_database()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.connection.close()
+
+    def test_no_unexpected_full_scans(self):
+        for name, (query, params, expected_scans) in PRODUCTION_QUERIES.items():
+            with self.subTest(query=name):
+                plan = query_plan(self.connection, query, params)
+                self.assertEqual(full_scans(plan), expected_scans, '\n'.join(plan))
+                self.assertFalse(any('TEMP B-TREE' in line for line in plan), '\n'.join(plan))
+
+    def test_safety_joins_use_covering_indexes(self):
+        plan = query_plan(self.connection, SAFETY_LOCATIONS_QUERY, [])
+        for alias in ['C', 'A', 'LM', 'F', 'P']:
+            with self.subTest(table=alias):
+                self.assertTrue(any(line.startswith(f'SEARCH {alias} USING COVERING INDEX') for line in plan), '\n'.join(plan))
+
+    def test_maximums_read_one_index_entry(self):
+        for query in [MAX_CRIME_QUERY, MAX_ACCIDENTS_QUERY]:
+            with self.subTest(query=query):
+                plan = query_plan(self.connection, query, [])
+                self.assertTrue(all('USING COVERING INDEX' in line for line in plan), '\n'.join(plan))
+
+    def test_serving_database_has_statistics(self):
+        serving = sqlite3.connect(f'file:{SERVING_DATABASE_PATH}?mode=ro', uri=True)
+        try:
+            tables = {table for (table,) in serving.execute('SELECT DISTINCT tbl FROM sqlite_stat1')}
+        finally:
+            serving.close()
+        self.assertTrue({'Location', 'Crime', 'Accident', 'Facility', 'Landmark', 'Playground'} <= tables)
+
+
+if __name__ == '__main__':
+    unittest.main()
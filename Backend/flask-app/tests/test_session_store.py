@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import unittest
+from functools import partial
+from util.database import SQLiteContextManager
+from util.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInMemorySessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = InMemorySessionStore(max_sessions=2, ttl_sec=60, max_turns=3, clock=self.clock)
+
+    def test_record_and_get(self):
+        self.store.record_turn('a', 'thread_a', 'hi', 'hello')
+        session = self.store.get('a')
+        self.assertEqual(session['thread_id'], 'thread_a')
+        self.assertEqual(session['conversation'], [{"user": "hi", "ai": "hello"}])
+        self.assertIsNone(self.store.get('missing'))
+        self.assertEqual(self.store.stats()['hitRate'], 0.5)
+
+    def test_turns_are_capped(self):
+        for i in range(5):
+            self.store.record_turn('a', 'thread_a', f'q{i}', f'r{i}')
+        conversation = self.store.get('a')['conversation']
+        self.assertEqual([turn['user'] for turn in conversation], ['q2', 'q3', 'q4'])
+
+    def test_lru_eviction(self):
+        self.store.record_turn('a', 't1', 'q', 'r')
+        self.store.record_turn('b', 't2', 'q', 'r')
+        self.store.get('a')  # 'b' becomes least recently used
+        self.store.record_turn('c', 't3', 'q', 'r')
+        self.assertIsNotNone(self.store.get('a'))
+        self.assertIsNone(self.store.get('b'))
+        self.assertEqual(self.store.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        self.store.record_turn('a', 't1', 'q', 'r')
+        self.clock.now = 61
+        self.assertIsNone(self.store.get('a'))
+        self.assertEqual(self.store.stats()['expirations'], 1)
+
+
+class TestSQLiteSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.clock = FakeClock()
+        self.db_manager = partial(SQLiteContextManager, self.db_path)
+        self.store = SQLiteSessionStore(max_sessions=2, ttl_sec=60, max_turns=3, db_manager=self.db_manager, clock=self.clock)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def test_shared_between_store_instances(self):
+        # A second store on the same file stands in for another gunicorn worker
+        other_worker = SQLiteSessionStore(db_manager=self.db_manager, clock=self.clock)
+        self.store.record_turn('a', 'thread_a', 'hi', 'hello')
+        self.assertEqual(other_worker.get('a')['thread_id'], 'thread_a')
+
+    def test_concurrent_turns_are_all_kept(self):
+        # Each thread records turns through its own store, as separate workers would
+        stores = [SQLiteSessionStore(max_turns=100, db_manager=self.db_manager) for _ in range(4)]
+
+        def record_turns(worker, store):
+            for turn in range(10):
+                store.record_turn('shared', 't', f'{worker}-{turn}', 'r')
+
+        threads = [threading.Thread(target=record_turns, args=(worker, store)) for worker, store in enumerate(stores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        conversation = stores[0].get('shared')['conversation']
+        self.assertEqual(sorted(turn['user'] for turn in conversation), sorted(f'{w}-{t}' for w in range(4) for t in range(10)))
+
+    def test_eviction_and_expiry(self):
+        for i, session_id in enumerate(['a', 'b', 'c']):
+            self.clock.now = i
+            self.store.record_turn(session_id, 't', 'q', 'r')
+        self.assertIsNone(self.store.get('a'))
+        self.clock.now = 100
+        self.assertIsNone(self.store.get('c'))
+        stats = self.store.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['sessions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
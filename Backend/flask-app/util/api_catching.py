@@ -1,13 +1,43 @@
 import requests
+import sqlite3
 import time
 import json
 import re
 from datetime import datetime
-from util.database import AppDatabaseContextManager
+from urllib.parse import urlsplit
+from util.database import API_CACHE_SHARDS, ApiCacheDatabaseContextManager
+from util.metrics import registry
+
+# Whether the cache table has been created in this process
+cache_table_initialized = False
+
+# Cache and upstream metrics, labelled by the API endpoint (see cache_namespace)
+cache_lookups = registry.counter(
+    'api_cache_lookups_total', 'API cache lookups by result: hit, miss or stale (expired and refetched).',
+    ('namespace', 'result'),
+)
+upstream_latency = registry.histogram(
+    'upstream_request_duration_seconds', 'Time of each outbound API request attempt.', ('namespace', 'outcome'),
+)
+upstream_retries = registry.counter(
+    'upstream_retries_total', 'Outbound API requests retried after a failed attempt.', ('namespace',),
+)
+upstream_failures = registry.counter(
+    'upstream_failures_total', 'Outbound API requests that failed on every attempt.', ('namespace',),
+)
+upstream_in_flight = registry.gauge(
+    'upstream_requests_in_flight', 'Outbound API requests in progress, retries included.', ('namespace',),
+)
 
 # Initialization
 def initialize_cache_table():
-    """Create the API cache table if it does not exist."""
+    """
+    Create the API cache table in every cache file if it does not exist.
+
+    The cache files use write-ahead logging, so cache reads carry on while
+    another request writes a response.
+    """
+    global cache_table_initialized
     create_table_sql = """
     CREATE TABLE IF NOT EXISTS api_cache (
         cache_key TEXT PRIMARY KEY,
@@ -15,11 +45,24 @@ def initialize_cache_table():
         timestamp TEXT
     )
     """
-    with AppDatabaseContextManager() as conn:
-        conn.cursor().execute(create_table_sql)
-        conn.commit()
+    for shard in range(API_CACHE_SHARDS):
+        with ApiCacheDatabaseContextManager(shard=shard) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.cursor().execute(create_table_sql)
+            conn.commit()
+    cache_table_initialized = True
+
+def ensure_cache_table():
+    """Create the API cache table on first use."""
+    if not cache_table_initialized:
+        initialize_cache_table()
 
 # Cache Utilities
+def cache_namespace(url):
+    """Metrics label of the API endpoint a URL calls: its host and path, without the query."""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
 def default_cache_key_gen(url, params):
     """Generate a unique cache key based on URL and sorted parameters."""
     sorted_params = json.dumps(params, sort_keys=True)
@@ -27,7 +70,7 @@ def default_cache_key_gen(url, params):
 
 def get_cached_response(cache_key):
     """Retrieve a cached response using the cache key."""
-    with AppDatabaseContextManager() as conn:
+    with ApiCacheDatabaseContextManager(cache_key) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT response FROM api_cache WHERE cache_key=?", (cache_key,))
         result = cursor.fetchone()
@@ -35,7 +78,7 @@ def get_cached_response(cache_key):
 
 def cache_response(cache_key, response):
     """Store a response in the cache."""
-    with AppDatabaseContextManager() as conn:
+    with ApiCacheDatabaseContextManager(cache_key) as conn:
         cursor = conn.cursor()
         timestamp = datetime.now().isoformat()
         cursor.execute(
@@ -46,7 +89,7 @@ def cache_response(cache_key, response):
 
 def get_cache_timestamp(cache_key):
     """Retrieve the timestamp of a cached response."""
-    with AppDatabaseContextManager() as conn:
+    with ApiCacheDatabaseContextManager(cache_key) as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT timestamp FROM api_cache WHERE cache_key=?", (cache_key,))
         result = cursor.fetchone()
@@ -54,7 +97,7 @@ def get_cache_timestamp(cache_key):
 
 def flush_cache_entry(cache_key):
     """Remove a cache entry using its cache key."""
-    with AppDatabaseContextManager() as conn:
+    with ApiCacheDatabaseContextManager(cache_key) as conn:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM api_cache WHERE cache_key=?", (cache_key,))
         conn.commit()
@@ -91,47 +134,86 @@ def make_api_request(
     if confidential_params is None:
         confidential_params = {}
 
+    ensure_cache_table()
+
     cache_key = cache_key_gen_func(url, params)
+    namespace = cache_namespace(url)
 
     # Use cached response if available and fresh
     if use_cache:
+        cache_result = 'miss'
         cache_timestamp = get_cache_timestamp(cache_key)
         if cache_timestamp:
             cache_time = datetime.fromisoformat(cache_timestamp)
             if max_cache_age_sec and (datetime.now() - cache_time).total_seconds() > max_cache_age_sec:
                 flush_cache_entry(cache_key)
+                cache_result = 'stale'
             else:
                 cached_response = get_cached_response(cache_key)
                 if cached_response:
+                    cache_lookups.labels(namespace, 'hit').inc()
                     return cached_response
+        cache_lookups.labels(namespace, cache_result).inc()
 
     # Merge public and confidential parameters
     merged_params = {**params, **confidential_params}
 
-    # Retry logic for API requests
+    with upstream_in_flight.labels(namespace).track_in_progress():
+        return request_with_retries(url, merged_params, namespace, cache_key if use_cache else None, max_retries, retry_delay)
+
+
+def request_with_retries(url, merged_params, namespace, cache_key, max_retries, retry_delay):
+    """
+    Request an API, retrying failed attempts, and cache the response.
+
+    Parameters:
+    - url (str): The URL for the API request.
+    - merged_params (dict): Public and confidential query parameters.
+    - namespace (str): Metrics label of the endpoint.
+    - cache_key (str): Key to cache the response under, or None to not cache it.
+    - max_retries (int): Number of attempts.
+    - retry_delay (int): Delay (in seconds) between attempts.
+
+    Returns:
+    - dict: The JSON response from the API.
+    """
     for attempt in range(max_retries):
+        started = time.perf_counter()
+        outcome = 'error'
         try:
             response = requests.get(url, params=merged_params)
+            outcome = str(response.status_code)
             response.raise_for_status()
             response_json = response.json()
 
-            if use_cache:
-                cache_response(cache_key, response_json)
+            upstream_latency.labels(namespace, outcome).observe(time.perf_counter() - started)
+            if cache_key is not None:
+                try:
+                    cache_response(cache_key, response_json)
+                except sqlite3.OperationalError as e:
+                    # A busy cache only costs a later request; the response is still good
+                    print(f"Could not cache response for {url}: {e}")
 
             return response_json
 
         except requests.RequestException as e:
+            upstream_latency.labels(namespace, outcome).observe(time.perf_counter() - started)
             print(f"Request failed: {e}. Attempt {attempt + 1} of {max_retries}.")
             if attempt < max_retries - 1:
+                upstream_retries.labels(namespace).inc()
                 time.sleep(retry_delay)
             else:
+                upstream_failures.labels(namespace).inc()
                 raise
 
         except json.JSONDecodeError:
+            upstream_latency.labels(namespace, 'invalid_json').observe(time.perf_counter() - started)
             print(f"Failed to decode JSON response. Attempt {attempt + 1} of {max_retries}.")
             if attempt < max_retries - 1:
+                upstream_retries.labels(namespace).inc()
                 time.sleep(retry_delay)
             else:
+                upstream_failures.labels(namespace).inc()
                 raise ValueError("Failed to decode JSON response after multiple attempts.")
 
 # Cache Cleanup
@@ -143,13 +225,16 @@ def clean_cache(regex_pattern, max_age):
     - regex_pattern (str): Regex to match cache keys.
     - max_age (int): Maximum age of cache entries in seconds.
     """
+    ensure_cache_table()
     compiled_regex = re.compile(regex_pattern)
     current_time = datetime.now()
 
-    with AppDatabaseContextManager() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT cache_key, timestamp FROM api_cache")
-        all_cache_entries = cursor.fetchall()
+    all_cache_entries = []
+    for shard in range(API_CACHE_SHARDS):
+        with ApiCacheDatabaseContextManager(shard=shard) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT cache_key, timestamp FROM api_cache")
+            all_cache_entries += cursor.fetchall()
 
     for cache_key, timestamp in all_cache_entries:
         if compiled_regex.match(cache_key):
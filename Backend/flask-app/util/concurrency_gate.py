@@ -0,0 +1,308 @@
+import os
+import math
+import time
+import uuid
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from util.database import AppDatabaseContextManager
+from util.processes import process_alive
+
+# How long a shared slot is held before it is reclaimed if never released
+DEFAULT_LEASE_SEC = 300
+
+
+class GateSaturated(Exception):
+    """
+    Raised when a request cannot get a slot: the queue is full (HTTP 503), the
+    caller already has too many queued requests (HTTP 429), or the maximum queue
+    wait ran out (HTTP 503).
+    """
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class SharedSlots:
+    """
+    A limit on concurrent holders shared by every worker process on the
+    machine, kept as rows of a table in the app database.
+
+    Each row is leased, and names the process holding it: slots held by a
+    worker that was killed are reclaimed as soon as it is gone, and slots
+    never released are reclaimed when the lease runs out.
+    """
+    def __init__(self, name, limit, lease_sec=DEFAULT_LEASE_SEC, db_manager=AppDatabaseContextManager, clock=time.time):
+        self.name = name
+        self.limit = limit
+        self.lease_sec = lease_sec
+        self._db_manager = db_manager
+        self._clock = clock
+        self._table_ready = False
+
+    def _ensure_table(self, conn):
+        if not self._table_ready:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS concurrency_slots (
+                name TEXT,
+                holder TEXT,
+                pid INTEGER,
+                expires REAL,
+                PRIMARY KEY (name, holder)
+            )
+            """)
+            conn.commit()
+            self._table_ready = True
+
+    def new_holder(self):
+        """A unique holder name for this process."""
+        return f"{os.getpid()}:{uuid.uuid4().hex}"
+
+    def try_acquire(self, holder):
+        """
+        Take a slot if one is free. The write lock is only taken when a slot
+        looks free, and a database busy with other writers counts as no slot.
+
+        Parameters:
+        - holder (str): Name of the holder, from new_holder.
+
+        Returns:
+        - bool: Whether the slot was taken.
+        """
+        now = self._clock()
+        with self._db_manager() as conn:
+            try:
+                self._ensure_table(conn)
+                pids = [pid for pid, in conn.execute(
+                    "SELECT pid FROM concurrency_slots WHERE name=? AND expires>=?", (self.name, now),
+                )]
+                if len(pids) >= self.limit and all(process_alive(pid) for pid in pids):
+                    return False
+
+                cursor = conn.cursor()
+                # Count and insert in one write transaction, so two workers can't both take the last slot
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("DELETE FROM concurrency_slots WHERE name=? AND expires<?", (self.name, now))
+                cursor.execute("SELECT holder, pid FROM concurrency_slots WHERE name=?", (self.name,))
+                holders = cursor.fetchall()
+                if len(holders) >= self.limit:
+                    dead = [(self.name, other) for other, pid in holders if not process_alive(pid)]
+                    cursor.executemany("DELETE FROM concurrency_slots WHERE name=? AND holder=?", dead)
+                    if len(holders) - len(dead) >= self.limit:
+                        conn.commit()
+                        return False
+                cursor.execute(
+                    "INSERT INTO concurrency_slots (name, holder, pid, expires) VALUES (?, ?, ?, ?)",
+                    (self.name, holder, os.getpid(), now + self.lease_sec),
+                )
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                print(f"Shared slot for {self.name} not taken: {e}")
+                return False
+        return True
+
+    def release(self, holder):
+        """Give back a slot taken by `holder`."""
+        with self._db_manager() as conn:
+            self._ensure_table(conn)
+            conn.execute("DELETE FROM concurrency_slots WHERE name=? AND holder=?", (self.name, holder))
+            conn.commit()
+
+    def held(self):
+        """Number of slots held by every worker."""
+        with self._db_manager() as conn:
+            self._ensure_table(conn)
+            return conn.execute(
+                "SELECT COUNT(*) FROM concurrency_slots WHERE name=? AND expires>=?", (self.name, self._clock()),
+            ).fetchone()[0]
+
+
+class ConcurrencyGate:
+    """
+    Bounds the number of concurrent calls to a slow dependency.
+
+    Callers beyond `max_concurrent` wait in a queue that is fair per key: slots
+    are handed out round-robin across keys (e.g. chat sessions), so one client
+    sending a burst cannot starve the others. Requests are rejected straight
+    away when the queue is full, instead of tying up a worker.
+
+    The queue and `max_concurrent` apply to one worker process. Pass `shared`
+    slots to also hold calls to a limit across every worker: a caller given a
+    local slot then tries for a shared one too. If none is free, it gives the
+    local slot back, waits with exponential backoff from `shared_poll_sec` up
+    to `shared_max_poll_sec`, and queues again.
+    """
+    def __init__(self, max_concurrent=4, max_queue=16, max_queue_per_key=2, max_wait_sec=10, clock=time.monotonic,
+                 shared=None, shared_poll_sec=0.05, shared_max_poll_sec=1.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_key = max_queue_per_key
+        self.max_wait_sec = max_wait_sec
+        self.shared = shared
+        self.shared_poll_sec = shared_poll_sec
+        self.shared_max_poll_sec = shared_max_poll_sec
+        self._shared_holders = []
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._queues = OrderedDict()    # key -> deque of waiting tickets
+        self._granted = set()
+        self._queued = 0
+        self.in_flight = 0
+
+        # Metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait_sec = 0.0
+        self.max_wait_seen_sec = 0.0
+        self.total_service_sec = 0.0
+        self.completed = 0
+
+    def _retry_after(self):
+        """Estimate how long until a slot frees up, in whole seconds."""
+        avg_service_sec = self.total_service_sec / self.completed if self.completed else 1.0
+        return max(1, math.ceil(avg_service_sec * (self._queued + 1) / self.max_concurrent))
+
+    def _grant_next(self):
+        """Hand free slots to the oldest ticket of each key in turn."""
+        while self.in_flight < self.max_concurrent and self._queues:
+            key, tickets = next(iter(self._queues.items()))
+            self._granted.add(tickets.popleft())
+            self._queued -= 1
+            if tickets:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            self.in_flight += 1
+        self._condition.notify_all()
+
+    def acquire(self, key=None):
+        """
+        Wait for a slot.
+
+        Parameters:
+        - key (str): Fairness key, e.g. the chat session ID.
+
+        Returns:
+        - float: Seconds spent waiting in the queue.
+
+        Raises:
+        - GateSaturated: If the request is rejected or waits too long.
+        """
+        started = self._clock()
+        deadline = started + self.max_wait_sec
+        holder = self.shared.new_holder() if self.shared is not None else None
+        poll_sec = self.shared_poll_sec
+        while True:
+            self._acquire_local(key, deadline)
+            if holder is None or self.shared.try_acquire(holder):
+                break
+
+            # Let other callers of this worker run while another worker holds the shared slots
+            self._release_local()
+            remaining = deadline - self._clock()
+            # Without a queue, callers are turned away at once rather than holding their worker
+            if not self.max_queue or remaining <= 0:
+                with self._condition:
+                    if self.max_queue:
+                        self.timed_out += 1
+                    else:
+                        self.rejected += 1
+                raise GateSaturated("Chat service is busy", 503, self._retry_after())
+            time.sleep(min(poll_sec, remaining))
+            poll_sec = min(poll_sec * 2, self.shared_max_poll_sec)
+
+        # Wait times are only recorded for admitted callers
+        waited = self._clock() - started
+        with self._condition:
+            if holder is not None:
+                self._shared_holders.append(holder)
+            self.admitted += 1
+            self.total_wait_sec += waited
+            self.max_wait_seen_sec = max(self.max_wait_seen_sec, waited)
+        return waited
+
+    def _acquire_local(self, key, deadline):
+        """Wait until `deadline` for a slot of this worker."""
+        with self._condition:
+            if self.in_flight < self.max_concurrent and not self._queued:
+                self.in_flight += 1
+                return
+
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise GateSaturated("Chat service is busy", 503, self._retry_after())
+            tickets = self._queues.get(key)
+            if tickets is not None and len(tickets) >= self.max_queue_per_key:
+                self.rejected += 1
+                raise GateSaturated("Too many chat requests in progress", 429, self._retry_after())
+
+            ticket = object()
+            self._queues.setdefault(key, deque()).append(ticket)
+            self._queued += 1
+            while ticket not in self._granted:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    self._queues[key].remove(ticket)
+                    if not self._queues[key]:
+                        del self._queues[key]
+                    self._queued -= 1
+                    self.timed_out += 1
+                    raise GateSaturated("Timed out waiting for the chat service", 503, self._retry_after())
+                self._condition.wait(remaining)
+            self._granted.discard(ticket)
+
+    def release(self, service_sec=None):
+        """
+        Free a slot and hand it to the next queued caller.
+
+        Parameters:
+        - service_sec (float): How long the slot was held, used for Retry-After estimates.
+        """
+        if self.shared is not None:
+            # Shared slots are interchangeable, so any one this worker holds is given back
+            with self._condition:
+                holder = self._shared_holders.pop() if self._shared_holders else None
+            if holder is not None:
+                self.shared.release(holder)
+        self._release_local(service_sec)
+
+    def _release_local(self, service_sec=None):
+        """Free a slot of this worker."""
+        with self._condition:
+            self.in_flight -= 1
+            if service_sec is not None:
+                self.completed += 1
+                self.total_service_sec += service_sec
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, key=None):
+        """Hold a slot for the duration of a `with` block."""
+        self.acquire(key)
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.release(self._clock() - started)
+
+    def stats(self):
+        """Return queue depth, in-flight and wait-time metrics."""
+        shared_in_flight = self.shared.held() if self.shared is not None else None
+        with self._condition:
+            return {
+                "sharedLimit": self.shared.limit if self.shared is not None else None,
+                "sharedInFlight": shared_in_flight,
+                "maxConcurrent": self.max_concurrent,
+                "inFlight": self.in_flight,
+                "queueDepth": self._queued,
+                "maxQueue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timedOut": self.timed_out,
+                "avgWaitMs": round(self.total_wait_sec / self.admitted * 1000, 1) if self.admitted else 0.0,
+                "maxWaitMs": round(self.max_wait_seen_sec * 1000, 1),
+            }
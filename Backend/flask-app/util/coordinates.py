@@ -0,0 +1,12 @@
+def is_valid_coordinate(lat, lon):
+    """
+    Check if latitude and longitude are valid numerical values.
+    Latitude must be between -90 and 90.
+    Longitude must be between -180 and 180.
+    """
+    try:
+        lat = float(lat)
+        lon = float(lon)
+        return -90 <= lat <= 90 and -180 <= lon <= 180
+    except (ValueError, TypeError):
+        return False
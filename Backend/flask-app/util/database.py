@@ -1,28 +1,113 @@
+import os
 import sqlite3
+import time
 import traceback
+import zlib
+from urllib.parse import quote
+from util.metrics import registry
+
+# Static snapshot of the park, crime and accident data, written only by the data pipeline
+SERVING_DATABASE_PATH = 'database/ILikeToMoveIt.db'
+
+# Data the app writes at runtime: chat sessions, cached answers and assistants
+APP_STATE_DATABASE_PATH = 'database/app_state.db'
+
+# External API responses, spread over API_CACHE_SHARDS files by a hash of the cache key
+API_CACHE_DATABASE_PATH = 'database/api_cache.db'
+API_CACHE_SHARDS = int(os.getenv('API_CACHE_SHARDS', '1'))
+
+# Bytes of the static snapshot read through a memory map, shared by all connections
+# and worker processes through the OS page cache
+STATIC_MMAP_SIZE = 256 * 1024 * 1024
+
+# Connections are opened per operation, so their lifetime is the time spent on its queries
+connection_seconds = registry.histogram(
+    'db_connection_duration_seconds', 'Time from opening a database connection to closing it, queries included.',
+    ('database',),
+)
+connection_errors = registry.counter(
+    'db_errors_total', 'Database operations that raised an exception.', ('database',),
+)
+
 
 class SQLiteContextManager:
     """
     A context manager for managing SQLite database connections.
     """
+    # Label of the database in metrics
+    metrics_name = 'sqlite'
+
     def __init__(self, db_path):
         self.db_path = db_path
 
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
     def __enter__(self):
-        self.connection = sqlite3.connect(self.db_path)
+        self.started = time.perf_counter()
+        self.connection = self.connect()
         return self.connection
 
-    def __exit__(self, exc_type, exc_value, traceback):
+    def __exit__(self, exc_type, exc_value, exc_traceback):
         if exc_type is not None:
             print(f"Database Exception: {exc_type}, {exc_value}")
-            traceback.print_tb(traceback)
+            traceback.print_tb(exc_traceback)
+            connection_errors.labels(self.metrics_name).inc()
         self.connection.commit()
         self.connection.close()
+        connection_seconds.labels(self.metrics_name).observe(time.perf_counter() - self.started)
 
 
 class AppDatabaseContextManager(SQLiteContextManager):
     """
-    Context manager for the application's main database.
+    Context manager for the data the application writes at runtime.
+    """
+    metrics_name = 'app_state'
+
+    def __init__(self, db_path=None):
+        super().__init__(db_path or APP_STATE_DATABASE_PATH)
+
+
+class SafetyMapDatabaseContextManager(SQLiteContextManager):
     """
-    def __init__(self, db_path='database/ILikeToMoveIt.db'):
-        super().__init__(db_path)
+    Context manager for the static safety map data (locations, crime, accidents).
+
+    The snapshot is opened read-only and immutable, so reads take no locks, and
+    is read through a memory map. It is only ever replaced whole, by renaming a
+    new file over it: connections opened after the swap see the new snapshot,
+    and those already open keep reading the previous one.
+    """
+    metrics_name = 'serving'
+
+    def __init__(self, db_path=None):
+        super().__init__(db_path or SERVING_DATABASE_PATH)
+
+    def connect(self):
+        connection = sqlite3.connect(f'file:{quote(self.db_path)}?mode=ro&immutable=1', uri=True)
+        connection.execute(f'PRAGMA mmap_size = {STATIC_MMAP_SIZE}')
+        return connection
+
+
+def api_cache_shard(cache_key):
+    """Index of the API cache file that holds `cache_key`."""
+    return zlib.crc32(cache_key.encode('utf-8')) % API_CACHE_SHARDS
+
+
+def api_cache_path(shard=0):
+    """Path of one API cache file."""
+    if API_CACHE_SHARDS == 1:
+        return API_CACHE_DATABASE_PATH
+    root, extension = os.path.splitext(API_CACHE_DATABASE_PATH)
+    return f'{root}_{shard}{extension}'
+
+
+class ApiCacheDatabaseContextManager(SQLiteContextManager):
+    """
+    Context manager for the API cache file holding `cache_key` (or shard `shard`).
+    """
+    metrics_name = 'api_cache'
+
+    def __init__(self, cache_key=None, shard=None):
+        if shard is None:
+            shard = api_cache_shard(cache_key) if cache_key is not None else 0
+        super().__init__(api_cache_path(shard))
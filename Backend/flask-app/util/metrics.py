@@ -0,0 +1,544 @@
+import atexit
+import bisect
+import fcntl
+import glob
+import hmac
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from util.processes import process_alive
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Files in METRICS_DIR besides the snapshot of each running worker
+RETAINED_FILE = 'retained_metrics.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def configure():
+    """
+    Read the metrics settings from environment variables. Run on import, and
+    again by create_app once the .env file is loaded.
+
+    Environment variables:
+    - METRICS_ENABLED: Set to 0 to turn every recording into a no-op.
+    - METRICS_DIR: With several worker processes, a directory each one writes
+      its metrics to every METRICS_FLUSH_SEC seconds; /metrics merges the files.
+      The counters of exited workers are kept in one file of retained totals.
+    - METRICS_TOKEN: Token a scraper sends as `Authorization: Bearer <token>`;
+      without it (or METRICS_PUBLIC) /metrics is not served.
+    - METRICS_PUBLIC: Set to 1 to serve /metrics to anyone, e.g. when only the
+      scraper can reach the app.
+    """
+    global enabled, directory, flush_sec, token, public
+    enabled = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    directory = os.getenv('METRICS_DIR') or None
+    flush_sec = float(os.getenv('METRICS_FLUSH_SEC', 5))
+    token = os.getenv('METRICS_TOKEN') or None
+    public = os.getenv('METRICS_PUBLIC', '0').lower() in ('1', 'true', 'yes')
+
+
+configure()
+
+
+def format_value(value):
+    """Format a sample value as the exposition format expects it."""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def escape_label_value(value):
+    """Escape a label value for the exposition format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    """Format (name, value) label pairs as `{name="value",...}`, or nothing if there are none."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+class CounterValue:
+    """One labelled series of a counter."""
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        if enabled:
+            with self._lock:
+                self.value += amount
+
+    def samples(self):
+        """Yield (name suffix, extra labels, value) for each sample of the series."""
+        yield '', (), self.value
+
+    def snapshot(self):
+        """The series' value, as written to a snapshot file."""
+        return self.value
+
+    def add(self, snapshot):
+        """Add a snapshot of the same series from another process."""
+        with self._lock:
+            self.value += snapshot
+
+
+class GaugeValue(CounterValue):
+    """One labelled series of a gauge."""
+    __slots__ = ()
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        if enabled:
+            self.value = value
+
+    def track_in_progress(self):
+        """Context manager that counts the `with` block as in progress."""
+        return InProgress(self)
+
+
+class HistogramValue:
+    """One labelled series of a histogram: a count per bucket, the sum and the count of observations."""
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if enabled:
+            position = bisect.bisect_left(self.buckets, value)
+            with self._lock:
+                self.counts[position] += 1
+                self.sum += value
+
+    def time(self):
+        """Context manager that observes how long the `with` block takes, in seconds."""
+        return Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return {'counts': list(self.counts), 'sum': self.sum}
+
+    def add(self, snapshot):
+        with self._lock:
+            self.counts = [count + other for count, other in zip(self.counts, snapshot['counts'])]
+            self.sum += snapshot['sum']
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield '_bucket', (('le', format_value(bound)),), cumulative
+        yield '_sum', (), total
+        yield '_count', (), cumulative
+
+
+class Timer:
+    """Observes the duration of a `with` block in a histogram series."""
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class InProgress:
+    """Raises a gauge series for the duration of a `with` block."""
+    __slots__ = ('gauge',)
+
+    def __init__(self, gauge):
+        self.gauge = gauge
+
+    def __enter__(self):
+        self.gauge.inc()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.gauge.dec()
+
+
+class Metric:
+    """
+    A named metric with a series per combination of label values.
+
+    Series are created on first use through `labels`, and looked up without
+    locking after that, so recording costs a dictionary lookup and the lock
+    of the series.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        The series for one combination of label values.
+
+        Parameters:
+        - values: A value for each label name, in order.
+
+        Returns:
+        - The series, to record into.
+        """
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} takes labels {self.label_names}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(values, self.new_series())
+        return series
+
+    def collect(self):
+        """Yield the exposition lines of the metric."""
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        with self._lock:
+            series = list(self._series.items())
+        for values, values_series in series:
+            labels = tuple(zip(self.label_names, values))
+            for suffix, extra_labels, value in values_series.samples():
+                yield f'{self.name}{suffix}{format_labels(labels + extra_labels)} {format_value(value)}'
+
+    def snapshot(self):
+        """The metric and the values of its series, as written to a snapshot file."""
+        with self._lock:
+            series = list(self._series.items())
+        return {
+            'name': self.name, 'kind': self.kind, 'documentation': self.documentation,
+            'labels': list(self.label_names), 'series': [[list(values), value.snapshot()] for values, value in series],
+        }
+
+
+class Counter(Metric):
+    """A count that only goes up, e.g. cache hits."""
+    kind = 'counter'
+
+    def new_series(self):
+        return CounterValue()
+
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. requests in flight."""
+    kind = 'gauge'
+
+    def new_series(self):
+        return GaugeValue()
+
+
+class Histogram(Metric):
+    """A distribution of observations, e.g. latencies, counted into buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def new_series(self):
+        return HistogramValue(self.buckets)
+
+    def snapshot(self):
+        return {**super().snapshot(), 'buckets': list(self.buckets)}
+
+
+class GaugeFunction(Metric):
+    """A gauge read from a function when metrics are collected, e.g. the depth of a queue."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        yield f'{self.name} {format_value(self.function())}'
+
+    def snapshot(self):
+        return {'name': self.name, 'kind': self.kind, 'documentation': self.documentation,
+                'labels': [], 'series': [[[], float(self.function())]]}
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process, rendered in the Prometheus text format.
+
+    Each metric is registered once by name: registering the same name again
+    returns the existing metric, so a module imported under two names (such
+    as util.api_caching) shares its metrics.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is None:
+                self.metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+            raise ValueError(f"Metric {metric.name} is already registered differently")
+        return existing
+
+    def counter(self, name, documentation, label_names=()):
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def gauge_function(self, name, documentation, function):
+        metric = self.register(GaugeFunction(name, documentation, function))
+        metric.function = function
+        return metric
+
+    def render(self):
+        """Every metric, in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """The current value of every series, as metric snapshots."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return [metric.snapshot() for metric in metrics]
+
+    def write_snapshot(self, snapshot_directory, pid=None, token=None):
+        """
+        Write the current value of every series to this process's file in
+        `snapshot_directory`, replacing it whole so readers never see part of it.
+        """
+        pid = pid or os.getpid()
+        path = os.path.join(snapshot_directory, f'metrics_{pid}.json')
+        write_json(path, {'pid': pid, 'token': token or process_token(), 'metrics': self.snapshot()})
+
+    def add_snapshot(self, metric_snapshot):
+        """Add one metric of another process's snapshot to this registry's totals."""
+        kind = metric_snapshot['kind']
+        if kind == 'histogram':
+            metric = self.histogram(metric_snapshot['name'], metric_snapshot['documentation'],
+                                    metric_snapshot['labels'], metric_snapshot['buckets'])
+        else:
+            metric = self.register(KINDS[kind](metric_snapshot['name'], metric_snapshot['documentation'],
+                                                metric_snapshot['labels']))
+        for values, value in metric_snapshot['series']:
+            metric.labels(*values).add(value)
+
+
+KINDS = {'counter': Counter, 'gauge': Gauge}
+
+# (pid, token) of this process; a forked worker draws its own token
+_process_token = (None, None)
+
+
+def process_token():
+    """A random ID of this process, telling it apart from an earlier process with the same pid."""
+    global _process_token
+    if _process_token[0] != os.getpid():
+        _process_token = (os.getpid(), uuid.uuid4().hex)
+    return _process_token[1]
+
+
+def write_json(path, value):
+    """Write a JSON file whole, through a temporary file, so readers never see part of it."""
+    temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(value, file)
+    os.replace(temporary_path, path)
+
+
+@contextmanager
+def directory_lock(snapshot_directory):
+    """Hold a lock on the snapshot directory, shared by every worker on the machine."""
+    with open(os.path.join(snapshot_directory, LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_retained(snapshot_directory):
+    """The retained totals of exited workers, and the snapshot files already folded into them."""
+    try:
+        with open(os.path.join(snapshot_directory, RETAINED_FILE)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'folded': [], 'metrics': []}
+
+
+def fold_exited(snapshot_directory):
+    """
+    Add the counters and histograms of workers that have exited to the
+    retained totals, then delete their snapshot files, so the directory only
+    holds one file per running worker. A file with this process's pid but not
+    its token was left by an earlier process given the same pid, and is folded
+    too. Gauges of exited workers are dropped.
+
+    Call with the directory lock held.
+
+    Returns:
+    - Tuple: The retained metric snapshots, and the snapshots of running workers.
+    """
+    retained = read_retained(snapshot_directory)
+    # Files folded into the totals but not yet deleted, e.g. if a worker was killed in between
+    folded = set(retained['folded'])
+    totals = MetricsRegistry()
+    for metric_snapshot in retained['metrics']:
+        totals.add_snapshot(metric_snapshot)
+
+    running, exited = [], {}
+    for path in sorted(glob.glob(os.path.join(snapshot_directory, 'metrics_*.json'))):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue
+        key = f"{snapshot['pid']}:{snapshot.get('token')}"
+        if key not in folded:
+            reused = snapshot['pid'] == os.getpid() and snapshot.get('token') != process_token()
+            if process_alive(snapshot['pid']) and not reused:
+                running.append(snapshot)
+                continue
+            for metric_snapshot in snapshot['metrics']:
+                if metric_snapshot['kind'] != 'gauge':
+                    totals.add_snapshot(metric_snapshot)
+        exited[path] = key
+    if not exited:
+        return retained['metrics'], running
+
+    # Record the files as folded before deleting them, so none is counted twice
+    metric_snapshots = totals.snapshot()
+    retained_path = os.path.join(snapshot_directory, RETAINED_FILE)
+    write_json(retained_path, {'folded': sorted(folded | set(exited.values())), 'metrics': metric_snapshots})
+    for path in exited:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    write_json(retained_path, {'folded': [], 'metrics': metric_snapshots})
+    return metric_snapshots, running
+
+
+def aggregate(snapshot_directory):
+    """
+    Merge the snapshot files of every worker process into one registry.
+
+    Counters and histograms are summed over the running workers and the
+    retained totals of those that have exited, so totals never go down when
+    a worker is replaced. Gauges are summed over the workers still running.
+    """
+    with directory_lock(snapshot_directory):
+        retained, running = fold_exited(snapshot_directory)
+    merged = MetricsRegistry()
+    for metric_snapshot in retained:
+        merged.add_snapshot(metric_snapshot)
+    for snapshot in running:
+        for metric_snapshot in snapshot['metrics']:
+            merged.add_snapshot(metric_snapshot)
+    return merged
+
+
+registry = MetricsRegistry()
+
+# Process whose snapshot writer is running; a forked worker starts its own
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def ensure_snapshots():
+    """
+    Start writing this process's snapshots to METRICS_DIR every `flush_sec`
+    seconds and at exit, if METRICS_DIR is set and this process has not yet.
+    """
+    global _writer_pid
+    if directory is None or _writer_pid == os.getpid():
+        return
+    with _writer_lock:
+        if _writer_pid == os.getpid():
+            return
+        _writer_pid = os.getpid()
+        os.makedirs(directory, exist_ok=True)
+        snapshot_directory = directory
+        # Keep the totals of an earlier process with this pid before its file is overwritten
+        with directory_lock(snapshot_directory):
+            fold_exited(snapshot_directory)
+
+        def write():
+            try:
+                registry.write_snapshot(snapshot_directory)
+            except OSError as e:
+                print(f"Error writing metrics snapshot: {e}")
+
+        def write_periodically():
+            while True:
+                time.sleep(flush_sec)
+                write()
+
+        threading.Thread(target=write_periodically, daemon=True).start()
+        atexit.register(write)
+
+
+def render_all():
+    """
+    The metrics to expose: those of every worker sharing METRICS_DIR, with this
+    process's up to date, or just this process's without METRICS_DIR.
+    """
+    if directory is None:
+        return registry.render()
+    ensure_snapshots()
+    registry.write_snapshot(directory)
+    return aggregate(directory).render()
+
+
+def scrape_allowed(authorization):
+    """
+    Whether a request with this Authorization header may read /metrics.
+
+    Returns:
+    - bool or None: True if allowed, False for a missing or wrong token, and
+      None if /metrics is not served at all (neither a token nor METRICS_PUBLIC).
+    """
+    if public:
+        return True
+    if not token:
+        return None
+    return hmac.compare_digest((authorization or '').encode(), f'Bearer {token}'.encode())
@@ -0,0 +1,14 @@
+import os
+
+
+def process_alive(pid):
+    """Whether a process with this ID is running on this machine."""
+    if pid is None or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
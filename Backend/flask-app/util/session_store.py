@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+from util.database import AppDatabaseContextManager
+
+# Defaults, overridable through environment variables
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_TTL_SEC = 3600
+DEFAULT_MAX_TURNS = 20
+
+
+def _new_session():
+    """Return an empty session record."""
+    return {'thread_id': None, 'conversation': []}
+
+
+class SessionStore:
+    """
+    Base class for chat session stores.
+
+    A session maps a client `sessionId` to its OpenAI `thread_id` and the most
+    recent conversation turns. Subclasses implement `_load`, `_update` and
+    `_size`; this class keeps the hit/miss counters shared by every backend.
+    """
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, ttl_sec=DEFAULT_TTL_SEC, max_turns=DEFAULT_MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.ttl_sec = ttl_sec
+        self.max_turns = max_turns
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, counter, amount=1):
+        """Add to one of the hit, miss, eviction or expiration counters."""
+        if amount:
+            with self._stats_lock:
+                setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, session_id):
+        """
+        Look up a session, returning None if it is unknown or has expired.
+        """
+        session = self._load(session_id) if session_id else None
+        self._count('misses' if session is None else 'hits')
+        return session
+
+    def record_turn(self, session_id, thread_id, user_message, ai_response):
+        """
+        Store the thread ID and append a conversation turn, keeping only the
+        last `max_turns` turns.
+
+        The session is read and written back as one atomic update, so turns
+        recorded at the same time by other threads or workers are kept.
+        """
+        def add_turn(session):
+            session['thread_id'] = thread_id
+            session['conversation'].append({"user": user_message, "ai": ai_response})
+            session['conversation'] = session['conversation'][-self.max_turns:]
+        self._update(session_id, add_turn)
+
+    def stats(self):
+        """
+        Return size, memory and hit-rate metrics for the store.
+        """
+        sessions, turns, approx_bytes = self._size()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "sessions": sessions,
+                "turns": turns,
+                "approxBytes": approx_bytes,
+                "maxSessions": self.max_sessions,
+                "ttlSec": self.ttl_sec,
+                "maxTurns": self.max_turns,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-process session store with LRU and TTL eviction.
+    """
+    backend = 'memory'
+
+    def __init__(self, *args, clock=time.monotonic, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            last_access, session = entry
+            if self._clock() - last_access > self.ttl_sec:
+                del self._sessions[session_id]
+                self._count('expirations')
+                return None
+            self._sessions[session_id] = (self._clock(), session)
+            self._sessions.move_to_end(session_id)
+            return {'thread_id': session['thread_id'], 'conversation': list(session['conversation'])}
+
+    def _update(self, session_id, update):
+        with self._lock:
+            session = self._load(session_id) or _new_session()
+            update(session)
+            self._sessions[session_id] = (self._clock(), session)
+            self._sessions.move_to_end(session_id)
+            evicted = 0
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                evicted += 1
+        self._count('evictions', evicted)
+
+    def _size(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        turns = sum(len(session['conversation']) for _, session in sessions)
+        approx_bytes = sum(
+            sys.getsizeof(turn['user']) + sys.getsizeof(turn['ai'])
+            for _, session in sessions for turn in session['conversation']
+        )
+        return len(sessions), turns, approx_bytes
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store backed by a SQLite table, shared by every worker process that
+    opens the same database file.
+    """
+    backend = 'sqlite'
+
+    def __init__(self, *args, db_manager=AppDatabaseContextManager, clock=time.time, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._db_manager = db_manager
+        self._clock = clock
+        self.initialize_table()
+
+    def initialize_table(self):
+        """Create the chat session table if it does not exist."""
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            session_id TEXT PRIMARY KEY,
+            thread_id TEXT,
+            conversation TEXT,
+            last_access REAL
+        )
+        """
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            cursor.execute(create_table_sql)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_access ON chat_sessions (last_access)")
+            conn.commit()
+
+    def _read(self, cursor, session_id, now):
+        """Read a session and mark it accessed, deleting it if it has expired."""
+        cursor.execute(
+            "SELECT thread_id, conversation, last_access FROM chat_sessions WHERE session_id=?",
+            (session_id,),
+        )
+        result = cursor.fetchone()
+        if result is None:
+            return None
+        thread_id, conversation, last_access = result
+        if now - last_access > self.ttl_sec:
+            cursor.execute("DELETE FROM chat_sessions WHERE session_id=?", (session_id,))
+            self._count('expirations')
+            return None
+        cursor.execute("UPDATE chat_sessions SET last_access=? WHERE session_id=?", (now, session_id))
+        return {'thread_id': thread_id, 'conversation': json.loads(conversation)}
+
+    def _load(self, session_id):
+        now = self._clock()
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            session = self._read(cursor, session_id, now)
+            conn.commit()
+        return session
+
+    def _update(self, session_id, update):
+        now = self._clock()
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            # Take the write lock before reading, so another worker's turn can't
+            # land between the read and the write and be overwritten
+            cursor.execute("BEGIN IMMEDIATE")
+            session = self._read(cursor, session_id, now) or _new_session()
+            update(session)
+            cursor.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, thread_id, conversation, last_access) VALUES (?, ?, ?, ?)",
+                (session_id, session['thread_id'], json.dumps(session['conversation']), now),
+            )
+            # Expire stale sessions, then trim the least recently used ones
+            cursor.execute("DELETE FROM chat_sessions WHERE last_access < ?", (now - self.ttl_sec,))
+            expired = cursor.rowcount
+            cursor.execute(
+                """
+                DELETE FROM chat_sessions WHERE session_id IN (
+                    SELECT session_id FROM chat_sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_sessions,),
+            )
+            evicted = cursor.rowcount
+            conn.commit()
+        self._count('expirations', expired)
+        self._count('evictions', evicted)
+
+    def _size(self):
+        with self._db_manager() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT conversation FROM chat_sessions")
+            conversations = [row[0] for row in cursor.fetchall()]
+        turns = sum(len(json.loads(conversation)) for conversation in conversations)
+        approx_bytes = sum(len(conversation) for conversation in conversations)
+        return len(conversations), turns, approx_bytes
+
+
+def create_session_store():
+    """
+    Build the session store configured through environment variables.
+
+    Environment variables:
+    - CHAT_SESSION_BACKEND: 'memory' (default) or 'sqlite' for a store shared across workers.
+    - CHAT_SESSION_MAX: Maximum number of sessions kept before LRU eviction.
+    - CHAT_SESSION_TTL_SEC: Idle time after which a session expires.
+    - CHAT_SESSION_MAX_TURNS: Number of conversation turns kept per session.
+    """
+    backend = os.getenv('CHAT_SESSION_BACKEND', 'memory').lower()
+    options = {
+        'max_sessions': int(os.getenv('CHAT_SESSION_MAX', DEFAULT_MAX_SESSIONS)),
+        'ttl_sec': int(os.getenv('CHAT_SESSION_TTL_SEC', DEFAULT_TTL_SEC)),
+        'max_turns': int(os.getenv('CHAT_SESSION_MAX_TURNS', DEFAULT_MAX_TURNS)),
+    }
+    if backend == 'sqlite':
+        return SQLiteSessionStore(**options)
+    if backend != 'memory':
+        raise ValueError(f"Unknown CHAT_SESSION_BACKEND: {backend}")
+    return InMemorySessionStore(**options)
@@ -0,0 +1,7 @@
+import json
+
+
+def format_sse(data, event=None):
+    """Format a JSON payload as a Server-Sent Events message."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
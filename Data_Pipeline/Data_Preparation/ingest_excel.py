@@ -0,0 +1,121 @@
+import glob
+import hashlib
+import json
+import os
+import pandas as pd
+from processed_store import postcode_strings
+
+# Parsed sheets are cached here, keyed by the workbook's content hash
+INGEST_CACHE_DIR = './Data/Processed Data/ingest_cache'
+
+# Rows searched for the header row, for sheets with a title block above the table
+MAX_HEADER_ROW = 20
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def postcode_key(value):
+    """Normalise a postcode cell ('3052', 3052 or 3052.0) to a string, or None if it isn't one."""
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_sheet(path, sheet, columns, postcode_column=None, postcodes=None):
+    """
+    Stream the rows of a worksheet without loading the workbook into memory.
+
+    The workbook is opened in read-only mode, cells past the last requested
+    column are never parsed, and rows outside `postcodes` are dropped as they
+    are read.
+
+    Parameters:
+    - path (str): Path to the .xlsx file.
+    - sheet (str): Worksheet name.
+    - columns (list): Header names of the columns to keep.
+    - postcode_column (str): Header name of the postcode column to filter on.
+    - postcodes (set): Postcodes (as strings) to keep; all rows if None.
+
+    Yields:
+    - tuple: Values of the requested columns for each row.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[sheet]
+        wanted = set(columns) | ({postcode_column} if postcode_column else set())
+        for header_row, row in enumerate(worksheet.iter_rows(max_row=MAX_HEADER_ROW, values_only=True), start=1):
+            header = [str(cell).strip() if cell is not None else None for cell in row]
+            if wanted <= set(header):
+                break
+        else:
+            raise ValueError(f"No header row with columns {sorted(wanted)} in sheet '{sheet}' of {path}")
+
+        # Repeated header names resolve to their first occurrence
+        indexes = [header.index(column) for column in columns]
+        postcode_index = header.index(postcode_column) if postcode_column else None
+        last_column = max(indexes + [postcode_index or 0]) + 1
+
+        for row in worksheet.iter_rows(min_row=header_row + 1, max_col=last_column, values_only=True):
+            if postcodes is not None and postcode_key(row[postcode_index]) not in postcodes:
+                continue
+            yield tuple(row[index] for index in indexes)
+    finally:
+        workbook.close()
+
+
+def ingest_sheet(path, sheet, columns, postcode_column=None, postcodes=None, numeric_columns=(), cache_dir=INGEST_CACHE_DIR):
+    """
+    Load selected columns of a worksheet as a DataFrame, parsing the workbook
+    only the first time it is seen.
+
+    The parsed table is cached as Parquet under a key made of the workbook's
+    content hash and the requested columns and postcodes, so a run with an
+    unchanged workbook reads the cache instead.
+
+    Parameters:
+    - path (str): Path to the .xlsx file.
+    - sheet (str): Worksheet name.
+    - columns (dict): Header name to output column name.
+    - postcode_column (str): Header name of the postcode column to filter on; output as a postcode string.
+    - postcodes (iterable): Postcodes to keep; all rows if None.
+    - numeric_columns (iterable): Output columns to parse as numbers.
+    - cache_dir (str): Directory of the parsed-sheet cache.
+
+    Returns:
+    - DataFrame: One column per entry in `columns`, with text columns as strings.
+    """
+    postcodes = None if postcodes is None else {postcode_key(postcode) for postcode in postcodes}
+    spec = json.dumps([sheet, columns, postcode_column, sorted(postcodes) if postcodes is not None else None, sorted(numeric_columns)])
+    prefix = f"{os.path.splitext(os.path.basename(path))[0]}-{hashlib.sha256(spec.encode()).hexdigest()[:12]}"
+    cache_path = os.path.join(cache_dir, f"{prefix}-{file_sha256(path)[:16]}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    source_columns = list(columns)
+    df = pd.DataFrame.from_records(
+        stream_sheet(path, sheet, source_columns, postcode_column, postcodes),
+        columns=[columns[column] for column in source_columns],
+    )
+    for column in df.columns:
+        if column in numeric_columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        elif postcode_column and column == columns.get(postcode_column):
+            df[column] = postcode_strings(df[column])
+        else:
+            df[column] = df[column].astype('string')
+
+    # Entries for earlier versions of the workbook are no longer needed
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale_path in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(prefix)}-*.parquet")):
+        os.remove(stale_path)
+    df.to_parquet(cache_path, index=False)
+    return df
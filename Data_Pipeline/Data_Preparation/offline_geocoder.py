@@ -0,0 +1,207 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from processed_store import processed_path, read_processed
+from suburb_dimension import SUBURB_DIMENSION_PATH, load_suburb_dimension
+
+# Paths
+REFERENCE_POINTS_PATH = './Data/Processed Data/suburb_reference_points.csv'
+GEOCODE_CACHE_PATH = './Data/Processed Data/geocode_cache.csv'
+
+# Processed datasets whose rows are labelled with suburb and postcode at their
+# source. Playgrounds are not among them: they are what the reference points label.
+LABELLED_DATASETS = ['filtered_facility_data', 'filtered_landmark_data']
+FACILITY_DATA_PATH, LANDMARK_DATA_PATH = (processed_path(name) for name in LABELLED_DATASETS)
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.2
+
+
+def build_reference_points(output_path=REFERENCE_POINTS_PATH):
+    """
+    Build the reference points from processed datasets that carry suburb and
+    postcode from their source, keeping only pairs known to the suburb
+    dimension. A statewide centroid file with the same columns can be used
+    instead.
+    """
+    labelled = pd.concat(
+        [read_processed(name, columns=['latitude', 'longitude', 'suburb', 'postcode']) for name in LABELLED_DATASETS],
+        ignore_index=True,
+    ).dropna()
+    reference = labelled[load_suburb_dimension().is_known(labelled['postcode'], labelled['suburb'])]
+    reference = reference.astype({'suburb': str, 'postcode': int})
+
+    reference = reference[['latitude', 'longitude', 'suburb', 'postcode']].drop_duplicates(['latitude', 'longitude'])
+    reference.to_csv(output_path, index=False)
+    print(f"Reference points saved to {output_path} ({len(reference)} points)")
+    return reference
+
+
+class CachedRemoteGeocoder:
+    """
+    Remote reverse geocoder (Nominatim) with a persistent on-disk cache, used for
+    points outside the coverage of the offline reference data.
+    """
+    def __init__(self, user_agent, cache_path=GEOCODE_CACHE_PATH, min_interval_sec=1.0, precision=5):
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.cache_path = cache_path
+        self.min_interval_sec = min_interval_sec
+        self.precision = precision
+        self._last_request = 0.0
+        self._cache = {}
+        if os.path.exists(cache_path):
+            cached = pd.read_csv(cache_path, dtype={'suburb': str, 'postcode': str}, keep_default_na=False)
+            self._cache = {
+                (row.latitude, row.longitude): (row.suburb, row.postcode)
+                for row in cached.itertuples(index=False)
+            }
+
+    @classmethod
+    def from_env(cls):
+        """Return a remote geocoder if NOMINATIM_USER_AGENT is set, otherwise None."""
+        user_agent = os.getenv('NOMINATIM_USER_AGENT')
+        return cls(user_agent) if user_agent else None
+
+    def reverse(self, latitude, longitude):
+        """
+        Fetch suburb name and postcode for a point, from the cache when possible.
+        """
+        key = (round(float(latitude), self.precision), round(float(longitude), self.precision))
+        if key in self._cache:
+            return self._cache[key]
+
+        # Respect the Nominatim usage policy of at most one request per second
+        wait = self.min_interval_sec - (time.monotonic() - self._last_request)
+        if wait > 0:
+            time.sleep(wait)
+        self._last_request = time.monotonic()
+        try:
+            location = self.geolocator.reverse(key, exactly_one=True, timeout=10)
+            address = location.raw['address']
+            result = (address.get('suburb', ''), address.get('postcode', ''))
+        except Exception as e:
+            print(f"Error fetching location for lat: {latitude}, long: {longitude}. Error: {e}")
+            return '', ''
+
+        self._cache[key] = result
+        pd.DataFrame([[*key, *result]], columns=['latitude', 'longitude', 'suburb', 'postcode']).to_csv(
+            self.cache_path, mode='a', index=False, header=not os.path.exists(self.cache_path)
+        )
+        return result
+
+
+class OfflineReverseGeocoder:
+    """
+    Assigns suburb and postcode to points by nearest reference point, without
+    network calls.
+
+    Reference points are bucketed into a uniform grid. Each query scans the 3x3
+    block of cells around it with vectorised NumPy operations; a match closer
+    than one cell width is guaranteed to be the true nearest neighbour, and the
+    few remaining queries fall back to an exact chunked brute-force search.
+    """
+    def __init__(self, reference, max_distance_km=2.0, cell_km=1.0, remote=None):
+        self.max_distance_km = max_distance_km
+        self.cell_km = cell_km
+        self.remote = remote
+        self.suburbs = reference['suburb'].astype(str).to_numpy()
+        self.postcodes = reference['postcode'].astype(int).astype(str).to_numpy()
+
+        latitude = reference['latitude'].to_numpy(dtype=float)
+        longitude = reference['longitude'].to_numpy(dtype=float)
+        self.origin_lat = float(latitude.mean())
+        self.x, self.y = self._project(latitude, longitude)
+
+        # Sort reference points by grid cell so each cell is a contiguous slice
+        cell_x, cell_y = self._cell(self.x), self._cell(self.y)
+        order = np.lexsort((cell_y, cell_x))
+        self.x, self.y = self.x[order], self.y[order]
+        self.suburbs, self.postcodes = self.suburbs[order], self.postcodes[order]
+        self.cell_keys = self._cell_key(cell_x[order], cell_y[order])
+        self.max_per_cell = int(np.unique(self.cell_keys, return_counts=True)[1].max())
+
+    @classmethod
+    def from_csv(cls, path=REFERENCE_POINTS_PATH, **kwargs):
+        """Load reference points (latitude, longitude, suburb, postcode) from a CSV."""
+        return cls(pd.read_csv(path), **kwargs)
+
+    def _project(self, latitude, longitude):
+        """Equirectangular projection to kilometres, accurate at city scale."""
+        x = longitude * KM_PER_DEGREE * np.cos(np.radians(self.origin_lat))
+        y = latitude * KM_PER_DEGREE
+        return x, y
+
+    def _cell(self, coordinate):
+        return np.floor(coordinate / self.cell_km).astype(np.int64)
+
+    @staticmethod
+    def _cell_key(cell_x, cell_y):
+        return cell_x * 1_000_003 + cell_y
+
+    def nearest(self, latitude, longitude):
+        """
+        Find the nearest reference point for each query point.
+
+        Returns:
+        - Tuple: Index of the nearest reference point and its distance in km, per query.
+        """
+        x, y = self._project(np.asarray(latitude, dtype=float), np.asarray(longitude, dtype=float))
+        best_index = np.full(len(x), -1, dtype=np.int64)
+        best_sq = np.full(len(x), np.inf)
+
+        cell_x, cell_y = self._cell(x), self._cell(y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                keys = self._cell_key(cell_x + dx, cell_y + dy)
+                start = np.searchsorted(self.cell_keys, keys, side='left')
+                end = np.searchsorted(self.cell_keys, keys, side='right')
+                for offset in range(self.max_per_cell):
+                    candidate = start + offset
+                    valid = candidate < end
+                    if not valid.any():
+                        break
+                    index = candidate[valid]
+                    sq = (self.x[index] - x[valid]) ** 2 + (self.y[index] - y[valid]) ** 2
+                    better = sq < best_sq[valid]
+                    rows = np.flatnonzero(valid)[better]
+                    best_sq[rows] = sq[better]
+                    best_index[rows] = index[better]
+
+        # Matches further than one cell away may miss a closer point outside the block
+        unresolved = np.flatnonzero(best_sq > self.cell_km ** 2)
+        for chunk in np.array_split(unresolved, max(1, len(unresolved) // 2048)):
+            if len(chunk) == 0:
+                continue
+            sq = (x[chunk, None] - self.x[None, :]) ** 2 + (y[chunk, None] - self.y[None, :]) ** 2
+            best_index[chunk] = sq.argmin(axis=1)
+            best_sq[chunk] = sq.min(axis=1)
+
+        return best_index, np.sqrt(best_sq)
+
+    def reverse(self, latitude, longitude):
+        """
+        Assign suburb name and postcode to each point.
+
+        Points further than `max_distance_km` from every reference point are sent
+        to the remote geocoder when one is configured, and left blank otherwise.
+
+        Returns:
+        - Tuple: Arrays of suburb names and postcodes.
+        """
+        latitude = np.asarray(latitude, dtype=float)
+        longitude = np.asarray(longitude, dtype=float)
+        index, distance = self.nearest(latitude, longitude)
+
+        suburbs = self.suburbs[index].astype(object)
+        postcodes = self.postcodes[index].astype(object)
+        outside = np.flatnonzero(distance > self.max_distance_km)
+        for row in outside:
+            suburbs[row], postcodes[row] = self.remote.reverse(latitude[row], longitude[row]) if self.remote else ('', '')
+        return suburbs, postcodes
+
+
+if __name__ == '__main__':
+    build_reference_points()
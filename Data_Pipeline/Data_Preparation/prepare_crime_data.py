@@ -1,26 +1,80 @@
 import pandas as pd
+from processed_store import postcode_strings, processed_path, write_processed
+from suburb_dimension import SUBURB_DIMENSION_PATH, load_suburb_dimension
 
 # Paths
 CRIME_DATA_PATH = './Data/Raw Data/crime_data.csv'
-SUBURB_INFO_PATH = './Data/Processed Data/suburb_info.csv'
-OUTPUT_PATH = './Data/Processed Data/filtered_crime_data_with_suburb_id.csv'
+OUTPUT_NAME = 'filtered_crime_data_by_suburb'
+OUTPUT_PATH = processed_path(OUTPUT_NAME)
+YEARLY_OUTPUT_NAME = 'filtered_crime_data_by_year'
+YEARLY_OUTPUT_PATH = processed_path(YEARLY_OUTPUT_NAME)
+
+# Raw rows read per batch; memory use depends on this, not on the size of the file
+CHUNK_ROWS = 200_000
+
+GROUP_COLUMNS = ['suburb', 'postcode', 'year']
+
+
+def aggregate_crime_chunks(path, postcodes, chunk_rows=CHUNK_ROWS):
+    """
+    Sum incidents per suburb, postcode and year, reading the raw data in batches.
+
+    Each batch is filtered to `postcodes` before grouping, and its partial sums
+    are added into running totals, so only one batch and one row per
+    (suburb, postcode, year) are held in memory at a time.
+
+    Parameters:
+    - path (str): Raw crime CSV with suburb, postcode, year and incidents_recorded columns.
+    - postcodes (iterable): Postcodes to keep.
+    - chunk_rows (int): Rows per batch.
+
+    Returns:
+    - DataFrame: suburb, postcode (string), year and incidents_recorded.
+    """
+    postcodes = pd.to_numeric(pd.Series(list(postcodes)), errors='coerce').dropna().astype(int).unique()
+    totals = None
+    chunks = pd.read_csv(
+        path,
+        usecols=GROUP_COLUMNS + ['incidents_recorded'],
+        dtype={'suburb': 'category', 'postcode': 'float64', 'year': 'int64', 'incidents_recorded': 'float64'},
+        chunksize=chunk_rows,
+    )
+    for chunk in chunks:
+        chunk = chunk[chunk['postcode'].isin(postcodes)]
+        if chunk.empty:
+            continue
+        partial = chunk.groupby(GROUP_COLUMNS, observed=True)['incidents_recorded'].sum()
+        totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        return pd.DataFrame({
+            'suburb': pd.Series(dtype='object'), 'postcode': postcode_strings([]),
+            'year': pd.Series(dtype='int64'), 'incidents_recorded': pd.Series(dtype='int64'),
+        })
+    yearly = totals.astype('int64').reset_index()
+    yearly['suburb'] = yearly['suburb'].astype(str)
+    yearly['postcode'] = postcode_strings(yearly['postcode'])
+    return yearly
+
 
 def prepare_crime_data():
-    # Load raw crime data
-    crime_data = pd.read_csv(CRIME_DATA_PATH)
-    suburb_info = pd.read_csv(SUBURB_INFO_PATH)
+    dimension = load_suburb_dimension()
 
-    # Aggregate incidents
-    crime_grouped = crime_data.groupby(['suburb', 'postcode'])['incidents_recorded'].sum().reset_index()
-    crime_grouped.columns = ['suburb', 'postcode', 'incidents_recorded_2014_2023']
+    # Aggregate incidents per suburb and year, keeping only the in-scope postcodes
+    yearly = aggregate_crime_chunks(CRIME_DATA_PATH, dimension.postcodes)
+    yearly['suburb_id'] = dimension.suburb_ids(yearly['postcode'], yearly['suburb']).to_numpy()
+    yearly = yearly.dropna(subset=['suburb_id']).astype({'suburb_id': 'int64', 'postcode': str})
+    yearly = yearly.sort_values(['suburb_id', 'year'])
 
-    # Merge with suburb info
-    crime_grouped['postcode'] = crime_grouped['postcode'].astype(str)
-    filtered_df = crime_grouped.merge(suburb_info, on=['postcode', 'suburb'])
+    # Totals over all years, in the shape of the Crime table
+    crime_grouped = yearly.groupby(['suburb', 'postcode', 'suburb_id'], as_index=False)['incidents_recorded'].sum()
+    crime_grouped = crime_grouped.rename(columns={'incidents_recorded': 'incidents_recorded_2014_2023'})
+    filtered_df = crime_grouped[['suburb', 'postcode', 'incidents_recorded_2014_2023', 'suburb_id']]
 
-    # Save to CSV
-    filtered_df.to_csv(OUTPUT_PATH, index=False)
-    print(f"Filtered crime data saved to {OUTPUT_PATH}")
+    # Save as Parquet
+    write_processed(filtered_df, OUTPUT_NAME)
+    write_processed(yearly[['suburb_id', 'suburb', 'postcode', 'year', 'incidents_recorded']], YEARLY_OUTPUT_NAME)
+    print(f"Filtered crime data saved to {OUTPUT_PATH} and {YEARLY_OUTPUT_PATH}")
 
 if __name__ == '__main__':
     prepare_crime_data()
@@ -1,22 +1,44 @@
 import pandas as pd
+from processed_store import processed_path, write_processed
+from ingest_excel import ingest_sheet
+from suburb_dimension import SUBURB_DIMENSION_PATH, load_suburb_dimension
 
 # Paths
-FACILITY_DATA_PATH = './Data/Raw Data/facility_data.csv'
-OUTPUT_PATH = './Data/Processed Data/filtered_facility_data.csv'
+FACILITY_DATA_PATH = './Data/Raw Data/srv_ifmd_all-facilities.xlsx'
+FACILITY_SHEET = 'wholeIFMD'
+OUTPUT_NAME = 'filtered_facility_data'
+OUTPUT_PATH = processed_path(OUTPUT_NAME)
 
-# Postcodes to filter
-POSTCODES_TO_FILTER = [3052, 3054, 3053, 3051, 3031, 3003, 3008, 3006, 3141, 3002, 3000]
+# Workbook columns to keep, and their names in the processed data
+FACILITY_COLUMNS = {
+    'Facility ID': 'facility_id',
+    'Facility Name': 'facility_name',
+    'Suburb/Town': 'suburb',
+    'Pcode': 'postcode',
+    'Latitude': 'latitude',
+    'Longitude': 'longitude',
+    'Sports Played': 'sports_played',
+}
 
 def prepare_facility_data():
-    # Load raw facility data
-    df = pd.read_csv(FACILITY_DATA_PATH)
+    # Stream the facility sheet, keeping only the in-scope postcodes
+    df = ingest_sheet(
+        FACILITY_DATA_PATH, FACILITY_SHEET, FACILITY_COLUMNS,
+        postcode_column='Pcode', postcodes=load_suburb_dimension().postcodes, numeric_columns=['latitude', 'longitude'],
+    )
 
-    # Filter and clean data
-    df['pcode'] = df['pcode'].astype(str).str.replace('.0', '', regex=False).astype(int)
-    filtered_df = df[df['pcode'].isin(POSTCODES_TO_FILTER)]
+    # The sheet has one row per facility and sport; combine them into one row per facility
+    df['suburb'] = df['suburb'].str.strip().str.title()
+    df = df.dropna(subset=['sports_played'])
+    df = df[df['sports_played'].str.strip() != '']
+    filtered_df = (
+        df.groupby(['facility_id', 'facility_name', 'suburb', 'postcode', 'latitude', 'longitude'], observed=True)['sports_played']
+        .agg(lambda sports: ', '.join(sorted(set(sports))))
+        .reset_index()
+    )
 
-    # Save filtered data
-    filtered_df.to_csv(OUTPUT_PATH, index=False)
+    # Save filtered data as Parquet
+    write_processed(filtered_df, OUTPUT_NAME)
     print(f"Filtered facility data saved to {OUTPUT_PATH}")
 
 if __name__ == '__main__':
@@ -1,37 +1,30 @@
 import pandas as pd
-from geopy.geocoders import Nominatim
+from processed_store import processed_path, write_processed
+from offline_geocoder import OfflineReverseGeocoder, CachedRemoteGeocoder, REFERENCE_POINTS_PATH
 
 # Paths
 PLAYGROUND_DATA_PATH = './Data/Raw Data/playground_data.csv'
-OUTPUT_PATH = './Data/Processed Data/filtered_playground_data.csv'
-
-def get_location_info(latitude, longitude):
-    """
-    Fetch suburb name and postcode for gi   ven latitude and longitude using geopy.
-    """
-    geolocator = Nominatim(user_agent="geoapiExercises")
-    try:
-        location = geolocator.reverse((latitude, longitude), exactly_one=True, timeout=10)
-        address = location.raw['address']
-        suburb = address.get('suburb', '')
-        postcode = address.get('postcode', '')
-        return suburb, postcode
-    except Exception as e:
-        print(f"Error fetching location for lat: {latitude}, long: {longitude}. Error: {e}")
-        return '', ''
+OUTPUT_NAME = 'filtered_playground_data'
+OUTPUT_PATH = processed_path(OUTPUT_NAME)
 
 def prepare_playground_data():
     """
     Prepares playground data by enriching it with suburb names and postcodes.
+
+    Suburbs are assigned offline from the reference points built from facility
+    and landmark data (offline_geocoder.build_reference_points). Points outside
+    their coverage go to Nominatim (with a local result cache) only when
+    NOMINATIM_USER_AGENT is set.
     """
     # Load raw playground data
     df = pd.read_csv(PLAYGROUND_DATA_PATH)
 
     # Add new columns for suburb_name and postcode
-    df['suburb_name'], df['postcode'] = zip(*df.apply(lambda row: get_location_info(row['latitude'], row['longitude']), axis=1))
+    geocoder = OfflineReverseGeocoder.from_csv(REFERENCE_POINTS_PATH, remote=CachedRemoteGeocoder.from_env())
+    df['suburb_name'], df['postcode'] = geocoder.reverse(df['latitude'], df['longitude'])
 
-    # Save the processed data
-    df.to_csv(OUTPUT_PATH, index=False)
+    # Save the processed data as Parquet
+    write_processed(df, OUTPUT_NAME)
     print(f"Processed playground data saved to {OUTPUT_PATH}")
 
 if __name__ == '__main__':
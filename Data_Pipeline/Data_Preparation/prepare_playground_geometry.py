@@ -0,0 +1,194 @@
+import csv
+import json
+import os
+import sqlite3
+import struct
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'Database'))
+from initialise_database import create_indexes, create_tables, staged_database  # noqa: E402
+
+# Paths
+PLAYGROUND_SHAPES_PATH = './Data/Raw Data/playgrounds.csv'
+DATABASE_PATH = './Data_Pipeline/ILikeToMoveIt.db'
+
+# Tables written here, as declared in Database/initialise_database.py
+OUTLINE_TABLES = ['Playground_Outline', 'Playground_Outline_Level', 'Playground_Outline_Bounds']
+
+# Simplification tolerance in metres for each level of detail (level 0 keeps every vertex)
+LEVEL_TOLERANCES_M = [0, 1, 5, 20]
+
+# Metres per degree of latitude
+METRES_PER_DEGREE = 111_200
+
+# The Geo Shape column holds GeoJSON strings larger than the csv module's default field limit
+csv.field_size_limit(sys.maxsize)
+
+
+def parse_multipolygon(geo_shape):
+    """
+    Parse a GeoJSON Polygon or MultiPolygon string into a list of polygons, each
+    a list of (n, 2) arrays of [longitude, latitude] rings.
+    """
+    shape = json.loads(geo_shape)
+    polygons = shape['coordinates'] if shape['type'] == 'MultiPolygon' else [shape['coordinates']]
+    return [[np.asarray(ring, dtype=np.float64) for ring in polygon] for polygon in polygons]
+
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplify a closed ring with the Douglas-Peucker algorithm.
+
+    `ring` must already be in a local metric projection; the distance test is
+    vectorised over each segment's vertices. Rings that would collapse below four
+    vertices keep four evenly spaced ones.
+    """
+    count = len(ring)
+    if tolerance <= 0 or count <= 4:
+        return ring
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = ring[start], ring[end]
+        points = ring[start + 1:end]
+        segment = b - a
+        length = np.hypot(*segment)
+        if length == 0:
+            distance = np.hypot(*(points - a).T)
+        else:
+            distance = np.abs(segment[0] * (points[:, 1] - a[1]) - segment[1] * (points[:, 0] - a[0])) / length
+        farthest = int(distance.argmax())
+        if distance[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    if keep.sum() < 4:
+        keep[np.linspace(0, count - 1, 4).astype(int)] = True
+    return ring[keep]
+
+
+def pack_geometry(polygons):
+    """
+    Pack polygons into a compact little-endian binary blob:
+
+        uint32 polygon_count
+        uint32 ring_count[polygon_count]
+        uint32 vertex_count[total_rings]
+        float32 coordinates[total_vertices * 2]   (longitude, latitude offsets from the centroid)
+
+    The backend decodes this format in `route_handlers/parks/park_outlines.py`.
+    """
+    rings = [ring for polygon in polygons for ring in polygon]
+    header = struct.pack(
+        f'<I{len(polygons)}I{len(rings)}I',
+        len(polygons), *[len(polygon) for polygon in polygons], *[len(ring) for ring in rings],
+    )
+    coordinates = np.concatenate(rings).astype('<f4') if rings else np.empty(0, dtype='<f4')
+    return header + coordinates.tobytes()
+
+
+def build_levels(polygons, centroid):
+    """
+    Simplify a shape at every level of detail.
+
+    Returns:
+    - list: (level, vertex_count, packed blob) for each level.
+    """
+    scale = np.array([METRES_PER_DEGREE * np.cos(np.radians(centroid[1])), METRES_PER_DEGREE])
+    local = [[(ring - centroid) * scale for ring in polygon] for polygon in polygons]
+
+    levels = []
+    for level, tolerance in enumerate(LEVEL_TOLERANCES_M):
+        simplified = [[simplify_ring(ring, tolerance) / scale for ring in polygon] for polygon in local]
+        # Holes that collapse to a sliver are dropped at coarser levels
+        simplified = [[polygon[0]] + [hole for hole in polygon[1:] if level == 0 or len(hole) > 4] for polygon in simplified]
+        vertex_count = sum(len(ring) for polygon in simplified for ring in polygon)
+        levels.append((level, vertex_count, pack_geometry(simplified)))
+    return levels
+
+
+def write_outlines(cursor, shapes_path=PLAYGROUND_SHAPES_PATH):
+    """
+    Parse each playground's Geo Shape once, and store its centroid, bounding box
+    (also in an R*Tree, for map viewport queries) and simplified outlines at
+    every level of detail, replacing any outlines already stored.
+
+    Playgrounds are matched to the location IDs in the Playground table read
+    through the same cursor, so within a load they match the rows just loaded.
+    Rows are streamed from the CSV, so only one raw GeoJSON string is held in
+    memory at a time. Nothing is committed.
+
+    Parameters:
+    - cursor (sqlite3.Cursor): Cursor on the database being built.
+    - shapes_path (str): Raw playgrounds CSV with name and Geo Shape columns.
+    """
+    create_tables(cursor, OUTLINE_TABLES)
+    create_indexes(cursor, OUTLINE_TABLES)
+    cursor.execute("DELETE FROM Playground_Outline_Level")
+    cursor.execute("DELETE FROM Playground_Outline_Bounds")
+    cursor.execute("DELETE FROM Playground_Outline")
+
+    try:
+        cursor.execute("SELECT playground_name, location_id FROM Playground")
+        location_ids = dict(cursor.fetchall())
+    except sqlite3.OperationalError:
+        location_ids = {}
+
+    outline_count = raw_bytes = packed_bytes = 0
+    with open(shapes_path, newline='', encoding='utf-8-sig') as csv_file:
+        for outline_id, row in enumerate(csv.DictReader(csv_file), start=1):
+            raw_bytes += len(row['Geo Shape'])
+            polygons = parse_multipolygon(row['Geo Shape'])
+            vertices = np.concatenate([ring for polygon in polygons for ring in polygon])
+            min_lon, min_lat = vertices.min(axis=0)
+            max_lon, max_lat = vertices.max(axis=0)
+            centroid = vertices[:-1].mean(axis=0) if len(vertices) > 1 else vertices[0]
+
+            cursor.execute(
+                "INSERT INTO Playground_Outline VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (outline_id, row['name'], location_ids.get(row['name']), centroid[1], centroid[0],
+                 min_lat, min_lon, max_lat, max_lon),
+            )
+            cursor.execute(
+                "INSERT INTO Playground_Outline_Bounds VALUES (?, ?, ?, ?, ?)",
+                (outline_id, min_lon, max_lon, min_lat, max_lat),
+            )
+            for level, vertex_count, blob in build_levels(polygons, centroid):
+                cursor.execute(
+                    "INSERT INTO Playground_Outline_Level VALUES (?, ?, ?, ?)",
+                    (outline_id, level, vertex_count, blob),
+                )
+                packed_bytes += len(blob)
+            outline_count += 1
+
+    # Refresh the planner statistics for the rewritten tables
+    for table in ['Playground_Outline', 'Playground_Outline_Level']:
+        cursor.execute(f'ANALYZE {table}')
+
+    print(f"Stored {outline_count} playground outlines "
+          f"({raw_bytes:,} bytes of GeoJSON packed into {packed_bytes:,} bytes across {len(LEVEL_TOLERANCES_M)} levels)")
+
+
+def prepare_playground_geometry(shapes_path=PLAYGROUND_SHAPES_PATH, database_path=DATABASE_PATH):
+    """
+    Rebuild only the playground outlines of a database, in a staged copy that
+    then replaces it. The pipeline builds them as part of the transfer instead.
+    """
+    with staged_database(database_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        write_outlines(cursor, shapes_path)
+        cursor.execute('COMMIT')
+    print(f"Swapped the new playground outlines into {database_path}")
+
+
+if __name__ == '__main__':
+    prepare_playground_geometry(database_path=sys.argv[1] if len(sys.argv) > 1 else DATABASE_PATH)
@@ -0,0 +1,120 @@
+import os
+import sys
+import pandas as pd
+
+# Processed datasets are stored as Parquet files named after the dataset
+PROCESSED_DATA_DIR = './Data/Processed Data'
+
+# Explicit column types for each processed dataset. Columns not listed keep the
+# type pandas gives them. Postcodes are stored as strings ('3052'), never floats.
+SCHEMAS = {
+    'filtered_accident_data': {
+        'postcode': 'postcode', 'total_accidents': 'int64', 'total_severity': 'int64',
+        'severity_level': 'int64', 'accidents_id': 'int64',
+    },
+    'filtered_accidents_by_suburb': {'total_accidents': 'int64', 'suburb_id': 'int64'},
+    'filtered_crime_data': {'suburb': 'category', 'postcode': 'postcode', 'incidents_recorded_2014_2023': 'int64'},
+    'filtered_crime_data_by_suburb': {
+        'suburb': 'category', 'postcode': 'postcode', 'incidents_recorded_2014_2023': 'int64', 'suburb_id': 'int64',
+    },
+    'filtered_crime_data_by_year': {
+        'suburb_id': 'int64', 'suburb': 'category', 'postcode': 'postcode', 'year': 'int64', 'incidents_recorded': 'int64',
+    },
+    'filtered_facility_data': {
+        'facility_id': 'string', 'facility_name': 'string', 'suburb': 'category', 'postcode': 'postcode',
+        'latitude': 'float64', 'longitude': 'float64', 'sports_played': 'category',
+    },
+    'filtered_landmark_data': {
+        'latitude': 'float64', 'longitude': 'float64', 'landmark_name': 'string', 'landmark_type': 'category',
+        'landmark_id': 'int64', 'suburb': 'category', 'postcode': 'postcode',
+    },
+    'filtered_playground_data': {
+        'latitude': 'float64', 'longitude': 'float64', 'playground_name': 'string', 'playground_id': 'int64',
+        'suburb': 'category', 'suburb_name': 'category', 'postcode': 'postcode',
+    },
+    'suburb_dimension': {
+        'suburb_id': 'int64', 'postcode': 'postcode', 'suburb': 'category', 'suburb_key': 'string', 'in_scope': 'bool',
+    },
+}
+
+
+def processed_path(name, extension='parquet'):
+    """Path of a processed dataset file."""
+    return os.path.join(PROCESSED_DATA_DIR, f'{name}.{extension}')
+
+
+def postcode_strings(values):
+    """
+    Normalise postcodes read as ints, floats ('3052.0') or strings to categorical
+    four-digit strings, with missing values left as NaN.
+    """
+    numeric = pd.to_numeric(pd.Series(values), errors='coerce').astype('Int64')
+    return numeric.astype('string').astype('category')
+
+
+def apply_schema(df, name):
+    """Cast the columns of a dataset to the types in its schema."""
+    for column, dtype in SCHEMAS.get(name, {}).items():
+        if column not in df.columns:
+            continue
+        if dtype == 'postcode':
+            df[column] = postcode_strings(df[column])
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def write_processed(df, name, export_csv=False):
+    """
+    Save a processed dataset as Parquet with its schema applied.
+
+    Parameters:
+    - df (DataFrame): Dataset to save.
+    - name (str): Dataset name, e.g. 'filtered_facility_data'.
+    - export_csv (bool): Also write a CSV copy for reading by hand.
+
+    Returns:
+    - str: Path of the Parquet file.
+    """
+    path = processed_path(name)
+    df = apply_schema(df.copy(), name)
+    df.to_parquet(path, engine='pyarrow', index=False)
+    if export_csv:
+        df.to_csv(processed_path(name, 'csv'), index=False)
+    return path
+
+
+def read_processed(name, columns=None):
+    """
+    Load a processed dataset, reading only the requested columns from disk.
+
+    Parameters:
+    - name (str): Dataset name.
+    - columns (list): Columns to load; all columns if None.
+
+    Returns:
+    - DataFrame: The dataset, with categorical and string columns as stored.
+    """
+    return pd.read_parquet(processed_path(name), engine='pyarrow', columns=columns)
+
+
+def export_csv(name):
+    """Write the CSV copy of a processed dataset."""
+    path = processed_path(name, 'csv')
+    read_processed(name).to_csv(path, index=False)
+    return path
+
+
+def convert_csv(name):
+    """Convert a processed CSV into its Parquet form, applying the dataset schema."""
+    return write_processed(pd.read_csv(processed_path(name, 'csv')), name)
+
+
+if __name__ == '__main__':
+    # Usage: processed_store.py convert|export [dataset ...]
+    # 'convert' turns processed CSVs into Parquet; 'export' writes CSV copies of Parquet datasets.
+    action = sys.argv[1] if len(sys.argv) > 1 else 'convert'
+    source_extension, handler = ('csv', convert_csv) if action == 'convert' else ('parquet', export_csv)
+    names = sys.argv[2:] or [name for name in SCHEMAS if os.path.exists(processed_path(name, source_extension))]
+    for name in names:
+        print(f"Wrote {handler(name)}")
@@ -0,0 +1,166 @@
+import sqlite3
+import numpy as np
+import pandas as pd
+from processed_store import postcode_strings, processed_path, read_processed, write_processed
+
+# Paths
+VICTORIA_POSTCODES_PATH = './Data/Raw Data/Victoria-Postcodes.csv'
+SUBURBS_INFO_DATABASE_PATH = './Database/ILikeToMoveIt.db'
+SUBURB_DIMENSION_NAME = 'suburb_dimension'
+SUBURB_DIMENSION_PATH = processed_path(SUBURB_DIMENSION_NAME)
+
+# Suburbs the pipeline keeps: 'app' for the suburbs in the Suburbs_info table,
+# or 'victoria' for every suburb in Victoria-Postcodes.csv
+SUBURB_SCOPE = 'app'
+
+# Suburbs_info names that differ from the gazetted names in Victoria-Postcodes.csv
+SUBURB_NAME_ALIASES = {'Melbourne CBD': 'Melbourne', 'Princess Hill': 'Princes Hill'}
+
+
+def suburb_keys(suburbs):
+    """Normalise suburb names for matching: trimmed and upper case."""
+    return pd.Series(suburbs).astype('string').str.strip().str.upper()
+
+
+def build_suburb_dimension(scope=SUBURB_SCOPE):
+    """
+    Build the suburb dimension: one row per (postcode, suburb name) that may
+    appear in the data, with the suburb's ID and whether it is in scope.
+
+    Suburbs in the Suburbs_info table keep their IDs, and are listed under both
+    their own and their gazetted names. Other Victorian suburbs get IDs after
+    the highest Suburbs_info ID, in postcode and name order.
+
+    Returns:
+    - DataFrame: suburb_id, postcode, suburb (display name), suburb_key and in_scope.
+    """
+    with sqlite3.connect(SUBURBS_INFO_DATABASE_PATH) as conn:
+        app_suburbs = pd.read_sql_query("SELECT suburb_id, suburb_name AS suburb, postcode FROM Suburbs_info", conn)
+    app_suburbs['postcode'] = postcode_strings(app_suburbs['postcode']).astype(str)
+    app_suburbs['suburb_key'] = suburb_keys(app_suburbs['suburb'])
+    aliases = app_suburbs.assign(suburb_key=suburb_keys(app_suburbs['suburb'].map(SUBURB_NAME_ALIASES)))
+    aliases = aliases.dropna(subset=['suburb_key'])
+
+    victoria = pd.read_csv(VICTORIA_POSTCODES_PATH)
+    victoria['postcode'] = postcode_strings(victoria['postcode']).astype(str)
+    victoria['suburb_key'] = suburb_keys(victoria['suburb'])
+    victoria['suburb'] = victoria['suburb'].str.title()
+    known_keys = set(zip(app_suburbs['postcode'], app_suburbs['suburb_key'])) | set(zip(aliases['postcode'], aliases['suburb_key']))
+    others = victoria[[key not in known_keys for key in zip(victoria['postcode'], victoria['suburb_key'])]]
+    others = others.drop_duplicates(['postcode', 'suburb_key']).sort_values(['postcode', 'suburb_key'])
+    others = others.assign(suburb_id=np.arange(len(others)) + int(app_suburbs['suburb_id'].max()) + 1)
+
+    dimension = pd.concat([
+        app_suburbs.assign(in_scope=True),
+        aliases.assign(in_scope=True),
+        others.assign(in_scope=scope == 'victoria'),
+    ], ignore_index=True)
+    return dimension[['suburb_id', 'postcode', 'suburb', 'suburb_key', 'in_scope']].reset_index(drop=True)
+
+
+def postcode_numbers(values):
+    """
+    Parse postcodes to integers (-1 where missing or invalid), converting each
+    distinct value only once.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    return np.where(codes >= 0, numbers[codes], -1) if len(numbers) else np.full(len(codes), -1, dtype=np.int64)
+
+
+class SuburbDimension:
+    """
+    Vectorised suburb and postcode lookups shared by the preparation stages.
+
+    Each (postcode, suburb) pair in the dimension is encoded as one integer key,
+    kept in a sorted array. Lookups factorise the input columns, normalise each
+    distinct name once, and binary-search the keys, so mapping a column costs
+    the same however many suburbs are in scope.
+    """
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True)
+        self.name_index = pd.Index(self.table['suburb_key'].astype(str).unique())
+        self.name_count = len(self.name_index)
+        keys = postcode_numbers(self.table['postcode']) * self.name_count + self.name_index.get_indexer(self.table['suburb_key'].astype(str))
+        self.key_order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.key_order]
+        self.ids = self.table['suburb_id'].to_numpy()
+        self.in_scope = self.table['in_scope'].to_numpy(dtype=bool)
+
+        suburbs = self.table[self.in_scope].drop_duplicates('suburb_id')
+        self.suburbs = suburbs[['suburb_id', 'postcode', 'suburb']].reset_index(drop=True)
+        self.postcodes = sorted(suburbs['postcode'].unique())
+        self.postcode_numbers = np.array(sorted({int(postcode) for postcode in self.postcodes}), dtype=np.int64)
+
+    def _rows(self, postcodes, suburbs):
+        """Row of the dimension table matching each (postcode, suburb) pair, or -1."""
+        postcode = postcode_numbers(postcodes)
+        name_codes, names = pd.factorize(pd.Series(suburbs))
+        name_rows = self.name_index.get_indexer(suburb_keys(names).astype(str)) if len(names) else np.empty(0, dtype=np.int64)
+        name = np.where(name_codes >= 0, name_rows[name_codes] if len(name_rows) else -1, -1)
+
+        keys = postcode * self.name_count + name
+        position = np.minimum(np.searchsorted(self.sorted_keys, keys), len(self.sorted_keys) - 1)
+        found = (postcode >= 0) & (name >= 0) & (self.sorted_keys[position] == keys)
+        return np.where(found, self.key_order[position], -1)
+
+    def suburb_ids(self, postcodes, suburbs, in_scope_only=True):
+        """
+        Map postcode and suburb name columns to suburb IDs.
+
+        Returns:
+        - Series: Suburb ID per row (Int64), missing for unknown or out-of-scope suburbs.
+        """
+        rows = self._rows(postcodes, suburbs)
+        found = rows >= 0
+        if in_scope_only:
+            found &= self.in_scope[rows]
+        return pd.Series(np.where(found, self.ids[rows], 0), dtype='Int64').mask(~found)
+
+    def is_known(self, postcodes, suburbs):
+        """Boolean array: whether each (postcode, suburb) pair exists in Victoria."""
+        return self._rows(postcodes, suburbs) >= 0
+
+    def in_scope_postcodes(self, postcodes):
+        """Boolean array: whether each postcode belongs to an in-scope suburb."""
+        return np.isin(postcode_numbers(postcodes), self.postcode_numbers)
+
+    def expand_postcodes(self, df, postcode_column='postcode'):
+        """
+        Attach suburb_id and suburb to rows keyed only by postcode, repeating a
+        row for each in-scope suburb sharing its postcode. Rows for other
+        postcodes are dropped.
+        """
+        df = df.assign(**{postcode_column: postcode_strings(df[postcode_column]).astype(str)})
+        suburbs = self.suburbs.rename(columns={'postcode': postcode_column})
+        return df.merge(suburbs, on=postcode_column, how='inner')
+
+
+def prepare_suburb_dimension():
+    """Build the suburb dimension and save it as a processed dataset."""
+    dimension = build_suburb_dimension()
+    write_processed(dimension, SUBURB_DIMENSION_NAME)
+    print(f"Suburb dimension saved to {SUBURB_DIMENSION_PATH} "
+          f"({dimension['suburb_id'].nunique()} suburbs, {int(dimension.drop_duplicates('suburb_id')['in_scope'].sum())} in scope)")
+
+
+# Loaded once per process by load_suburb_dimension
+suburb_dimension = None
+
+
+def load_suburb_dimension():
+    """Return the shared suburb dimension, from the processed dataset if it has been built."""
+    global suburb_dimension
+    if suburb_dimension is None:
+        try:
+            table = read_processed(SUBURB_DIMENSION_NAME)
+            table['postcode'] = table['postcode'].astype(str)
+            table['suburb_key'] = table['suburb_key'].astype('string')
+        except FileNotFoundError:
+            table = build_suburb_dimension()
+        suburb_dimension = SuburbDimension(table)
+    return suburb_dimension
+
+
+if __name__ == '__main__':
+    prepare_suburb_dimension()
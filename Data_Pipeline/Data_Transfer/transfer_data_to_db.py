@@ -1,53 +1,182 @@
+import os
+import sys
+import time
 import pandas as pd
-import sqlite3
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(REPOSITORY_DIR, 'Data_Pipeline', 'Data_Preparation'), os.path.join(REPOSITORY_DIR, 'Database')]
+from processed_store import processed_path, read_processed  # noqa: E402
+from suburb_dimension import SUBURB_DIMENSION_PATH, load_suburb_dimension  # noqa: E402
+from initialise_database import create_indexes, create_tables, staged_database  # noqa: E402
+from prepare_playground_geometry import PLAYGROUND_SHAPES_PATH, write_outlines  # noqa: E402
 
 # Database path
 DATABASE_PATH = './Data_Pipeline/ILikeToMoveIt.db'
 
-# Paths to processed CSV files
-PLAYGROUND_DATA_PATH = './Data/Processed Data/filtered_playground_data.csv'
-FACILITY_DATA_PATH = './Data/Processed Data/filtered_facility_data.csv'
-CRIME_DATA_PATH = './Data/Processed Data/filtered_crime_data_by_suburb.csv'
-ACCIDENT_DATA_PATH = './Data/Processed Data/filtered_accident_by_suburb.csv'
-LANDMARK_DATA_PATH = './Data/Processed Data/filtered_landmark_data.csv'
-
-
-def transfer_data_to_db():
-    # Connect to the SQLite database
-    conn = sqlite3.connect(DATABASE_PATH)
-
-    # 1. Transfer filtered_playground_data to Playground table
-    playground_data = pd.read_csv(PLAYGROUND_DATA_PATH)
-    playground_data.to_sql('Playground', conn, if_exists='replace', index=False)
-    print("Playground data transferred.")
-
-    # 2. Transfer filtered_facility_data to Facility table
-    facility_data = pd.read_csv(FACILITY_DATA_PATH)
-    facility_data.to_sql('Facility', conn, if_exists='replace', index=False)
-    print("Facility data transferred.")
-
-    # 3. Transfer filtered_crime_data_by_suburb to Crime table
-    crime_data = pd.read_csv(CRIME_DATA_PATH)
-    crime_data = crime_data.rename(columns={'suburb_id': 'suburb_id'})
-    crime_data[['crime_id', 'incidents_recorded_2014_2023', 'suburb_id']].to_sql(
-        'Crime', conn, if_exists='replace', index=False
-    )
-    print("Crime data transferred.")
-
-    # 4. Transfer filtered_accident_by_suburb to Accident table
-    accident_data = pd.read_csv(ACCIDENT_DATA_PATH)
-    accident_data.to_sql('Accident', conn, if_exists='replace', index=False)
-    print("Accident data transferred.")
-
-    # 5. Transfer filtered_landmark_data to Landmark table
-    landmark_data = pd.read_csv(LANDMARK_DATA_PATH)
-    landmark_data.to_sql('Landmark', conn, if_exists='replace', index=False)
-    print("Landmark data transferred.")
-
-    # Close connection
-    conn.close()
+# The declared schema the tables are created from
+SCHEMA_PATH = './Database/initialise_database.py'
+
+# The outlines are built in the same load, so a change to how they are built reloads the database
+OUTLINE_SOURCE_PATH = './Data_Pipeline/Data_Preparation/prepare_playground_geometry.py'
+
+# Processed dataset loaded into each table; each is written by a preparation
+# stage, except the landmarks, which are curated by hand
+TABLE_DATASETS = {
+    'Facility': 'filtered_facility_data',
+    'Landmark': 'filtered_landmark_data',
+    'Playground': 'filtered_playground_data',
+    'Crime': 'filtered_crime_data_by_suburb',
+    'Accident': 'filtered_accidents_by_suburb',
+}
+PLAYGROUND_DATA_PATH = processed_path(TABLE_DATASETS['Playground'])
+FACILITY_DATA_PATH = processed_path(TABLE_DATASETS['Facility'])
+CRIME_DATA_PATH = processed_path(TABLE_DATASETS['Crime'])
+ACCIDENT_DATA_PATH = processed_path(TABLE_DATASETS['Accident'])
+LANDMARK_DATA_PATH = processed_path(TABLE_DATASETS['Landmark'])
+
+# Nothing reads the staging database until it is swapped in, and a failed load
+# is discarded, so durability is only needed once, just before the swap
+BULK_LOAD_PRAGMAS = [
+    'PRAGMA journal_mode = MEMORY',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -262144',
+    'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA foreign_keys = OFF',
+]
+
+# Point datasets that get a row in the Location table, in location_id order
+LOCATED_TABLES = ['Facility', 'Landmark', 'Playground']
+
+
+def load_datasets():
+    """
+    Read the processed datasets, keyed by the table each one is loaded into.
+    Facilities, landmarks and playgrounds are given location IDs, and the
+    Location table is built from their coordinates.
+    """
+    datasets = {table: read_processed(name) for table, name in TABLE_DATASETS.items()}
+    datasets['Location'] = assign_locations(datasets)
+    return datasets
+
+
+def assign_locations(datasets):
+    """
+    Number the rows of the located datasets consecutively, adding a location_id
+    column to each, and return the matching Location rows.
+    """
+    dimension = load_suburb_dimension()
+    locations = []
+    next_id = 1
+    for table in LOCATED_TABLES:
+        df = datasets[table]
+        suburbs = df['suburb'] if 'suburb' in df else df['suburb_name']
+        df['location_id'] = range(next_id, next_id + len(df))
+        next_id += len(df)
+        locations.append(pd.DataFrame({
+            'location_id': df['location_id'],
+            'postcode': df['postcode'].astype(str),
+            'latitude': df['latitude'],
+            'longitude': df['longitude'],
+            'suburb_id': dimension.suburb_ids(df['postcode'], suburbs).to_numpy(),
+        }))
+    return pd.concat(locations, ignore_index=True)
+
+
+def column_values(series):
+    """A column as a list of plain Python values, with None for missing values."""
+    if series.hasnans:
+        series = series.astype(object).where(series.notna(), None)
+    return series.tolist()
+
+
+def table_rows(cursor, table, df):
+    """
+    Select the table's declared columns from `df`, as tuples of plain Python
+    values ready for executemany. A missing single-column primary key is
+    numbered from 1; other missing columns are left NULL.
+
+    Returns:
+    - tuple: (column names, row iterator)
+    """
+    declared = cursor.execute(f'PRAGMA table_info({table})').fetchall()
+    columns = [column[1] for column in declared]
+    types = {column[1]: column[2].upper() for column in declared}
+    primary_keys = [column[1] for column in declared if column[5]]
+    values = []
+    for column in columns:
+        if column in df:
+            values.append(column_values(df[column]))
+        elif primary_keys == [column]:
+            keys = range(1, len(df) + 1)
+            values.append([str(key) for key in keys] if types[column] == 'TEXT' else list(keys))
+        else:
+            print(f"{table}: no data for column '{column}', leaving it NULL")
+            values.append([None] * len(df))
+    return columns, zip(*values)
+
+
+def bulk_insert(cursor, table, df):
+    """Insert `df` into `table` with one executemany. Returns the number of rows."""
+    columns, rows = table_rows(cursor, table, df)
+    placeholders = ', '.join('?' * len(columns))
+    cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return len(df)
+
+
+def load_database(datasets, database_path=DATABASE_PATH, build_steps=()):
+    """
+    Replace the given tables of the database with `datasets` ({table: DataFrame}).
+
+    The current database is copied to a staging file, and the tables are
+    recreated there from the declared schema and filled in one transaction,
+    with their indexes and planner statistics built after the rows are in.
+    The staging file then replaces the database, so readers never see a
+    partial load. Tables not in `datasets` are kept as they are.
+
+    Parameters:
+    - datasets (dict): Table name to DataFrame.
+    - database_path (str): Database to replace.
+    - build_steps (iterable): Functions called with the cursor once the tables
+      are filled, in the same transaction, to build tables derived from them.
+
+    Returns:
+    - dict: Rows loaded per table.
+    """
+    counts = {}
+    with staged_database(database_path, BULK_LOAD_PRAGMAS) as conn:
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        cursor.execute('BEGIN')
+        create_tables(cursor)
+        for table, df in datasets.items():
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            create_tables(cursor, [table])
+            table_started = time.perf_counter()
+            counts[table] = bulk_insert(cursor, table, df)
+            elapsed = time.perf_counter() - table_started
+            print(f"{table}: {counts[table]:,} rows in {elapsed:.2f} s ({counts[table] / max(elapsed, 1e-9):,.0f} rows/s)")
+        for build_step in build_steps:
+            build_step(cursor)
+
+        index_started = time.perf_counter()
+        create_indexes(cursor, list(datasets))
+        cursor.execute('ANALYZE')
+        index_elapsed = time.perf_counter() - index_started
+        cursor.execute('COMMIT')
+        elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    print(f"Loaded {total:,} rows in {elapsed:.2f} s ({total / max(elapsed, 1e-9):,.0f} rows/s, "
+          f"indexes and statistics {index_elapsed:.2f} s) and swapped into {database_path}")
+    return counts
+
+
+def transfer_data_to_db(database_path=DATABASE_PATH):
+    # Outlines are matched to the new Playground rows' location IDs before the swap
+    load_database(load_datasets(), database_path, [write_outlines])
     print("All data transferred successfully to the database!")
 
 
 if __name__ == '__main__':
-    transfer_data_to_db()
+    transfer_data_to_db(sys.argv[1] if len(sys.argv) > 1 else DATABASE_PATH)
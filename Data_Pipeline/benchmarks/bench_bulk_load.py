@@ -0,0 +1,103 @@
+"""
+Compare loading synthetic tables with DataFrame.to_sql(if_exists='replace'),
+as the transfer used to, and with to_sql appending into the declared schema,
+against the staged bulk loader: rows per second, and whether the declared
+schema survives.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_bulk_load.py [--rows 1000000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PIPELINE_DIR, 'Data_Transfer'))
+from transfer_data_to_db import load_database  # noqa: E402
+from initialise_database import create_database, create_indexes  # noqa: E402
+
+
+def synthetic_tables(rows, seed=0):
+    """Location, Facility and Crime tables with `rows` locations."""
+    rng = np.random.default_rng(seed)
+    suburb_ids = rng.integers(1, 3000, rows)
+    return {
+        'Location': pd.DataFrame({
+            'location_id': np.arange(1, rows + 1),
+            'postcode': (3000 + suburb_ids % 1000).astype(str),
+            'latitude': rng.uniform(-39, -34, rows),
+            'longitude': rng.uniform(141, 150, rows),
+            'suburb_id': suburb_ids,
+        }),
+        'Facility': pd.DataFrame({
+            'facility_id': [f'FAC{i}' for i in range(rows)],
+            'facility_name': rng.choice(['Community Centre', 'Aquatic Centre', 'Tennis Club', 'Reserve'], rows),
+            'sports_played': rng.choice(['Tennis', 'Swimming', 'Football', None], rows),
+            'location_id': np.arange(1, rows + 1),
+        }),
+        'Crime': pd.DataFrame({
+            'crime_id': np.arange(1, 3000).astype(str),
+            'incidents_recorded_2014_2023': rng.integers(0, 20000, 2999),
+            'suburb_id': np.arange(1, 3000),
+        }),
+    }
+
+
+def to_sql_replace(tables, path):
+    conn = sqlite3.connect(path)
+    for table, df in tables.items():
+        df.to_sql(table, conn, if_exists='replace', index=False)
+    conn.close()
+
+
+def to_sql_append(tables, path):
+    """Keep the schema by emptying the tables and appending, with the indexes in place."""
+    conn = sqlite3.connect(path)
+    create_indexes(conn.cursor())
+    for table, df in tables.items():
+        conn.execute(f'DELETE FROM {table}')
+        df.to_sql(table, conn, if_exists='append', index=False)
+    conn.commit()
+    conn.close()
+
+
+def staged(tables, path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        load_database(tables, path)
+
+
+def schema_kept(path):
+    """Whether the Location table still has its declared primary key."""
+    with sqlite3.connect(path) as conn:
+        return any(column[5] for column in conn.execute('PRAGMA table_info(Location)'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    tables = synthetic_tables(args.rows)
+    total = sum(len(df) for df in tables.values())
+    print(f"{total:,} rows over {len(tables)} tables")
+    print(f"{'Method':<22} {'Time (s)':>9} {'Rows/s':>11} {'Schema kept':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, func in [('to_sql replace', to_sql_replace), ('to_sql append', to_sql_append), ('staged bulk load', staged)]:
+            path = os.path.join(workdir, f"{label.replace(' ', '_')}.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_database(path)
+            started = time.perf_counter()
+            func(tables, path)
+            elapsed = time.perf_counter() - started
+            print(f"{label:<22} {elapsed:>9.2f} {total / elapsed:>11,.0f} {str(schema_kept(path)):>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare the chunked crime aggregation with loading the whole file and grouping
+it, on a synthetic statewide multi-year incident table: time and peak RSS,
+each measured in a fresh process, and a check that both agree.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_crime_aggregation.py [--rows 5000000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PIPELINE_DIR, os.path.join(PIPELINE_DIR, 'Data_Preparation')]
+from run_pipeline import peak_rss_mb  # noqa: E402
+from prepare_crime_data import aggregate_crime_chunks  # noqa: E402
+
+VICTORIA_POSTCODES_PATH = './Data/Raw Data/Victoria-Postcodes.csv'
+
+# The inner-Melbourne postcodes the app covers
+TARGET_POSTCODES = ['3000', '3002', '3003', '3004', '3006', '3008', '3031', '3051', '3052', '3053', '3054', '3141', '3207', '3065']
+
+
+def write_statewide_crime(path, rows, seed=0):
+    """Random incident rows over every Victorian suburb and the years 2014-2023."""
+    rng = np.random.default_rng(seed)
+    suburbs = pd.read_csv(VICTORIA_POSTCODES_PATH)
+    batch = 1_000_000
+    for start in range(0, rows, batch):
+        count = min(batch, rows - start)
+        pick = rng.integers(0, len(suburbs), count)
+        pd.DataFrame({
+            'year': rng.integers(2014, 2024, count),
+            'suburb': suburbs['suburb'].str.title().to_numpy()[pick],
+            'postcode': suburbs['postcode'].to_numpy()[pick],
+            'offence_division': rng.choice(['A Crimes against the person', 'B Property and deception offences', 'C Drug offences'], count),
+            'incidents_recorded': rng.integers(1, 50, count),
+        }).to_csv(path, mode='a', index=False, header=start == 0)
+
+
+def whole_file(path):
+    """The previous approach: load everything, group, then keep the target suburbs."""
+    df = pd.read_csv(path)
+    grouped = df.groupby(['suburb', 'postcode', 'year'])['incidents_recorded'].sum().reset_index()
+    grouped['postcode'] = grouped['postcode'].astype(str)
+    return grouped[grouped['postcode'].isin(TARGET_POSTCODES)]
+
+
+def chunked(path):
+    return aggregate_crime_chunks(path, TARGET_POSTCODES)
+
+
+def measure(func, path):
+    """Run in a fresh process: result, wall time, and peak RSS in MB before and after."""
+    baseline_mb = peak_rss_mb()
+    started = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - started
+    return result, elapsed, baseline_mb, peak_rss_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'crime_data.csv')
+        write_statewide_crime(path, args.rows)
+        print(f"{args.rows:,} rows, {os.path.getsize(path) / 1e6:.0f} MB")
+
+        results = {}
+        for label, func in [('whole file', whole_file), ('chunked', chunked)]:
+            with multiprocessing.get_context('spawn').Pool(1) as pool:
+                result, elapsed, baseline_mb, peak_mb = pool.apply(measure, (func, path))
+            results[label] = result
+            print(f"{label:<11} {elapsed:>7.2f} s   peak RSS {peak_mb:>6.0f} MB (after imports {baseline_mb:.0f} MB)   {len(result)} suburb-years")
+
+        expected, actual = (
+            frame.assign(suburb=frame['suburb'].astype(str), postcode=frame['postcode'].astype(str))
+            .sort_values(['suburb', 'postcode', 'year']).reset_index(drop=True)[['suburb', 'postcode', 'year', 'incidents_recorded']]
+            for frame in (results['whole file'], results['chunked'])
+        )
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+
+if __name__ == '__main__':
+    main()
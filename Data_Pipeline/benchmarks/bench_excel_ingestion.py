@@ -0,0 +1,97 @@
+"""
+Compare loading the raw Excel workbooks with pandas against the streaming,
+cached ingestion: parse time and peak RSS growth, each measured in a fresh process.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_excel_ingestion.py
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [PIPELINE_DIR, os.path.join(PIPELINE_DIR, 'Data_Preparation')]
+from run_pipeline import peak_rss_mb  # noqa: E402
+
+CRIME_WORKBOOK_PATH = './Data/Raw Data/Data_Tables_Criminal_Incidents_Visualisation_Year_Ending_September_2024_0.xlsx'
+CRIME_SHEET = 'Table 02'
+CRIME_COLUMNS = {
+    'Year': 'year', 'Offence Division': 'offence_division', 'Location Division': 'location_division',
+    'Incidents Recorded': 'incidents_recorded',
+}
+
+
+def pandas_facilities():
+    import pandas as pd
+    from prepare_facility_data import FACILITY_DATA_PATH, FACILITY_SHEET
+    from suburb_dimension import load_suburb_dimension
+
+    df = pd.read_excel(FACILITY_DATA_PATH, sheet_name=FACILITY_SHEET)
+    return len(df[load_suburb_dimension().in_scope_postcodes(df['Pcode'])])
+
+
+def streamed_facilities(cache_dir):
+    from ingest_excel import ingest_sheet
+    from prepare_facility_data import FACILITY_COLUMNS, FACILITY_DATA_PATH, FACILITY_SHEET
+    from suburb_dimension import load_suburb_dimension
+
+    return len(ingest_sheet(
+        FACILITY_DATA_PATH, FACILITY_SHEET, FACILITY_COLUMNS, postcode_column='Pcode',
+        postcodes=load_suburb_dimension().postcodes, numeric_columns=['latitude', 'longitude'], cache_dir=cache_dir,
+    ))
+
+
+def pandas_crime():
+    import pandas as pd
+
+    return len(pd.read_excel(CRIME_WORKBOOK_PATH, sheet_name=CRIME_SHEET)[list(CRIME_COLUMNS)])
+
+
+def streamed_crime(cache_dir):
+    from ingest_excel import ingest_sheet
+
+    return len(ingest_sheet(CRIME_WORKBOOK_PATH, CRIME_SHEET, CRIME_COLUMNS, numeric_columns=['year', 'incidents_recorded'], cache_dir=cache_dir))
+
+
+def measure(func, *args):
+    """
+    Run in this (fresh) process. Returns rows loaded, wall time, and the growth of
+    peak RSS in MB over the process after importing the libraries.
+    """
+    import openpyxl, pandas, pyarrow  # noqa: F401,E401  Library load time and memory are not counted
+    baseline_mb = peak_rss_mb()
+    started = time.perf_counter()
+    rows = func(*args)
+    elapsed = time.perf_counter() - started
+    return rows, elapsed, peak_rss_mb() - baseline_mb
+
+
+def run_fresh(func, *args):
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(measure, (func, *args))
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.strip().splitlines()[0]).parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cases = [
+            ('Facilities', pandas_facilities, streamed_facilities),
+            (f'Crime {CRIME_SHEET}', pandas_crime, streamed_crime),
+        ]
+        print(f"{'Workbook':<16} {'Method':<18} {'Rows':>7} {'Time (s)':>9} {'Peak RSS growth (MB)':>21}")
+        for label, pandas_func, streamed_func in cases:
+            for method, func, args in [
+                ('pandas.read_excel', pandas_func, ()),
+                ('streamed (cold)', streamed_func, (cache_dir,)),
+                ('streamed (cached)', streamed_func, (cache_dir,)),
+            ]:
+                rows, elapsed, peak_mb = run_fresh(func, *args)
+                print(f"{label:<16} {method:<18} {rows:>7} {elapsed:>9.2f} {peak_mb:>21.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark the offline reverse geocoder on synthetic points around inner Melbourne,
+and check its answers against an exact brute-force nearest-neighbour search.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_offline_geocoder.py [--points 100000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data_Preparation'))
+from offline_geocoder import OfflineReverseGeocoder, REFERENCE_POINTS_PATH  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--points', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    geocoder = OfflineReverseGeocoder.from_csv(REFERENCE_POINTS_PATH)
+    load_sec = time.perf_counter() - start
+
+    # Uniform points over a box slightly larger than the reference coverage
+    rng = np.random.default_rng(args.seed)
+    latitude = rng.uniform(-37.86, -37.76, args.points)
+    longitude = rng.uniform(144.89, 145.02, args.points)
+
+    start = time.perf_counter()
+    suburbs, postcodes = geocoder.reverse(latitude, longitude)
+    reverse_sec = time.perf_counter() - start
+
+    # Exact check on a sample
+    sample = rng.choice(args.points, size=min(2000, args.points), replace=False)
+    x, y = geocoder._project(latitude[sample], longitude[sample])
+    exact = ((x[:, None] - geocoder.x[None, :]) ** 2 + (y[:, None] - geocoder.y[None, :]) ** 2).argmin(axis=1)
+    index, _ = geocoder.nearest(latitude[sample], longitude[sample])
+    mismatches = int((geocoder.suburbs[exact] != geocoder.suburbs[index]).sum())
+
+    assigned = int((suburbs != '').sum())
+    print(f"reference points: {len(geocoder.x)} (loaded in {load_sec * 1000:.1f} ms)")
+    print(f"reverse geocoded {args.points:,} points in {reverse_sec:.2f} s "
+          f"({args.points / reverse_sec:,.0f} points/s), {assigned:,} within coverage")
+    print(f"exact nearest-neighbour mismatches in a {len(sample)}-point sample: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
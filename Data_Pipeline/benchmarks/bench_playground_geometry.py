@@ -0,0 +1,90 @@
+"""
+Compare the playground geometry stage with carrying raw Geo Shape strings through
+pandas: peak Python memory while processing, and the size of the outlines that
+would be sent to a client at each level of detail.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_playground_geometry.py [--scale 20]
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data_Preparation'))
+from prepare_playground_geometry import PLAYGROUND_SHAPES_PATH, LEVEL_TOLERANCES_M, prepare_playground_geometry  # noqa: E402
+
+
+def scaled_copy(scale, path):
+    """Write the raw playgrounds file repeated `scale` times, to mimic a larger catalogue."""
+    with open(PLAYGROUND_SHAPES_PATH, newline='', encoding='utf-8-sig') as source, open(path, 'w', newline='') as target:
+        rows = list(csv.DictReader(source))
+        writer = csv.DictWriter(target, fieldnames=rows[0].keys())
+        writer.writeheader()
+        for copy in range(scale):
+            for row in rows:
+                writer.writerow({**row, 'name': f"{row['name']} {copy}"})
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=int, default=20, help="Number of copies of the raw file to process")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    shapes_path = os.path.join(workdir, 'playgrounds.csv')
+    database_path = os.path.join(workdir, 'outlines.db')
+    scaled_copy(args.scale, shapes_path)
+
+    def pandas_raw():
+        # What prepare_playground does today: load every row with its GeoJSON blob and parse it there
+        df = pd.read_csv(shapes_path)
+        df['shape'] = df['Geo Shape'].map(json.loads)
+        return len(df)
+
+    _, pandas_sec, pandas_peak = measure(pandas_raw)
+    _, stage_sec, stage_peak = measure(lambda: prepare_playground_geometry(shapes_path, database_path))
+
+    print(f"\n{os.path.getsize(shapes_path):,} byte input ({args.scale}x the raw file)")
+    print(f"pandas + json.loads: {pandas_sec:6.2f} s, peak {pandas_peak / 1e6:7.1f} MB")
+    print(f"geometry stage:      {stage_sec:6.2f} s, peak {stage_peak / 1e6:7.1f} MB")
+
+    conn = sqlite3.connect(database_path)
+    outlines_per_copy = conn.execute("SELECT COUNT(*) FROM Playground_Outline").fetchone()[0] // args.scale
+    raw_payload = sum(len(row['Geo Shape']) for row in csv.DictReader(open(PLAYGROUND_SHAPES_PATH, encoding='utf-8-sig')))
+    print(f"\nper-catalogue payload (raw GeoJSON strings: {raw_payload:,} bytes)")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'Backend', 'flask-app'))
+    from route_handlers.parks.park_outlines import decode_geometry
+    for level in range(len(LEVEL_TOLERANCES_M)):
+        rows = conn.execute(
+            """SELECT O.centroid_latitude, O.centroid_longitude, OL.geometry, OL.vertex_count
+               FROM Playground_Outline O JOIN Playground_Outline_Level OL ON O.outline_id = OL.outline_id
+               WHERE OL.level = ? AND O.outline_id <= ?""",
+            (level, outlines_per_copy),
+        ).fetchall()
+        packed = sum(len(blob) for _, _, blob, _ in rows)
+        vertices = sum(count for *_, count in rows)
+        payload = len(json.dumps([decode_geometry(blob, lon, lat) for lat, lon, blob, _ in rows], separators=(',', ':')))
+        print(f"  level {level} ({LEVEL_TOLERANCES_M[level]:>2} m): {vertices:6,} vertices, "
+              f"{packed:8,} bytes packed, {payload:8,} bytes as JSON")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare processed-data formats on a scaled-up synthetic facility dataset: file
+size, full read time, and the time to read the two columns a later stage needs,
+for CSV (as the pipeline used to read it) against Parquet and Feather.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_processed_formats.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data_Preparation'))
+import processed_store  # noqa: E402
+from processed_store import apply_schema, read_processed, write_processed  # noqa: E402
+
+REFERENCE_POINTS_PATH = './Data/Processed Data/suburb_reference_points.csv'
+
+
+def synthetic_facilities(rows, seed=0):
+    """Facility rows drawn from the real suburbs and sports, with random coordinates."""
+    rng = np.random.default_rng(seed)
+    suburbs = pd.read_csv(REFERENCE_POINTS_PATH)[['suburb', 'postcode']].drop_duplicates().reset_index(drop=True)
+    sports = pd.read_csv('./Data/Processed Data/filtered_facility_data.csv')['sports_played'].unique()
+    pick = rng.integers(0, len(suburbs), rows)
+    return pd.DataFrame({
+        'facility_id': [f'MELBOU{i}' for i in range(rows)],
+        'facility_name': [f'Facility {i}' for i in range(rows)],
+        'suburb': suburbs['suburb'].to_numpy()[pick],
+        'postcode': suburbs['postcode'].to_numpy()[pick].astype(float),  # as the raw facility data stores it
+        'latitude': rng.uniform(-37.86, -37.76, rows),
+        'longitude': rng.uniform(144.90, 145.00, rows),
+        'sports_played': rng.choice(sports, rows),
+    })
+
+
+def timed(func, repeat=3):
+    """Best of `repeat` runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def read_csv_as_before(path, columns=None):
+    """Read a processed CSV the way the prep scripts did, including the postcode clean-up."""
+    df = pd.read_csv(path, usecols=columns)
+    df['postcode'] = df['postcode'].astype(str).str.replace('.0', '', regex=False)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    name = 'filtered_facility_data'
+    columns = ['suburb', 'postcode']
+    df = synthetic_facilities(args.rows)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        processed_store.PROCESSED_DATA_DIR = workdir
+        csv_path = os.path.join(workdir, f'{name}.csv')
+        feather_path = os.path.join(workdir, f'{name}.feather')
+        df.to_csv(csv_path, index=False)
+        parquet_path = write_processed(df, name)
+        apply_schema(df.copy(), name).to_feather(feather_path)
+
+        results = [
+            ('CSV', csv_path, lambda: read_csv_as_before(csv_path), lambda: read_csv_as_before(csv_path, columns)),
+            ('Parquet', parquet_path, lambda: read_processed(name), lambda: read_processed(name, columns)),
+            ('Feather', feather_path, lambda: pd.read_feather(feather_path), lambda: pd.read_feather(feather_path, columns=columns)),
+        ]
+
+        print(f"{args.rows:,} facility rows")
+        print(f"{'Format':<8} {'Size (MB)':>10} {'Full read (s)':>14} {'2 columns (s)':>14} {'Memory (MB)':>12}")
+        for label, path, read_all, read_columns in results:
+            full, full_sec = timed(read_all)
+            _, columns_sec = timed(read_columns)
+            memory_mb = full.memory_usage(deep=True).sum() / 1e6
+            print(f"{label:<8} {os.path.getsize(path) / 1e6:>10.1f} {full_sec:>14.3f} {columns_sec:>14.3f} {memory_mb:>12.1f}")
+
+        # Typed storage keeps postcodes as clean strings without any clean-up step
+        parquet_postcodes = read_processed(name, ['postcode'])['postcode']
+        assert parquet_postcodes.dtype == 'category' and parquet_postcodes.str.fullmatch(r'\d{4}').all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Time the suburb dimension's vectorised lookups on synthetic statewide rows, with
+the app's suburbs in scope and with every Victorian suburb in scope, against
+the per-stage merge the preparation scripts used before.
+
+Run from the repository root:
+    python Data_Pipeline/benchmarks/bench_suburb_dimension.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Data_Preparation'))
+from suburb_dimension import VICTORIA_POSTCODES_PATH, SuburbDimension, build_suburb_dimension  # noqa: E402
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    victoria = pd.read_csv(VICTORIA_POSTCODES_PATH)
+    pick = rng.integers(0, len(victoria), args.rows)
+    rows = pd.DataFrame({
+        'suburb': victoria['suburb'].str.title().to_numpy()[pick],
+        'postcode': victoria['postcode'].to_numpy()[pick],
+    })
+
+    print(f"{args.rows:,} rows")
+    print(f"{'Scope':<9} {'Suburbs':>8} {'suburb_ids (s)':>15} {'postcode filter (s)':>20} {'merge (s)':>10}")
+    for scope in ('app', 'victoria'):
+        dimension = SuburbDimension(build_suburb_dimension(scope))
+        ids, ids_sec = timed(lambda: dimension.suburb_ids(rows['postcode'], rows['suburb']))
+        _, filter_sec = timed(lambda: dimension.in_scope_postcodes(rows['postcode']))
+
+        # What each stage did before: build a lookup frame and merge on (postcode, suburb key)
+        lookup = dimension.table[dimension.table['in_scope']][['postcode', 'suburb_key', 'suburb_id']]
+
+        def merge():
+            keyed = rows.assign(postcode=rows['postcode'].astype(str), suburb_key=rows['suburb'].str.upper())
+            return keyed.merge(lookup, on=['postcode', 'suburb_key'], how='left')['suburb_id']
+
+        merged, merge_sec = timed(merge)
+        assert ids.fillna(-1).astype(int).tolist() == merged.fillna(-1).astype(int).tolist()
+        print(f"{scope:<9} {len(dimension.suburbs):>8} {ids_sec:>15.3f} {filter_sec:>20.3f} {merge_sec:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
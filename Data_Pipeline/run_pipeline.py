@@ -0,0 +1,374 @@
+"""
+Incremental runner for the data pipeline.
+
+Each stage declares the files it reads and writes. Stages whose inputs (and
+source code, including the repository modules it imports) have the same content
+hashes as on their last successful run are skipped; the rest run in parallel worker processes as soon as the stages they
+depend on have finished. A stage that rewrites its outputs with identical
+content does not trigger its downstream stages.
+
+Run from the repository root:
+    python Data_Pipeline/run_pipeline.py [--jobs 4] [--force STAGE ...] [--dry-run]
+"""
+import argparse
+import ast
+import hashlib
+import importlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+PIPELINE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Imported modules under this directory count as part of a stage's source
+REPOSITORY_DIR = os.path.dirname(PIPELINE_DIR)
+STAGE_DIRS = [os.path.join(PIPELINE_DIR, 'Data_Preparation'), os.path.join(PIPELINE_DIR, 'Data_Transfer')]
+
+# Hashes and timings of the last successful run of each stage
+STATE_PATH = './Data_Pipeline/pipeline_state.json'
+
+
+class Stage:
+    """
+    A pipeline step: a function in one of the stage scripts, and the path
+    constants of that script naming its inputs and outputs.
+    """
+    def __init__(self, name, module, function, inputs, outputs, after=()):
+        self.name = name
+        self.module = module
+        self.function = function
+        self.input_names = inputs
+        self.output_names = outputs
+        self.after = list(after)
+        self.inputs = []
+        self.outputs = []
+        self.source_paths = []
+
+    def resolve(self):
+        """
+        Look up the input and output paths from the stage script's constants,
+        and the source files of the script and the repository modules it imports.
+        """
+        module = importlib.import_module(self.module)
+        self.inputs = [getattr(module, name) for name in self.input_names]
+        self.outputs = [getattr(module, name) for name in self.output_names]
+        self.source_paths = [os.path.relpath(path) for path in repository_sources(module.__file__)]
+
+
+def imported_modules(source_path):
+    """Names of the modules imported at any level of a Python source file."""
+    with open(source_path) as file:
+        tree = ast.parse(file.read(), source_path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+    return names
+
+
+def repository_sources(source_path):
+    """
+    A source file and every repository module it imports, directly or through
+    other repository modules, so that changing a shared helper reruns the
+    stages using it. Standard library and installed packages are left out.
+    """
+    sources = [os.path.abspath(source_path)]
+    for path in sources:
+        for name in sorted(imported_modules(path)):
+            try:
+                spec = importlib.util.find_spec(name)
+            except (ImportError, ValueError):
+                continue
+            origin = spec.origin if spec is not None else None
+            if (origin and origin.endswith('.py') and origin not in sources
+                    and os.path.commonpath([REPOSITORY_DIR, origin]) == REPOSITORY_DIR
+                    and 'site-packages' not in origin.split(os.sep)):
+                sources.append(origin)
+    return sources
+
+
+# Stage order here is only for display; execution order comes from the dependencies
+STAGES = [
+    Stage('prepare_suburb_dimension', 'suburb_dimension', 'prepare_suburb_dimension',
+          inputs=['VICTORIA_POSTCODES_PATH', 'SUBURBS_INFO_DATABASE_PATH'], outputs=['SUBURB_DIMENSION_PATH']),
+    Stage('prepare_accident_data', 'prepare_accident_data', 'prepare_accident_data',
+          inputs=['ACCIDENT_DATA_PATH', 'SUBURB_DIMENSION_PATH'], outputs=['OUTPUT_PATH']),
+    Stage('prepare_crime_data', 'prepare_crime_data', 'prepare_crime_data',
+          inputs=['CRIME_DATA_PATH', 'SUBURB_DIMENSION_PATH'], outputs=['OUTPUT_PATH', 'YEARLY_OUTPUT_PATH']),
+    Stage('prepare_facility_data', 'prepare_facility_data', 'prepare_facility_data',
+          inputs=['FACILITY_DATA_PATH', 'SUBURB_DIMENSION_PATH'], outputs=['OUTPUT_PATH']),
+    Stage('prepare_reference_points', 'offline_geocoder', 'build_reference_points',
+          inputs=['FACILITY_DATA_PATH', 'LANDMARK_DATA_PATH', 'SUBURB_DIMENSION_PATH'], outputs=['REFERENCE_POINTS_PATH']),
+    Stage('prepare_playground_data', 'prepare_playground', 'prepare_playground_data',
+          inputs=['PLAYGROUND_DATA_PATH', 'REFERENCE_POINTS_PATH'], outputs=['OUTPUT_PATH']),
+    # Also builds the playground outlines, in the same staged copy of the database
+    Stage('transfer_data_to_db', 'transfer_data_to_db', 'transfer_data_to_db',
+          inputs=['PLAYGROUND_DATA_PATH', 'FACILITY_DATA_PATH', 'CRIME_DATA_PATH', 'ACCIDENT_DATA_PATH',
+                  'LANDMARK_DATA_PATH', 'SUBURB_DIMENSION_PATH', 'SCHEMA_PATH', 'PLAYGROUND_SHAPES_PATH',
+                  'OUTLINE_SOURCE_PATH'],
+          outputs=['DATABASE_PATH']),
+]
+
+
+def stage_dependencies(stages):
+    """
+    Map each stage name to the stages it must wait for: those producing any of
+    its inputs, plus any listed in `after`.
+    """
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            producers.setdefault(os.path.normpath(path), []).append(stage.name)
+
+    dependencies = {}
+    for stage in stages:
+        upstream = set(stage.after)
+        for path in stage.inputs:
+            upstream.update(producers.get(os.path.normpath(path), []))
+        upstream.discard(stage.name)
+        dependencies[stage.name] = upstream
+    return dependencies
+
+
+def validate_stages(stages, dependencies):
+    """
+    Check that stage names are unique, that every `after` names a stage, and
+    that no stage depends on itself through other stages.
+
+    Raises:
+    - ValueError: If the stages cannot all run.
+    """
+    names = [stage.name for stage in stages]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate stages: {', '.join(sorted(duplicates))}")
+    for stage in stages:
+        unknown = set(stage.after) - set(names)
+        if unknown:
+            raise ValueError(f"Stage {stage.name} runs after unknown stages: {', '.join(sorted(unknown))}")
+
+    # Repeatedly remove stages with no remaining dependencies; whatever is left is in a cycle
+    remaining = {name: set(upstream) for name, upstream in dependencies.items()}
+    while True:
+        ready = [name for name, upstream in remaining.items() if not upstream]
+        if not ready:
+            break
+        for name in ready:
+            del remaining[name]
+        for upstream in remaining.values():
+            upstream.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Stages depend on each other in a cycle: {', '.join(sorted(remaining))}")
+
+
+class FileHasher:
+    """
+    SHA-256 of file contents, reusing the stored hash of any file whose size and
+    modification time are unchanged since it was last hashed.
+    """
+    def __init__(self, known=None):
+        self.known = {} if known is None else known
+
+    def __call__(self, path):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        known = self.known.get(path)
+        if known and known['size'] == stat.st_size and known['mtimeNs'] == stat.st_mtime_ns:
+            return known['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+        self.known[path] = {'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        return digest.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    if os.path.exists(path):
+        with open(path) as file:
+            return json.load(file)
+    return {'files': {}, 'stages': {}}
+
+
+def save_state(state, path=STATE_PATH):
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def stage_fingerprint(stage, hasher):
+    """Content hashes of a stage's inputs and source files."""
+    return {path: hasher(path) for path in stage.inputs + stage.source_paths}
+
+
+def is_up_to_date(stage, fingerprint, state):
+    """A stage is up to date if its fingerprint matches its last run and its outputs exist."""
+    previous = state['stages'].get(stage.name)
+    return (
+        previous is not None
+        and previous['fingerprint'] == fingerprint
+        and all(os.path.exists(path) for path in stage.outputs)
+    )
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB.
+
+    On Linux this is VmHWM, because ru_maxrss carries over the parent's peak
+    into processes started with fork and exec.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / (1 << 20) if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def run_stage(module_name, function_name):
+    """
+    Run one stage in a worker process.
+
+    Returns:
+    - Tuple: Wall time in seconds and peak resident memory in MB.
+    """
+    sys.path[:0] = STAGE_DIRS
+    started = time.perf_counter()
+    getattr(importlib.import_module(module_name), function_name)()
+    wall_sec = time.perf_counter() - started
+    return wall_sec, peak_rss_mb()
+
+
+def run_pipeline(stages=STAGES, jobs=None, force=(), dry_run=False, state_path=STATE_PATH):
+    """
+    Run every stage that is out of date, in dependency order.
+
+    Parameters:
+    - stages (list): Stages to consider.
+    - jobs (int): Maximum number of stages running at once (defaults to the CPU count).
+    - force (iterable): Names of stages to run even if they are up to date.
+    - dry_run (bool): Only report which stages would run.
+
+    Returns:
+    - dict: Stage name to result, with a status of 'ran', 'skipped', 'failed', 'blocked'
+      (an upstream stage failed) or, for a dry run, 'would run'. A dry run reports
+      every stage downstream of one that would run as 'would run' too.
+
+    Raises:
+    - ValueError: If a stage is unknown or the stages depend on each other in a cycle.
+    - RuntimeError: If stages are left that can never be started.
+    """
+    sys.path[:0] = [path for path in STAGE_DIRS if path not in sys.path]
+    for stage in stages:
+        stage.resolve()
+    by_name = {stage.name: stage for stage in stages}
+    dependencies = stage_dependencies(stages)
+    validate_stages(stages, dependencies)
+    unknown = set(force) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    state = load_state(state_path)
+    hasher = FileHasher(state['files'])
+    results = {}
+    pending = set(by_name)
+    running = {}
+
+    def finish(name, result):
+        results[name] = result
+        pending.discard(name)
+
+    # Each stage runs in a fresh process, so its peak RSS is its own
+    pool_options = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'), **pool_options) as pool:
+        while pending or running:
+            started = len(results) + len(running)
+            for name in sorted(pending):
+                if name in running or not dependencies[name] <= set(results):
+                    continue
+                stage = by_name[name]
+                if any(results[upstream]['status'] in ('failed', 'blocked') for upstream in dependencies[name]):
+                    finish(name, {'status': 'blocked'})
+                    continue
+
+                # In a dry run, outputs of upstream stages that would run are not written yet
+                would_run = [upstream for upstream in dependencies[name] if results[upstream]['status'] == 'would run']
+                not_yet_written = {os.path.normpath(path) for upstream in would_run for path in by_name[upstream].outputs}
+                fingerprint = stage_fingerprint(stage, hasher)
+                missing = [path for path in stage.inputs
+                           if fingerprint[path] is None and os.path.normpath(path) not in not_yet_written]
+                # Stages ordered only by `after` share no files with the stage before them, so they rerun whenever it does
+                rerun = name in force or bool(would_run) or any(results[upstream]['status'] == 'ran' for upstream in stage.after)
+                if not rerun and is_up_to_date(stage, fingerprint, state):
+                    finish(name, {'status': 'skipped'})
+                elif missing:
+                    finish(name, {'status': 'failed', 'error': f"missing inputs: {', '.join(missing)}"})
+                elif dry_run:
+                    # Pretend the stage ran so its downstream stages are reported too
+                    finish(name, {'status': 'would run'})
+                else:
+                    print(f"Running {name}")
+                    running[name] = (pool.submit(run_stage, stage.module, stage.function), fingerprint)
+
+            if not running:
+                # Another pass only helps if this one finished or started a stage
+                if len(results) + len(running) == started and pending:
+                    raise RuntimeError(f"Stages can never start: {', '.join(sorted(pending))}")
+                continue
+            done, _ = wait([future for future, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [name for name, (future, _) in running.items() if future in done]:
+                future, fingerprint = running.pop(name)
+                try:
+                    wall_sec, peak_mb = future.result()
+                except Exception as e:
+                    finish(name, {'status': 'failed', 'error': str(e)})
+                    continue
+                finish(name, {'status': 'ran', 'wallSec': round(wall_sec, 3), 'peakMemoryMb': round(peak_mb, 1)})
+                state['stages'][name] = {
+                    'fingerprint': fingerprint,
+                    'wallSec': round(wall_sec, 3),
+                    'peakMemoryMb': round(peak_mb, 1),
+                    'finishedAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                }
+                # Outputs were rewritten, so later stages must rehash them
+                for path in by_name[name].outputs:
+                    state['files'].pop(path, None)
+                save_state(state, state_path)
+
+    return {name: results[name] for name in (stage.name for stage in stages)}
+
+
+def print_summary(results):
+    print(f"\n{'Stage':<30} {'Status':<10} {'Wall (s)':>9} {'Peak MB':>9}")
+    for name, result in results.items():
+        wall = f"{result['wallSec']:.2f}" if 'wallSec' in result else '-'
+        peak = f"{result['peakMemoryMb']:.0f}" if 'peakMemoryMb' in result else '-'
+        print(f"{name:<30} {result['status']:<10} {wall:>9} {peak:>9}")
+        if 'error' in result:
+            print(f"    {result['error']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=None, help='Maximum number of stages running at once')
+    parser.add_argument('--force', nargs='*', default=[], help='Stages to run even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='Only report which stages would run')
+    args = parser.parse_args()
+
+    results = run_pipeline(jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    print_summary(results)
+    sys.exit(1 if any(result['status'] == 'failed' for result in results.values()) else 0)
@@ -0,0 +1,137 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from run_pipeline import (  # noqa: E402
+    STAGE_DIRS, STAGES, FileHasher, Stage, run_pipeline, save_state, stage_dependencies, stage_fingerprint,
+)
+
+sys.path[:0] = STAGE_DIRS
+import transfer_data_to_db  # noqa: E402
+from processed_store import PROCESSED_DATA_DIR, processed_path  # noqa: E402
+
+# Processed datasets maintained by hand rather than written by a stage
+CURATED_DATASETS = ['filtered_landmark_data']
+
+
+class TestRunPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        # A stage script whose path constants are files in the work directory
+        module = types.ModuleType('fake_stages')
+        module.__file__ = self.path('fake_stages.py')
+        for name in ['RAW', 'MIDDLE', 'OUTPUT', 'REPORT']:
+            setattr(module, name, self.path(name.lower()))
+            with open(getattr(module, name), 'w') as file:
+                file.write(name)
+        with open(module.__file__, 'w') as file:
+            file.write('')
+        sys.modules['fake_stages'] = module
+        self.addCleanup(sys.modules.pop, 'fake_stages')
+        self.state_path = self.path('state.json')
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def stages(self):
+        return [
+            Stage('extract', 'fake_stages', 'extract', inputs=['RAW'], outputs=['MIDDLE']),
+            Stage('load', 'fake_stages', 'load', inputs=['MIDDLE'], outputs=['OUTPUT']),
+            Stage('report', 'fake_stages', 'report', inputs=[], outputs=['REPORT'], after=['load']),
+        ]
+
+    def record_runs(self, stages, names):
+        """Save state as if the named stages last ran on the current files."""
+        hasher = FileHasher()
+        for stage in stages:
+            stage.resolve()
+        save_state({'files': {}, 'stages': {
+            stage.name: {'fingerprint': stage_fingerprint(stage, hasher)} for stage in stages if stage.name in names
+        }}, self.state_path)
+
+    def test_cycle_is_rejected(self):
+        stages = [
+            Stage('extract', 'fake_stages', 'extract', inputs=['OUTPUT'], outputs=['MIDDLE']),
+            Stage('load', 'fake_stages', 'load', inputs=['MIDDLE'], outputs=['OUTPUT']),
+        ]
+        with self.assertRaisesRegex(ValueError, 'cycle: extract, load'):
+            run_pipeline(stages, dry_run=True, state_path=self.state_path)
+
+    def test_unknown_after_is_rejected(self):
+        stages = [Stage('report', 'fake_stages', 'report', inputs=[], outputs=['REPORT'], after=['lod'])]
+        with self.assertRaisesRegex(ValueError, 'unknown stages: lod'):
+            run_pipeline(stages, dry_run=True, state_path=self.state_path)
+
+    def test_up_to_date_stages_are_skipped(self):
+        stages = self.stages()
+        self.record_runs(stages, ['extract', 'load', 'report'])
+        results = run_pipeline(stages, dry_run=True, state_path=self.state_path)
+        self.assertEqual({name: result['status'] for name, result in results.items()},
+                         {'extract': 'skipped', 'load': 'skipped', 'report': 'skipped'})
+
+    def test_dry_run_reports_downstream_stages(self):
+        stages = self.stages()
+        self.record_runs(stages, ['load', 'report'])
+        # The stage that would run has not written its output yet
+        os.remove(self.path('middle'))
+        results = run_pipeline(stages, dry_run=True, state_path=self.state_path)
+        self.assertEqual({name: result['status'] for name, result in results.items()},
+                         {'extract': 'would run', 'load': 'would run', 'report': 'would run'})
+
+    def test_changed_helper_reruns_stages_importing_it(self):
+        with open(self.path('fake_helper.py'), 'w') as file:
+            file.write('VALUE = 1\n')
+        with open(self.path('fake_stages.py'), 'w') as file:
+            file.write('import os\nfrom fake_helper import VALUE\n')
+        sys.path.insert(0, self.workdir)
+        self.addCleanup(sys.path.remove, self.workdir)
+
+        with patch('run_pipeline.REPOSITORY_DIR', self.workdir):
+            stages = self.stages()
+            self.record_runs(stages, ['extract', 'load', 'report'])
+            self.assertEqual(stages[0].source_paths, [os.path.relpath(self.path(name)) for name in ['fake_stages.py', 'fake_helper.py']])
+            with open(self.path('fake_helper.py'), 'w') as file:
+                file.write('VALUE = 2\n')
+            results = run_pipeline(stages, dry_run=True, state_path=self.state_path)
+        self.assertEqual({name: result['status'] for name, result in results.items()},
+                         {'extract': 'would run', 'load': 'would run', 'report': 'would run'})
+
+
+class TestPipelineStages(unittest.TestCase):
+
+    def setUp(self):
+        for stage in STAGES:
+            stage.resolve()
+
+    def test_processed_inputs_are_written_upstream(self):
+        curated = {os.path.normpath(processed_path(name)) for name in CURATED_DATASETS}
+        producers = {os.path.normpath(path): stage.name for stage in STAGES for path in stage.outputs}
+        dependencies = stage_dependencies(STAGES)
+        for stage in STAGES:
+            for path in map(os.path.normpath, stage.inputs):
+                if not path.startswith(os.path.normpath(PROCESSED_DATA_DIR)) or path in curated:
+                    continue
+                with self.subTest(stage=stage.name, path=path):
+                    self.assertIn(path, producers, f"{stage.name} reads {path}, which no stage writes")
+                    self.assertIn(producers[path], dependencies[stage.name])
+
+    def test_transfer_reads_only_its_declared_inputs(self):
+        transfer = next(stage for stage in STAGES if stage.name == 'transfer_data_to_db')
+        declared = {os.path.normpath(path) for path in transfer.inputs}
+        with patch.object(transfer_data_to_db, 'read_processed') as read_processed, \
+                patch.object(transfer_data_to_db, 'assign_locations'):
+            transfer_data_to_db.load_datasets()
+        read = {os.path.normpath(processed_path(call.args[0])) for call in read_processed.call_args_list}
+        self.assertLessEqual(read, declared)
+        self.assertTrue({'prepare_crime_data', 'prepare_accident_data'} <= stage_dependencies(STAGES)[transfer.name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+import pandas as pd
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(PIPELINE_DIR, 'Data_Preparation'), os.path.join(PIPELINE_DIR, 'Data_Transfer')]
+from initialise_database import migrate_database  # noqa: E402
+from prepare_playground_geometry import prepare_playground_geometry, write_outlines  # noqa: E402
+from transfer_data_to_db import load_database  # noqa: E402
+
+
+def square(min_x, min_y, size):
+    return [[min_x, min_y], [min_x + size, min_y], [min_x + size, min_y + size], [min_x, min_y + size], [min_x, min_y]]
+
+
+class TestStagedLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.database_path = os.path.join(self.workdir, 'serving.db')
+        self.shapes_path = os.path.join(self.workdir, 'playgrounds.csv')
+        with open(self.shapes_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['name', 'Geo Shape'])
+            writer.writeheader()
+            for name, corner in [('North Playground', 144.90), ('South Playground', 144.95)]:
+                shape = {'type': 'Polygon', 'coordinates': [square(corner, -37.8, 0.001)]}
+                writer.writerow({'name': name, 'Geo Shape': json.dumps(shape)})
+
+    def playgrounds(self, first_location_id):
+        return {'Playground': pd.DataFrame({
+            'playground_name': ['North Playground', 'South Playground'],
+            'location_id': [first_location_id, first_location_id + 1],
+        })}
+
+    def outline_locations(self):
+        with sqlite3.connect(self.database_path) as connection:
+            return dict(connection.execute("SELECT playground_name, location_id FROM Playground_Outline"))
+
+    def test_outlines_match_the_load_they_are_swapped_in_with(self):
+        load_database(self.playgrounds(1), self.database_path, [lambda cursor: write_outlines(cursor, self.shapes_path)])
+        self.assertEqual(self.outline_locations(), {'North Playground': 1, 'South Playground': 2})
+
+        def check_live_database(cursor):
+            # The serving database is untouched until the staged copy replaces it
+            self.assertEqual(self.outline_locations(), {'North Playground': 1, 'South Playground': 2})
+            write_outlines(cursor, self.shapes_path)
+
+        load_database(self.playgrounds(10), self.database_path, [check_live_database])
+        self.assertEqual(self.outline_locations(), {'North Playground': 10, 'South Playground': 11})
+        self.assertFalse(os.path.exists(self.database_path + '.staging'))
+
+    def test_failed_build_keeps_the_database(self):
+        load_database(self.playgrounds(1), self.database_path, [lambda cursor: write_outlines(cursor, self.shapes_path)])
+        inode = os.stat(self.database_path).st_ino
+
+        with self.assertRaises(FileNotFoundError):
+            prepare_playground_geometry(os.path.join(self.workdir, 'missing.csv'), self.database_path)
+        self.assertEqual(os.stat(self.database_path).st_ino, inode)
+        self.assertEqual(self.outline_locations(), {'North Playground': 1, 'South Playground': 2})
+        self.assertFalse(os.path.exists(self.database_path + '.staging'))
+
+        prepare_playground_geometry(self.shapes_path, self.database_path)
+        self.assertNotEqual(os.stat(self.database_path).st_ino, inode)
+
+    def test_migration_replaces_the_database(self):
+        load_database(self.playgrounds(1), self.database_path, [lambda cursor: write_outlines(cursor, self.shapes_path)])
+        with sqlite3.connect(self.database_path) as connection:
+            connection.execute("DROP INDEX idx_playground_location")
+            connection.execute("CREATE INDEX idx_playground_stale ON Playground (playground_name)")
+        inode = os.stat(self.database_path).st_ino
+        reader = sqlite3.connect(f'file:{self.database_path}?mode=ro&immutable=1', uri=True)
+        self.addCleanup(reader.close)
+
+        migrate_database(self.database_path)
+        self.assertNotEqual(os.stat(self.database_path).st_ino, inode)
+        self.assertFalse(os.path.exists(self.database_path + '.staging'))
+        index_query = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'Playground' AND sql IS NOT NULL"
+        with sqlite3.connect(self.database_path) as connection:
+            self.assertEqual(connection.execute(index_query).fetchall(), [('idx_playground_location',)])
+        # A connection opened before the migration keeps reading the previous file intact
+        self.assertEqual(reader.execute(index_query).fetchall(), [('idx_playground_stale',)])
+        self.assertEqual(reader.execute("SELECT COUNT(*) FROM Playground_Outline").fetchone(), (2,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,24 @@
+import os
 import sqlite3
+import sys
+from contextlib import contextmanager
 
-def create_database():
-    # Connect to SQLite database (creates the file if it doesn't exist)
-    conn = sqlite3.connect('ILikeToMoveIt.db')
-    cursor = conn.cursor()
+# A database is changed in this file next to it, then renamed over it
+STAGING_SUFFIX = '.staging'
 
-    # Create Suburbs_info table
-    cursor.execute('''
+# Table definitions, in creation order
+TABLES = {
+    # Suburbs_info table
+    'Suburbs_info': '''
         CREATE TABLE IF NOT EXISTS Suburbs_info (
             suburb_id INTEGER PRIMARY KEY,
             suburb_name TEXT NOT NULL,
             postcode TEXT NOT NULL
         )
-    ''')
+    ''',
 
-    # Create Location table
-    cursor.execute('''
+    # Location table
+    'Location': '''
         CREATE TABLE IF NOT EXISTS Location (
             location_id INTEGER PRIMARY KEY,
             postcode TEXT NOT NULL,
@@ -24,10 +27,10 @@ def create_database():
             suburb_id INTEGER,
             FOREIGN KEY (suburb_id) REFERENCES Suburbs_info(suburb_id)
         )
-    ''')
+    ''',
 
-    # Create Facility table
-    cursor.execute('''
+    # Facility table
+    'Facility': '''
         CREATE TABLE IF NOT EXISTS Facility (
             facility_id TEXT PRIMARY KEY,
             facility_name TEXT NOT NULL,
@@ -35,20 +38,20 @@ def create_database():
             location_id INTEGER,
             FOREIGN KEY (location_id) REFERENCES Location(location_id)
         )
-    ''')
+    ''',
 
-    # Create Playground table
-    cursor.execute('''
+    # Playground table
+    'Playground': '''
         CREATE TABLE IF NOT EXISTS Playground (
             playground_id INTEGER PRIMARY KEY,
             playground_name TEXT NOT NULL,
             location_id INTEGER,
             FOREIGN KEY (location_id) REFERENCES Location(location_id)
         )
-    ''')
+    ''',
 
-    # Create Landmark table
-    cursor.execute('''
+    # Landmark table
+    'Landmark': '''
         CREATE TABLE IF NOT EXISTS Landmark (
             landmark_id INTEGER PRIMARY KEY,
             landmark_type TEXT NOT NULL,
@@ -56,71 +59,265 @@ def create_database():
             location_id INTEGER,
             FOREIGN KEY (location_id) REFERENCES Location(location_id)
         )
-    ''')
+    ''',
 
-    # Create Photos table
-    cursor.execute('''
+    # Photos table
+    'Photos': '''
         CREATE TABLE IF NOT EXISTS Photos (
             photo_id INTEGER PRIMARY KEY,
             photo_filepath TEXT NOT NULL,
             location_id INTEGER,
             FOREIGN KEY (location_id) REFERENCES Location(location_id)
         )
-    ''')
+    ''',
 
-    # Create Accident table
-    cursor.execute('''
+    # Accident table
+    'Accident': '''
         CREATE TABLE IF NOT EXISTS Accident (
             accident_id INTEGER PRIMARY KEY,
             total_accidents INTEGER NOT NULL,
             suburb_id INTEGER,
             FOREIGN KEY (suburb_id) REFERENCES Suburbs_info(suburb_id)
         )
-    ''')
+    ''',
 
-    # Create Crime table
-    cursor.execute('''
+    # Crime table
+    'Crime': '''
         CREATE TABLE IF NOT EXISTS Crime (
             crime_id TEXT PRIMARY KEY,
             incidents_recorded_2014_2023 INTEGER NOT NULL,
             suburb_id INTEGER,
             FOREIGN KEY (suburb_id) REFERENCES Suburbs_info(suburb_id)
         )
-    ''')
+    ''',
 
-    # Create Guideline table
-    cursor.execute('''
+    # Guideline table
+    'Guideline': '''
         CREATE TABLE IF NOT EXISTS Guideline (
             guideline_id INTEGER PRIMARY KEY,
             source TEXT NOT NULL,
             recommendation TEXT NOT NULL,
             age_group TEXT NOT NULL
         )
-    ''')
+    ''',
 
-    # Create First Aid table
-    cursor.execute('''
+    # First Aid table
+    'First_Aid': '''
         CREATE TABLE IF NOT EXISTS First_Aid (
             first_aid_id INTEGER PRIMARY KEY,
             title TEXT NOT NULL,
             description TEXT NOT NULL,
             media_link TEXT
         )
-    ''')
+    ''',
 
-    # Create Chatbot Training Data table
-    cursor.execute('''
+    # Chatbot Training Data table
+    'Chatbot_Training_Data': '''
         CREATE TABLE IF NOT EXISTS Chatbot_Training_Data (
             training_id INTEGER PRIMARY KEY,
             guideline TEXT NOT NULL,
             source_link TEXT
         )
-    ''')
+    ''',
 
-    # Commit changes and close the connection
-    conn.commit()
-    conn.close()
-    print("Database 'ILikeToMoveIt.db' created successfully.")
+    # Playground Outline table (centroid and bounding box per playground shape)
+    'Playground_Outline': '''
+        CREATE TABLE IF NOT EXISTS Playground_Outline (
+            outline_id INTEGER PRIMARY KEY,
+            playground_name TEXT NOT NULL,
+            location_id INTEGER,
+            centroid_latitude REAL NOT NULL,
+            centroid_longitude REAL NOT NULL,
+            min_latitude REAL NOT NULL,
+            min_longitude REAL NOT NULL,
+            max_latitude REAL NOT NULL,
+            max_longitude REAL NOT NULL,
+            FOREIGN KEY (location_id) REFERENCES Location(location_id)
+        )
+    ''',
+
+    # Playground Outline Level table (packed outline per level of detail)
+    'Playground_Outline_Level': '''
+        CREATE TABLE IF NOT EXISTS Playground_Outline_Level (
+            outline_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            vertex_count INTEGER NOT NULL,
+            geometry BLOB NOT NULL,
+            PRIMARY KEY (outline_id, level),
+            FOREIGN KEY (outline_id) REFERENCES Playground_Outline(outline_id)
+        )
+    ''',
+
+    # Playground Outline Bounds table (R*Tree over the outline bounding boxes, for map viewport queries)
+    'Playground_Outline_Bounds': '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS Playground_Outline_Bounds USING rtree(
+            outline_id,
+            min_longitude, max_longitude,
+            min_latitude, max_latitude
+        )
+    ''',
+}
+
+# Secondary indexes, built once a table has been loaded. They cover the
+# serving queries: the per-location joins in get_safety_data read only index
+# pages, MAX() over the crime and accident counts reads one index entry, and
+# outlines are looked up by level of detail.
+INDEXES = {
+    'Facility': ['CREATE INDEX IF NOT EXISTS idx_facility_location ON Facility (location_id, facility_name, sports_played)'],
+    'Playground': ['CREATE INDEX IF NOT EXISTS idx_playground_location ON Playground (location_id, playground_name)'],
+    'Landmark': ['CREATE INDEX IF NOT EXISTS idx_landmark_location ON Landmark (location_id, landmark_name, landmark_type)'],
+    'Accident': [
+        'CREATE INDEX IF NOT EXISTS idx_accident_suburb ON Accident (suburb_id, total_accidents)',
+        'CREATE INDEX IF NOT EXISTS idx_accident_total ON Accident (total_accidents)',
+    ],
+    'Crime': [
+        'CREATE INDEX IF NOT EXISTS idx_crime_suburb ON Crime (suburb_id, incidents_recorded_2014_2023)',
+        'CREATE INDEX IF NOT EXISTS idx_crime_incidents ON Crime (incidents_recorded_2014_2023)',
+    ],
+    'Playground_Outline_Level': ['CREATE INDEX IF NOT EXISTS idx_outline_level ON Playground_Outline_Level (level, outline_id)'],
+}
+
+
+def create_tables(cursor, tables=None):
+    """Create the given tables (all of them by default) if they do not exist."""
+    for name in tables or TABLES:
+        cursor.execute(TABLES[name])
+
+
+def create_indexes(cursor, tables=None):
+    """Create the secondary indexes of the given tables (all of them by default)."""
+    for name in tables or INDEXES:
+        for statement in INDEXES.get(name, []):
+            cursor.execute(statement)
+
+
+def copy_database(source_path, target_connection):
+    """Copy a consistent snapshot of the current database, if there is one, into the staging database."""
+    if not os.path.exists(source_path):
+        return
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    try:
+        source.backup(target_connection)
+    finally:
+        source.close()
+
+
+def swap_database(staging_path, database_path):
+    """
+    Flush the staging database to disk and rename it over the database.
+
+    The rename is atomic, so a new connection opens either the previous
+    database or the new one in full; connections already open keep reading
+    the previous file until they close.
+    """
+    with open(staging_path, 'rb') as staging:
+        os.fsync(staging.fileno())
+    os.replace(staging_path, database_path)
+    if hasattr(os, 'O_DIRECTORY'):
+        directory = os.open(os.path.dirname(os.path.abspath(database_path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+@contextmanager
+def staged_database(database_path, pragmas=()):
+    """
+    Change a copy of the database and swap it in as a whole.
+
+    Yields a connection (in autocommit mode, so callers issue BEGIN and COMMIT)
+    to a staging copy of the database. When the block finishes, the copy
+    replaces the database; if it raises, the copy is discarded. The database
+    itself is never written in place, so the backend can open it immutable.
+
+    Parameters:
+    - database_path (str): Database to change; it need not exist yet.
+    - pragmas (iterable): Statements run on the copy before the block.
+    """
+    staging_path = database_path + STAGING_SUFFIX
+    if os.path.exists(staging_path):
+        os.remove(staging_path)
+
+    conn = sqlite3.connect(staging_path, isolation_level=None)
+    try:
+        copy_database(database_path, conn)
+        for pragma in pragmas:
+            conn.execute(pragma)
+        yield conn
+        conn.close()
+    except BaseException:
+        conn.close()
+        os.remove(staging_path)
+        raise
+    swap_database(staging_path, database_path)
+
+
+def migrate_database(db_path):
+    """
+    Bring the indexes of an existing database in line with INDEXES, index the
+    playground outline bounds, and refresh the query planner statistics.
+    Indexes on those tables that are no longer declared are dropped; tables
+    that do not exist are skipped.
+
+    The migration is applied to a staged copy that then replaces the database,
+    as the backend opens it immutable and would not notice changes in place.
+    """
+    with staged_database(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        tables = migrate_indexes(cursor)
+        cursor.execute('COMMIT')
+    print(f"Database '{db_path}' migrated: indexes on {', '.join(tables)}.")
+
+
+def migrate_indexes(cursor):
+    """
+    Apply migrate_database's changes through `cursor`.
+
+    Returns:
+    - list: Tables whose indexes were migrated.
+    """
+    existing = {name for (name,) in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tables = [name for name in INDEXES if name in existing]
+
+    declared = {statement.split(' ON ')[0].split()[-1] for name in tables for statement in INDEXES[name]}
+    for table in tables:
+        # Automatic indexes for primary keys have no SQL and are left alone
+        indexes = cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+        ).fetchall()
+        for (name,) in indexes:
+            if name not in declared:
+                cursor.execute(f'DROP INDEX {name}')
+    create_indexes(cursor, tables)
+
+    # Outline bounds are indexed in an R*Tree, filled from Playground_Outline
+    if 'Playground_Outline' in existing:
+        create_tables(cursor, ['Playground_Outline_Bounds'])
+        cursor.execute("""
+            INSERT OR REPLACE INTO Playground_Outline_Bounds
+            SELECT outline_id, min_longitude, max_longitude, min_latitude, max_latitude FROM Playground_Outline
+        """)
+    cursor.execute('ANALYZE')
+    return tables
+
+
+def create_database(db_path='ILikeToMoveIt.db'):
+    # Build the database in a staged copy (of the existing file, if any) and swap it in
+    with staged_database(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        create_tables(cursor)
+        create_indexes(cursor)
+        cursor.execute('ANALYZE')
+        cursor.execute('COMMIT')
+    print(f"Database '{db_path}' created successfully.")
 
 if __name__ == '__main__':
-    create_database()
+    # With database paths as arguments, migrate those databases instead of creating one
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            migrate_database(path)
+    else:
+        create_database()